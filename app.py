@@ -7,9 +7,10 @@ import os
 
 # Extensiones centralizadas
 from extensions import init_extensions, db
-from models import Usuario, CicloEscolar
+from models import CicloEscolar
 from admin_views import CicloEscolarAdmin
 from routes import nom, admin_bp
+from utils import cargar_usuario
 
 # Cargar variables de entorno
 load_dotenv()
@@ -41,7 +42,8 @@ def create_app():
 
     @login_manager.user_loader
     def load_user(user_id):
-        return Usuario.query.get(int(user_id))
+        # 🔹 Caché por worker invalidada por versión (ver utils.cargar_usuario)
+        return cargar_usuario(int(user_id))
 
     # 🔹 Flask-Admin
     admin = Admin(app, name="Panel Administrativo", template_mode="bootstrap4")
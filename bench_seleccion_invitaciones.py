@@ -0,0 +1,108 @@
+# bench_seleccion_invitaciones.py
+"""
+Compara la selección de invitaciones anterior (any/next anidados, O(n²))
+contra invitaciones.seleccionar_invitaciones (una sola pasada, O(n)).
+No necesita base de datos: genera nominaciones sintéticas en memoria.
+
+Ejecutar:
+    python bench_seleccion_invitaciones.py            # 10,000 nominaciones
+    python bench_seleccion_invitaciones.py 50000
+"""
+import random
+import sys
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from invitaciones import seleccionar_invitaciones
+
+VALORES = ["Respeto", "Honestidad", "Empatía", "Responsabilidad", "Solidaridad", "EXCELENCIA"]
+
+
+def generar_nominaciones(total, semilla=2025):
+    rnd = random.Random(semilla)
+    alumnos = max(1, total // 4)
+    valores = [SimpleNamespace(id=i + 1, nombre=v) for i, v in enumerate(VALORES)]
+    inicio = date(2025, 10, 1)
+
+    nominaciones = []
+    for i in range(total):
+        valor = valores[-1] if rnd.random() < 0.08 else rnd.choice(valores[:-1])
+        nominaciones.append(SimpleNamespace(
+            id=i + 1,
+            alumno_id=rnd.randint(1, alumnos),
+            valor=valor,
+            valor_id=valor.id,
+            evento_id=1,
+            tipo="alumno",
+            fecha=inicio + timedelta(days=rnd.randint(0, 20)),
+        ))
+    nominaciones.sort(key=lambda n: (n.fecha, n.id))
+    return nominaciones
+
+
+def seleccion_anterior(nominaciones):
+    """Copia de la lógica previa de generar_invitaciones_bloque_unico."""
+    filtradas = []
+    procesados = set()
+    keys = set()
+
+    for n in nominaciones:
+        if n.alumno_id in procesados:
+            continue
+
+        tiene_excelencia = any(
+            x.alumno_id == n.alumno_id and x.valor and x.valor.nombre.upper() == "EXCELENCIA"
+            for x in nominaciones
+        )
+
+        if tiene_excelencia:
+            exc = next(
+                (x for x in nominaciones
+                if x.alumno_id == n.alumno_id and x.valor and x.valor.nombre.upper() == "EXCELENCIA"),
+                None
+            )
+            if exc:
+                k = (exc.alumno_id, exc.valor_id, exc.evento_id, exc.tipo)
+                if k not in keys:
+                    filtradas.append(exc)
+                    keys.add(k)
+        else:
+            for x in nominaciones:
+                if x.alumno_id != n.alumno_id:
+                    continue
+                k = (x.alumno_id, x.valor_id, x.evento_id, x.tipo)
+                if k in keys:
+                    continue
+                filtradas.append(x)
+                keys.add(k)
+
+        procesados.add(n.alumno_id)
+
+    return filtradas
+
+
+def medir(funcion, nominaciones, repeticiones):
+    mejor = None
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        resultado = funcion(nominaciones)
+        transcurrido = time.perf_counter() - t0
+        mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+    return mejor, resultado
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    nominaciones = generar_nominaciones(total)
+
+    t_nuevo, nuevo = medir(seleccionar_invitaciones, nominaciones, 5)
+    t_anterior, anterior = medir(seleccion_anterior, nominaciones, 1)
+
+    iguales = [n.id for n in nuevo] == [n.id for n in anterior]
+    print(f"📊 {total:,} nominaciones → {len(nuevo):,} invitaciones")
+    print(f"   anterior (O(n²)): {t_anterior * 1000:10.1f} ms")
+    print(f"   una pasada (O(n)): {t_nuevo * 1000:9.1f} ms")
+    print(f"   aceleración: x{t_anterior / t_nuevo:,.0f}")
+    print("✅ Misma selección y orden" if iguales else "❌ La selección NO coincide")
+    sys.exit(0 if iguales else 1)
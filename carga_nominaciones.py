@@ -0,0 +1,367 @@
+# carga_nominaciones.py
+"""
+Prueba de carga de la "última hora" antes de fecha_cierre_nominaciones.
+
+Siembra una escuela realista (4 bloques, ~1,500 alumnos, ~120 maestros) en una base de datos
+DE PRUEBA, inicia sesión con muchos maestros simulados y golpea en paralelo:
+    nominar_alumno, nominar_alumno_individual, mis_grupos y mis_nominaciones
+Reporta por endpoint: p50/p95/p99 de latencia, peticiones por segundo, consultas SQL por
+petición y porcentaje de errores y de duplicadas. Al final revisa que la EXCELENCIA quedó
+consistente (el reconciliador no debe encontrar nada que corregir ni borrar EXCELENCIA
+registradas directamente por un maestro) y que el resumen de nominaciones coincide con
+reconstruirlo desde cero.
+
+Corre dentro del mismo proceso (cliente de pruebas de Flask, un hilo por maestro), así que
+mide la app + la base de datos sin red ni gunicorn de por medio.
+
+⚠️ Nunca usa DATABASE_URL del entorno: la base se indica con --db y se llena de datos falsos.
+
+Ejecutar:
+    python carga_nominaciones.py                                   # SQLite temporal
+    python carga_nominaciones.py --db postgresql://localhost/carga --reiniciar
+    python carga_nominaciones.py --maestros 60 --acciones 40 --hilos 16
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+VALORES = ["Respeto", "Honestidad", "Empatía", "Responsabilidad", "Solidaridad", "EXCELENCIA"]
+BLOQUES = [
+    ("BLOQUE 1", "Preescolar", ["1", "2", "3"]),
+    ("BLOQUE 2", "Primaria", ["1", "2", "3"]),
+    ("BLOQUE 3", "Primaria", ["4", "5", "6"]),
+    ("BLOQUE 4", "Secundaria", ["1", "2", "3"]),
+]
+GRUPOS = ["A", "B", "C", "D"]
+PASSWORD = "carga2025"
+
+# endpoint → peso en la mezcla de acciones de cada maestro
+MEZCLA = {
+    "nominar_alumno": 25,
+    "nominar_alumno_individual": 35,
+    "mis_grupos": 20,
+    "mis_nominaciones": 20,
+}
+REENVIO = 0.10  # probabilidad de doble envío del mismo formulario (conexión lenta)
+EXCELENCIA_DIRECTA = 0.05  # probabilidad de que un maestro nomine EXCELENCIA directamente
+
+AVISOS_DUPLICADA = ("duplicad", "Ya habías", "ya nominaste", "todas eran", "⏳")
+
+
+def parsear_argumentos():
+    p = argparse.ArgumentParser(description="Prueba de carga de nominaciones")
+    p.add_argument("--db", help="URL de la base de PRUEBA (por defecto: SQLite temporal)")
+    p.add_argument("--reiniciar", action="store_true",
+                   help="borra y recrea todas las tablas de --db antes de sembrar")
+    p.add_argument("--alumnos", type=int, default=1500)
+    p.add_argument("--maestros", type=int, default=120)
+    p.add_argument("--acciones", type=int, default=25, help="acciones por maestro")
+    p.add_argument("--hilos", type=int, default=32, help="maestros simultáneos")
+    p.add_argument("--semilla", type=int, default=2025)
+    return p.parse_args()
+
+
+# ======================================================
+# 🌱 Sembrar escuela de prueba
+# ======================================================
+def sembrar(db, modelos, total_alumnos, total_maestros, rnd):
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+
+    CicloEscolar, Bloque, Valor, Maestro, Usuario, Alumno, EventoAsamblea = modelos
+
+    ciclo = CicloEscolar(nombre="CARGA 2025-2026", activo=True)
+    db.session.add(ciclo)
+    db.session.flush()
+
+    bloques = []
+    for orden, (nombre, nivel, grados) in enumerate(BLOQUES, start=1):
+        bloque = Bloque(nombre=nombre, ciclo_id=ciclo.id, orden=orden)
+        db.session.add(bloque)
+        bloques.append((bloque, nivel, grados))
+    db.session.add_all([Valor(nombre=v, ciclo_id=ciclo.id, activo=True) for v in VALORES])
+    db.session.flush()
+
+    ahora = datetime.utcnow()
+    for bloque, _, _ in bloques:
+        db.session.add(EventoAsamblea(
+            ciclo_id=ciclo.id, bloque_id=bloque.id, mes_ordinal=1, nombre_mes="Octubre",
+            fecha_evento=date.today() + timedelta(days=7),
+            fecha_cierre_nominaciones=ahora + timedelta(hours=1),  # 🔹 la última hora
+            activo=True,
+        ))
+
+    # 🔹 Un solo hash para todos (scrypt por maestro haría la siembra lentísima)
+    password_hash = generate_password_hash(PASSWORD)
+    correos = [f"maestro{i:03d}@carga.local" for i in range(total_maestros)]
+    db.session.execute(insert(Usuario), [
+        {"nombre": f"MAESTRO {i:03d}", "email": c, "password_hash": password_hash, "rol": "profesor"}
+        for i, c in enumerate(correos)
+    ])
+    db.session.execute(insert(Maestro), [
+        {"nombre": f"MAESTRO {i:03d}", "correo": c, "ciclo_id": ciclo.id, "activo": True}
+        for i, c in enumerate(correos)
+    ])
+
+    filas = []
+    for i in range(total_alumnos):
+        bloque, nivel, grados = bloques[i % len(bloques)]
+        filas.append({
+            "nombre": f"ALUMNO {i:04d} {rnd.choice(['PEREZ', 'LOPEZ', 'CHAN', 'PECH', 'GOMEZ'])}",
+            "grado": rnd.choice(grados),
+            "grupo": rnd.choice(GRUPOS),
+            "nivel": nivel,
+            "ciclo_id": ciclo.id,
+            "bloque_id": bloque.id,
+        })
+    db.session.execute(insert(Alumno), filas)
+    db.session.commit()
+
+    valores = {v.nombre: v.id for v in Valor.query.filter_by(ciclo_id=ciclo.id)}
+    excelencia_id = valores.pop("EXCELENCIA")
+    alumnos = [a for (a,) in db.session.query(Alumno.id).filter_by(ciclo_id=ciclo.id)]
+    return ciclo.id, correos, alumnos, list(valores.values()), excelencia_id
+
+
+def sembrar_excelencia_directa(db, modelos, ciclo_id, alumno_id, valor_id, excelencia_id):
+    """Un alumno con EXCELENCIA directa y una sola nominación normal: el reconciliador no debe tocarla."""
+    from routes import registrar_cambios_excelencia
+    from utils import insertar_nominaciones
+
+    Alumno, EventoAsamblea, Maestro = modelos
+    alumno = db.session.get(Alumno, alumno_id)
+    evento = EventoAsamblea.query.filter_by(ciclo_id=ciclo_id, bloque_id=alumno.bloque_id).first()
+    maestro = Maestro.query.filter_by(ciclo_id=ciclo_id).first()
+    filas = [
+        {"alumno_id": alumno_id, "maestro_id": maestro.id, "valor_id": v, "ciclo_id": ciclo_id,
+         "evento_id": evento.id, "tipo": "alumno", "comentario": "Directa", "fecha": datetime.utcnow()}
+        for v in (excelencia_id, valor_id)
+    ]
+    creadas, _ = insertar_nominaciones(filas)
+    registrar_cambios_excelencia(ciclo_id, altas=[
+        (nuevo_id, f["alumno_id"], f["evento_id"], f["valor_id"]) for nuevo_id, f in creadas
+    ])
+    db.session.commit()
+
+
+# ======================================================
+# 📊 Métricas por endpoint (thread-safe)
+# ======================================================
+class Metricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.datos = {}
+        self.reenvios = 0
+        self.reenvios_con_escritura = 0
+
+    def registrar(self, endpoint, segundos, consultas, error=False, duplicada=False):
+        with self._lock:
+            d = self.datos.setdefault(endpoint, {
+                "latencias": [], "consultas": 0, "errores": 0, "duplicadas": 0,
+            })
+            d["latencias"].append(segundos)
+            d["consultas"] += consultas
+            d["errores"] += int(error)
+            d["duplicadas"] += int(duplicada)
+
+    def registrar_reenvio(self, escribio):
+        with self._lock:
+            self.reenvios += 1
+            self.reenvios_con_escritura += int(escribio)
+
+
+def percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    indice = max(0, min(len(ordenados) - 1, int(round(p / 100 * len(ordenados) + 0.5)) - 1))
+    return ordenados[indice]
+
+
+def imprimir_reporte(metricas, duracion):
+    print()
+    print(f"{'endpoint':<28}{'n':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'req/s':>8}{'SQL/req':>9}{'err %':>7}{'dup %':>7}")
+    total = 0
+    for endpoint in sorted(metricas.datos):
+        d = metricas.datos[endpoint]
+        lat = sorted(d["latencias"])
+        n = len(lat)
+        total += n
+        print(f"{endpoint:<28}{n:>6}"
+              f"{percentil(lat, 50) * 1000:>9.1f}{percentil(lat, 95) * 1000:>9.1f}{percentil(lat, 99) * 1000:>9.1f}"
+              f"{n / duracion:>8.1f}{d['consultas'] / n:>9.1f}"
+              f"{d['errores'] * 100 / n:>7.1f}{d['duplicadas'] * 100 / n:>7.1f}")
+    print(f"\n⏱️ {total} peticiones en {duracion:.1f} s → {total / duracion:.1f} req/s")
+    print(f"🔁 {metricas.reenvios} dobles envíos; {metricas.reenvios_con_escritura} llegaron a escribir en nominaciones")
+
+
+# ======================================================
+# 👩‍🏫 Un maestro simulado
+# ======================================================
+def sesion_maestro(app, correo, alumnos, valores, excelencia_id, acciones, semilla, metricas, consultas_hilo):
+    rnd = random.Random(semilla)
+    cliente = app.test_client()
+
+    def medir(endpoint, hacer, reenvio=False):
+        consultas_hilo.n = 0
+        consultas_hilo.escrituras = 0
+        inicio = time.perf_counter()
+        error = duplicada = False
+        try:
+            respuesta = hacer()
+            error = respuesta.status_code >= 500
+            with cliente.session_transaction() as sesion:
+                mensajes = " ".join(m for _, m in sesion.pop("_flashes", []))
+            duplicada = any(aviso in mensajes for aviso in AVISOS_DUPLICADA)
+        except Exception as e:
+            print(f"⚠️ {endpoint}: {e}")
+            error = True
+        metricas.registrar(endpoint, time.perf_counter() - inicio, consultas_hilo.n, error, duplicada)
+        if reenvio:
+            metricas.registrar_reenvio(consultas_hilo.escrituras > 0)
+
+    medir("login", lambda: cliente.post("/login", data={"email": correo, "password": PASSWORD}))
+
+    endpoints = list(MEZCLA)
+    pesos = [MEZCLA[e] for e in endpoints]
+    for _ in range(acciones):
+        endpoint = rnd.choices(endpoints, pesos)[0]
+        token = uuid.uuid4().hex
+        envios = 2 if rnd.random() < REENVIO else 1
+
+        if endpoint == "nominar_alumno":
+            datos = {
+                "valor_id": str(rnd.choice(valores)),
+                "alumnos": [str(a) for a in rnd.sample(alumnos, rnd.randint(2, 6))],
+                "comentario": "Carga masiva",
+                "token_envio": token,
+            }
+            for envio in range(envios):
+                medir(endpoint, lambda: cliente.post("/nominaciones/alumno", data=datos), envio > 0)
+        elif endpoint == "nominar_alumno_individual":
+            alumno_id = rnd.choice(alumnos)
+            valor_id = excelencia_id if rnd.random() < EXCELENCIA_DIRECTA else rnd.choice(valores)
+            datos = {"valor_id": str(valor_id), "comentario": "Carga", "token_envio": token}
+            for envio in range(envios):
+                medir(endpoint, lambda: cliente.post(f"/nominacion_alumno/{alumno_id}", data=datos), envio > 0)
+        elif endpoint == "mis_grupos":
+            medir(endpoint, lambda: cliente.get("/mis_grupos"))
+        else:
+            medir(endpoint, lambda: cliente.get("/mis_nominaciones"))
+
+
+def main():
+    args = parsear_argumentos()
+    url = args.db or "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="carga_"), "carga.db")
+    os.environ["DATABASE_URL"] = url  # 👈 antes de importar la app
+
+    from sqlalchemy import event
+    from app import app
+    from extensions import db
+    from models import (
+        Alumno, Bloque, CicloEscolar, EventoAsamblea, Maestro, Nominacion, ResumenNominacion, Usuario, Valor,
+    )
+    from routes import reconciliar_excelencia
+    from utils import MARCA_EXCELENCIA_AUTOMATICA, reconstruir_resumen_nominaciones
+
+    app.config["TESTING"] = True
+    rnd = random.Random(args.semilla)
+
+    with app.app_context():
+        if args.reiniciar:
+            db.drop_all()
+            db.create_all()
+        elif CicloEscolar.query.first() is not None:
+            print("⚠️ La base ya tiene datos. Usa una base vacía o --reiniciar (¡borra todo!).")
+            sys.exit(1)
+
+        t0 = time.perf_counter()
+        ciclo_id, correos, alumnos, valores, excelencia_id = sembrar(
+            db, (CicloEscolar, Bloque, Valor, Maestro, Usuario, Alumno, EventoAsamblea),
+            args.alumnos, args.maestros, rnd,
+        )
+        sembrar_excelencia_directa(
+            db, (Alumno, EventoAsamblea, Maestro), ciclo_id, alumnos[0], valores[0], excelencia_id,
+        )
+        print(f"🌱 {len(alumnos)} alumnos y {len(correos)} maestros sembrados en "
+              f"{time.perf_counter() - t0:.1f} s ({db.engine.dialect.name})")
+
+        consultas_hilo = threading.local()
+
+        @event.listens_for(db.engine, "before_cursor_execute")
+        def contar(conexion, cursor, sentencia, *_):
+            consultas_hilo.n = getattr(consultas_hilo, "n", 0) + 1
+            if sentencia.lstrip().upper().startswith("INSERT INTO NOMINACIONES"):
+                consultas_hilo.escrituras = getattr(consultas_hilo, "escrituras", 0) + 1
+
+    metricas = Metricas()
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.hilos) as ejecutor:
+        futuros = [
+            ejecutor.submit(
+                sesion_maestro, app, correo, alumnos, valores, excelencia_id, args.acciones,
+                args.semilla + i, metricas, consultas_hilo,
+            )
+            for i, correo in enumerate(correos)
+        ]
+        for futuro in futuros:
+            futuro.result()
+    duracion = time.perf_counter() - inicio
+
+    imprimir_reporte(metricas, duracion)
+
+    with app.app_context():
+        nominaciones = Nominacion.query.filter_by(ciclo_id=ciclo_id).count()
+
+        # 📈 El resumen mantenido en caliente debe ser igual a reconstruirlo desde cero
+        def foto_resumen():
+            return set(db.session.query(
+                ResumenNominacion.evento_id, ResumenNominacion.tipo, ResumenNominacion.alumno_id,
+                ResumenNominacion.maestro_nominado_id, ResumenNominacion.valor_id,
+                ResumenNominacion.nominaciones, ResumenNominacion.primera_fecha, ResumenNominacion.ultima_fecha,
+            ).filter_by(ciclo_id=ciclo_id).all())
+
+        en_caliente = foto_resumen()
+        reconstruir_resumen_nominaciones(ciclo_id)
+        desvios_resumen = len(en_caliente ^ foto_resumen())
+        db.session.rollback()
+
+        # 🏅 Las EXCELENCIA directas (sin la marca de la promoción automática) deben sobrevivir
+        def contar_directas():
+            return Nominacion.query.filter(
+                Nominacion.ciclo_id == ciclo_id,
+                Nominacion.valor_id == excelencia_id,
+                ~Nominacion.comentario.contains(MARCA_EXCELENCIA_AUTOMATICA),
+            ).count()
+
+        directas = contar_directas()
+        reporte = reconciliar_excelencia(ciclo_id)
+        db.session.commit()
+        directas_borradas = directas - contar_directas()
+        cambios = len(reporte["promovidos"]) + len(reporte["revertidos"]) + reporte["repetidas_eliminadas"]
+        print(f"📝 {nominaciones} nominaciones en la base")
+        if desvios_resumen:
+            print(f"❌ Resumen de nominaciones inconsistente: {desvios_resumen} filas difieren de la reconstrucción")
+        else:
+            print("✅ Resumen de nominaciones consistente con la reconstrucción")
+        if cambios:
+            print(f"❌ EXCELENCIA inconsistente: el reconciliador corrigió {cambios} casos")
+        else:
+            print("✅ EXCELENCIA consistente (el reconciliador no encontró nada que corregir)")
+        if directas_borradas:
+            print(f"❌ El reconciliador borró {directas_borradas} de {directas} EXCELENCIA directas")
+        else:
+            print(f"✅ {directas} EXCELENCIA directas intactas")
+
+    sys.exit(1 if cambios or desvios_resumen or directas_borradas else 0)
+
+
+if __name__ == "__main__":
+    main()
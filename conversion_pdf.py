@@ -0,0 +1,475 @@
+# conversion_pdf.py
+"""
+Conversión DOCX → PDF con LibreOffice headless, usando las mismas plantillas .docx.
+
+Cada worker web mantiene un pequeño pool de procesos `soffice` de larga vida (uno por
+hilo de conversión, cada uno con su propio perfil). El arranque de LibreOffice se paga
+una sola vez; después cada documento se convierte por UNO sin lanzar procesos nuevos.
+
+El módulo `uno` casi nunca está en el virtualenv (viene con LibreOffice / python3-uno, para
+el python del sistema). Modos, en orden de preferencia:
+    uno     el intérprete de la app importa `uno`: se habla con soffice directamente
+    puente  otro intérprete sí tiene `uno` (SOFFICE_PYTHON, el python que trae LibreOffice o
+            /usr/bin/python3): cada soffice lo maneja un proceso puente que corre este mismo
+            archivo (`python conversion_pdf.py --puente N`) y recibe pedidos por stdin/stdout
+    cli     ningún intérprete tiene `uno`: `soffice --convert-to` por lotes de LOTE_CLI
+            documentos. Arranca LibreOffice en cada lote; se avisa en el log.
+
+Variables de entorno:
+    SOFFICE_BIN     ruta al ejecutable (por defecto: soffice / libreoffice en el PATH)
+    SOFFICE_PYTHON  intérprete con el módulo uno para el modo puente
+    PDF_WORKERS     procesos soffice por worker web (por defecto 2)
+"""
+import atexit
+import json
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+LOTE_CLI = 25
+ESPERA_ARRANQUE = 30  # segundos para que soffice acepte conexiones
+TIEMPO_MAXIMO_CLI = 600
+
+
+def ejecutable_soffice():
+    return os.getenv("SOFFICE_BIN") or shutil.which("soffice") or shutil.which("libreoffice")
+
+
+def pdf_disponible():
+    """True si hay LibreOffice instalado en el servidor."""
+    return ejecutable_soffice() is not None
+
+
+def workers_pdf():
+    try:
+        return max(1, int(os.getenv("PDF_WORKERS", "2")))
+    except ValueError:
+        return 2
+
+
+def _tiene_uno():
+    try:
+        import uno  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+_python_uno = []  # [ruta | None] una vez detectado
+
+
+def python_uno():
+    """Intérprete externo que puede importar `uno` (para el modo puente), o None."""
+    if _python_uno:
+        return _python_uno[0]
+
+    candidatos = [os.getenv("SOFFICE_PYTHON")]
+    soffice = ejecutable_soffice()
+    if soffice:
+        carpeta = os.path.dirname(os.path.realpath(soffice))
+        candidatos += [os.path.join(carpeta, "python"), os.path.join(carpeta, "python.exe")]
+    candidatos.append("/usr/bin/python3")
+
+    encontrado = None
+    for candidato in candidatos:
+        if not candidato or not os.path.exists(candidato):
+            continue
+        try:
+            prueba = subprocess.run(
+                [candidato, "-c", "import uno"],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=30,
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            continue
+        if prueba.returncode == 0:
+            encontrado = candidato
+            break
+    _python_uno.append(encontrado)
+    return encontrado
+
+
+def modo_pdf():
+    """'uno', 'puente' o 'cli' (ver el docstring del módulo)."""
+    if _tiene_uno():
+        return "uno"
+    return "puente" if python_uno() else "cli"
+
+
+def _puerto_libre():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class ErrorDocumento(RuntimeError):
+    """Falló un documento, pero el proceso soffice sigue sano (no hay que reiniciarlo)."""
+
+
+def _nombre_pdf(nombre):
+    base, _ = os.path.splitext(nombre)
+    return f"{base}.pdf"
+
+
+# ======================================================
+# 🖨️ Un proceso soffice de larga vida (conexión UNO)
+# ======================================================
+class ServidorSoffice:
+    def __init__(self, indice):
+        self.indice = indice
+        self.perfil = tempfile.mkdtemp(prefix=f"soffice_{os.getpid()}_{indice}_")
+        self.proceso = None
+        self.escritorio = None
+        self.conversiones = 0
+
+    def vivo(self):
+        return self.proceso is not None and self.proceso.poll() is None
+
+    def iniciar(self):
+        import uno
+
+        puerto = _puerto_libre()
+        self.proceso = subprocess.Popen(
+            [
+                ejecutable_soffice(),
+                "--headless", "--invisible", "--nologo", "--norestore",
+                "--nodefault", "--nolockcheck",
+                f"-env:UserInstallation={uno.systemPathToFileUrl(self.perfil)}",
+                f"--accept=socket,host=127.0.0.1,port={puerto};urp;StarOffice.ComponentContext",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local
+        )
+        limite = time.monotonic() + ESPERA_ARRANQUE
+        while True:
+            try:
+                ctx = resolver.resolve(
+                    f"uno:socket,host=127.0.0.1,port={puerto};urp;StarOffice.ComponentContext"
+                )
+                self.escritorio = ctx.ServiceManager.createInstanceWithContext(
+                    "com.sun.star.frame.Desktop", ctx
+                )
+                print(f"🖨️ soffice #{self.indice} listo (pid {self.proceso.pid}, puerto {puerto})")
+                return
+            except Exception:
+                if self.proceso.poll() is not None or time.monotonic() > limite:
+                    self.detener()
+                    raise RuntimeError("LibreOffice no respondió al iniciar.")
+                time.sleep(0.25)
+
+    def convertir(self, ruta_docx, ruta_pdf):
+        import uno
+        from com.sun.star.beans import PropertyValue
+
+        def prop(nombre, valor):
+            p = PropertyValue()
+            p.Name = nombre
+            p.Value = valor
+            return p
+
+        if not self.vivo():
+            self.iniciar()
+
+        doc = self.escritorio.loadComponentFromURL(
+            uno.systemPathToFileUrl(os.path.abspath(ruta_docx)), "_blank", 0,
+            (prop("Hidden", True), prop("ReadOnly", True)),
+        )
+        try:
+            doc.storeToURL(
+                uno.systemPathToFileUrl(os.path.abspath(ruta_pdf)),
+                (prop("FilterName", "writer_pdf_Export"),),
+            )
+        finally:
+            doc.close(True)
+        self.conversiones += 1
+
+    def detener(self):
+        if self.proceso is not None and self.proceso.poll() is None:
+            self.proceso.terminate()
+            try:
+                self.proceso.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proceso.kill()
+        self.proceso = None
+        self.escritorio = None
+
+    def eliminar_perfil(self):
+        shutil.rmtree(self.perfil, ignore_errors=True)
+
+
+# ======================================================
+# 🌉 Puente: soffice manejado desde un intérprete que sí tiene uno
+# ======================================================
+def atender_puente(entrada, salida, servidor):
+    """
+    Lado del puente: una línea JSON por pedido {"docx", "pdf"} y una línea JSON de respuesta
+    ({"ok": true} o {"error": "..."}). Termina cuando se cierra la entrada.
+    """
+    for linea in entrada:
+        if not linea.strip():
+            continue
+        try:
+            pedido = json.loads(linea)
+            servidor.convertir(pedido["docx"], pedido["pdf"])
+            respuesta = {"ok": True}
+        except Exception as e:
+            servidor.detener()  # 🔹 se vuelve a levantar en el siguiente pedido
+            respuesta = {"error": str(e) or e.__class__.__name__}
+        salida.write(json.dumps(respuesta) + "\n")
+        salida.flush()
+
+
+class PuenteSoffice:
+    """
+    Mismo papel que ServidorSoffice, pero el soffice y la conexión UNO viven en un proceso
+    puente (python_uno()). El puente y su soffice se reutilizan para todas las conversiones.
+    """
+
+    def __init__(self, indice):
+        self.indice = indice
+        self.proceso = None
+        self.conversiones = 0
+
+    def vivo(self):
+        return self.proceso is not None and self.proceso.poll() is None
+
+    def comando(self):
+        return [python_uno(), os.path.abspath(__file__), "--puente", str(self.indice)]
+
+    def iniciar(self):
+        self.proceso = subprocess.Popen(
+            self.comando(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+
+    def convertir(self, ruta_docx, ruta_pdf):
+        if not self.vivo():
+            self.iniciar()
+
+        pedido = {"docx": os.path.abspath(ruta_docx), "pdf": os.path.abspath(ruta_pdf)}
+        try:
+            self.proceso.stdin.write(json.dumps(pedido) + "\n")
+            self.proceso.stdin.flush()
+            linea = self.proceso.stdout.readline()
+        except OSError:
+            linea = ""
+        if not linea:
+            self.detener()
+            raise RuntimeError("El puente de LibreOffice terminó inesperadamente.")
+
+        respuesta = json.loads(linea)
+        if "error" in respuesta:
+            raise ErrorDocumento(respuesta["error"])  # 🔹 el puente ya reinició su soffice
+        self.conversiones += 1
+
+    def detener(self):
+        if self.proceso is not None and self.proceso.poll() is None:
+            try:
+                self.proceso.stdin.close()  # 🔹 el puente termina su soffice y sale
+                self.proceso.wait(timeout=15)
+            except (OSError, subprocess.TimeoutExpired):
+                self.proceso.kill()
+        self.proceso = None
+
+    def eliminar_perfil(self):
+        pass  # el perfil es del puente; lo borra al salir
+
+
+# ======================================================
+# ⚙️ Pool de procesos soffice (uno por hilo de conversión)
+# ======================================================
+class PoolSoffice:
+    """
+    fabrica(indice) crea cada servidor (ServidorSoffice en modo uno, PuenteSoffice en modo
+    puente); cualquier objeto con convertir/detener/eliminar_perfil/vivo sirve.
+    """
+
+    def __init__(self, tamano=None, fabrica=None):
+        self.tamano = tamano or workers_pdf()
+        self.fabrica = fabrica
+        self._libres = queue.Queue()
+        self._servidores = []
+        self._ejecutor = None
+        self._lock = threading.Lock()
+        self._aviso_cli = False
+
+    def modo(self):
+        return "pool" if self.fabrica is not None else modo_pdf()
+
+    def _asegurar(self):
+        with self._lock:
+            if self._ejecutor is None:
+                fabrica = self.fabrica
+                if fabrica is None:
+                    fabrica = PuenteSoffice if modo_pdf() == "puente" else ServidorSoffice
+                for i in range(self.tamano):
+                    servidor = fabrica(i)
+                    self._servidores.append(servidor)
+                    self._libres.put(servidor)
+                self._ejecutor = ThreadPoolExecutor(
+                    max_workers=self.tamano, thread_name_prefix="soffice"
+                )
+            return self._ejecutor
+
+    def _avisar_modo_cli(self):
+        if not self._aviso_cli:
+            self._aviso_cli = True
+            print(
+                "⚠️ PDF en modo CLI: ningún intérprete tiene el módulo `uno`, así que LibreOffice "
+                f"arranca de nuevo cada {LOTE_CLI} documentos. Instala python3-uno o define "
+                "SOFFICE_PYTHON para usar el pool de soffice de larga vida."
+            )
+
+    def _convertir_documento(self, nombre, contenido):
+        servidor = self._libres.get()
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                ruta_docx = os.path.join(tmp, "invitacion.docx")
+                ruta_pdf = os.path.join(tmp, "invitacion.pdf")
+                with open(ruta_docx, "wb") as f:
+                    f.write(contenido)
+                servidor.convertir(ruta_docx, ruta_pdf)
+                with open(ruta_pdf, "rb") as f:
+                    return _nombre_pdf(nombre), f.read(), None
+        except ErrorDocumento as e:
+            return _nombre_pdf(nombre), None, str(e)
+        except Exception as e:
+            servidor.detener()  # 🔹 se vuelve a levantar en la siguiente conversión
+            return _nombre_pdf(nombre), None, str(e)
+        finally:
+            self._libres.put(servidor)
+
+    def _convertir_cli(self, lote):
+        """Un solo `soffice --convert-to pdf` para todo el lote (perfil reutilizado)."""
+        self._asegurar()
+        servidor = self._libres.get()
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                rutas = []
+                for i, (_, contenido) in enumerate(lote):
+                    ruta = os.path.join(tmp, f"{i:05d}.docx")
+                    with open(ruta, "wb") as f:
+                        f.write(contenido)
+                    rutas.append(ruta)
+
+                proceso = subprocess.run(
+                    [
+                        ejecutable_soffice(), "--headless", "--norestore", "--nolockcheck",
+                        f"-env:UserInstallation=file://{servidor.perfil}",
+                        "--convert-to", "pdf", "--outdir", tmp, *rutas,
+                    ],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                    timeout=TIEMPO_MAXIMO_CLI,
+                )
+
+                resultados = []
+                for (nombre, _), ruta in zip(lote, rutas):
+                    ruta_pdf = ruta[:-len(".docx")] + ".pdf"
+                    if os.path.exists(ruta_pdf):
+                        with open(ruta_pdf, "rb") as f:
+                            resultados.append((_nombre_pdf(nombre), f.read(), None))
+                    else:
+                        error = proceso.stderr.decode(errors="ignore").strip() or "sin PDF de salida"
+                        resultados.append((_nombre_pdf(nombre), None, error))
+                return resultados
+        except Exception as e:
+            return [(_nombre_pdf(nombre), None, str(e)) for nombre, _ in lote]
+        finally:
+            self._libres.put(servidor)
+
+    def convertir(self, documentos):
+        """
+        Recibe un iterable de (nombre.docx, bytes) y genera (nombre.pdf, bytes | None, error | None)
+        en el MISMO orden. Va consumiendo la entrada conforme avanza, así que puede encadenarse
+        con el render en paralelo y el ZIP en streaming.
+        """
+        if not pdf_disponible():
+            raise RuntimeError("LibreOffice (soffice) no está instalado en el servidor.")
+
+        if self.modo() == "cli":
+            self._avisar_modo_cli()
+            lote = []
+            for doc in documentos:
+                lote.append(doc)
+                if len(lote) >= LOTE_CLI:
+                    yield from self._convertir_cli(lote)
+                    lote = []
+            if lote:
+                yield from self._convertir_cli(lote)
+            return
+
+        ejecutor = self._asegurar()
+        en_vuelo = deque()
+        for nombre, contenido in documentos:
+            en_vuelo.append(ejecutor.submit(self._convertir_documento, nombre, contenido))
+            if len(en_vuelo) >= self.tamano * 2:
+                yield en_vuelo.popleft().result()
+        while en_vuelo:
+            yield en_vuelo.popleft().result()
+
+    def detener(self):
+        with self._lock:
+            for servidor in self._servidores:
+                servidor.detener()
+                servidor.eliminar_perfil()
+            if self._ejecutor is not None:
+                self._ejecutor.shutdown(wait=False, cancel_futures=True)
+            self._servidores = []
+            self._libres = queue.Queue()
+            self._ejecutor = None
+
+    def estadisticas(self):
+        return {
+            "disponible": pdf_disponible(),
+            "modo": self.modo(),
+            "procesos": [
+                {
+                    "indice": s.indice,
+                    "pid": s.proceso.pid if s.vivo() else None,
+                    "conversiones": s.conversiones,
+                }
+                for s in self._servidores
+            ],
+            "pid": os.getpid(),
+        }
+
+
+pool_pdf = PoolSoffice()
+atexit.register(pool_pdf.detener)
+
+
+def convertir_a_pdf(documentos):
+    """Atajo: (nombre.docx, bytes) → (nombre.pdf, bytes); los errores se reportan y se omiten."""
+    for nombre, contenido, error in pool_pdf.convertir(documentos):
+        if error:
+            print(f"⚠️ Error convirtiendo a PDF {nombre}: {error}")
+            continue
+        yield nombre, contenido
+
+
+if __name__ == "__main__" and sys.argv[1:2] == ["--puente"]:
+    # 🌉 Proceso puente: stdout queda solo para el protocolo; los avisos van a stderr
+    salida = sys.stdout
+    sys.stdout = sys.stderr
+    servidor = ServidorSoffice(int(sys.argv[2]) if len(sys.argv) > 2 else 0)
+    try:
+        atender_puente(sys.stdin, salida, servidor)
+    finally:
+        servidor.detener()
+        servidor.eliminar_perfil()
@@ -0,0 +1,723 @@
+# invitaciones.py
+import atexit
+import copy
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from docx import Document
+from docxtpl import DocxTemplate, RichText
+
+CARPETA_PLANTILLAS = "docx_templates"
+CARPETA_INVITACIONES = "invitaciones"
+PLANTILLA_ALUMNO = "formato_asamblea.docx"
+PLANTILLA_PERSONAL = "invitacion colaborador 1.docx"
+
+
+# ======================================================
+# 🗂️ Caché de plantillas DOCX (una por worker)
+# ======================================================
+class CachePlantillas:
+    """
+    Carga cada plantilla .docx una sola vez (por ruta + mtime) y entrega
+    copias independientes del documento ya parseado para renderizar.
+    """
+
+    def __init__(self, carpeta=CARPETA_PLANTILLAS):
+        self.carpeta = carpeta
+        self._plantillas = {}  # ruta -> (mtime, Document)
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _cargar(self, ruta):
+        mtime = os.path.getmtime(ruta)
+        with self._lock:
+            cacheada = self._plantillas.get(ruta)
+            if cacheada and cacheada[0] == mtime:
+                self.aciertos += 1
+                return cacheada[1]
+
+            # 🔹 Primera vez (o el archivo cambió en disco): unzip + parseo XML
+            documento = Document(ruta)
+            self._plantillas[ruta] = (mtime, documento)
+            self.fallos += 1
+            return documento
+
+    def obtener(self, nombre):
+        """Devuelve un DocxTemplate listo para render() sin volver a leer el .docx."""
+        ruta = os.path.join(self.carpeta, nombre)
+        original = self._cargar(ruta)
+
+        doc = DocxTemplate(ruta)
+        doc.docx = copy.deepcopy(original)  # ✅ copia independiente: render() no toca el original
+        return doc
+
+    def limpiar(self):
+        with self._lock:
+            self._plantillas.clear()
+            self.aciertos = 0
+            self.fallos = 0
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "plantillas": sorted(os.path.basename(r) for r in self._plantillas),
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "pid": os.getpid(),
+            }
+
+
+cache_plantillas = CachePlantillas()
+
+
+def plantilla_docx(nombre):
+    """Atajo para obtener una copia renderizable de la plantilla desde la caché del worker."""
+    return cache_plantillas.obtener(nombre)
+
+
+# ======================================================
+# 🏷️ Nombres visibles y nombres de archivo
+# ======================================================
+PARTICULAS_NOMBRE = {"de", "del", "la", "las", "los", "y", "e", "da", "dos", "do", "di", "van", "von"}
+
+
+def nombre_bonito(nombre):
+    """
+    Convierte: 'ADRIAN ISAAC MENDEZ' -> 'Adrian Isaac Mendez' (SOLO VISUAL).
+    Respeta conectores comunes: de, del, la, las, los, y, e, etc.
+    """
+    if not nombre:
+        return ""
+
+    s = re.sub(r"\s+", " ", str(nombre).strip())
+    out = []
+    for i, p in enumerate(s.split(" ")):
+        pl = p.lower()
+        if i > 0 and pl in PARTICULAS_NOMBRE:
+            out.append(pl)
+        else:
+            # Capitalizar conservando acentos
+            out.append(pl[:1].upper() + pl[1:])
+    return " ".join(out)
+
+
+def slug(s, vacio="archivo"):
+    """Texto seguro para nombres de archivo (.docx / .zip)."""
+    s = re.sub(r"[^\w\-\.]+", "_", (s or "").strip())
+    return s[:80] or vacio
+
+
+# ======================================================
+# 🎯 Selección de invitaciones
+# ======================================================
+def es_excelencia(n):
+    return bool(n.valor and (n.valor.nombre or "").upper() == "EXCELENCIA")
+
+
+def seleccionar_invitaciones(nominaciones):
+    """
+    Decide qué nominaciones generan invitación, en O(n) y respetando el orden de entrada
+    (se espera fecha ascendente):
+    - Alumno con EXCELENCIA → solo su primera EXCELENCIA.
+    - Alumno sin EXCELENCIA → todas sus nominaciones distintas por (valor, evento, tipo).
+    - Personal (o sin alumno) → cada nominación tal cual.
+    Los alumnos salen en el orden de su primera nominación.
+    """
+    grupos = {}  # clave -> [excelencia, distintas, vistos]
+    for n in nominaciones:
+        if (n.tipo or "alumno").lower() != "alumno" or not n.alumno_id:
+            grupos[("nominacion", n.id)] = [None, [n], None]
+            continue
+
+        grupo = grupos.setdefault(("alumno", n.alumno_id), [None, [], set()])
+        if es_excelencia(n):
+            if grupo[0] is None:
+                grupo[0] = n
+            continue
+
+        k = (n.valor_id, n.evento_id, n.tipo)
+        if k not in grupo[2]:
+            grupo[2].add(k)
+            grupo[1].append(n)
+
+    seleccion = []
+    for excelencia, distintas, _ in grupos.values():
+        if excelencia is not None:
+            seleccion.append(excelencia)
+        else:
+            seleccion.extend(distintas)
+    return seleccion
+
+
+def seleccionar_invitaciones_ids(nominaciones):
+    """
+    Regla de la descarga por IDs seleccionados (distinta de la del bloque, a propósito):
+    - Personal primero, tal cual; luego las de alumno sin alumno_id.
+    - Alumno con EXCELENCIA → solo la más antigua (por fecha).
+    - Alumno sin EXCELENCIA → sus nominaciones por fecha, una por valor (aunque cambie el evento).
+    - Otros tipos (o sin tipo) no generan invitación.
+    Los alumnos salen en el orden en que aparecen en la lista recibida.
+    """
+    personales, sin_alumno, grupos = [], [], {}
+    for n in nominaciones:
+        tipo = (n.tipo or "").lower()
+        if tipo == "personal":
+            personales.append(n)
+        elif tipo == "alumno":
+            if n.alumno_id:
+                grupos.setdefault(n.alumno_id, []).append(n)
+            else:
+                sin_alumno.append(n)
+
+    seleccion = personales + sin_alumno
+    for arr in grupos.values():
+        arr.sort(key=lambda x: x.fecha or date.min)
+        excelencia = next((x for x in arr if es_excelencia(x)), None)
+        if excelencia is not None:
+            seleccion.append(excelencia)
+            continue
+
+        vistos = set()
+        for x in arr:
+            if x.valor_id not in vistos:
+                vistos.add(x.valor_id)
+                seleccion.append(x)
+    return seleccion
+
+
+# ======================================================
+# 🖨️ Render de invitaciones (contexto plano → bytes DOCX)
+# ======================================================
+def texto_enriquecido(segmentos):
+    """
+    Representación serializable de un RichText: lista de (texto, estilo).
+    Se convierte a RichText dentro del proceso que renderiza.
+    """
+    return {"_richtext": [(texto, dict(estilo)) for texto, estilo in segmentos]}
+
+
+def _preparar_contexto(contexto):
+    listo = {}
+    for clave, valor in contexto.items():
+        if isinstance(valor, dict) and "_richtext" in valor:
+            rt = RichText()
+            for texto, estilo in valor["_richtext"]:
+                rt.add(texto, **estilo)
+            valor = rt
+        listo[clave] = valor
+    return listo
+
+
+def renderizar_invitacion(plantilla, contexto):
+    """Renderiza una plantilla con un contexto plano (dict) y devuelve los bytes del .docx."""
+    doc = plantilla_docx(plantilla)
+    doc.render(_preparar_contexto(contexto))
+    salida = io.BytesIO()
+    doc.save(salida)
+    return salida.getvalue()
+
+
+def _renderizar_trabajo(trabajo):
+    nombre, plantilla, contexto = trabajo
+    try:
+        return nombre, renderizar_invitacion(plantilla, contexto), None
+    except Exception as e:
+        return nombre, None, str(e)
+
+
+def _renderizar_lote(lote):
+    return [_renderizar_trabajo(t) for t in lote]
+
+
+# ======================================================
+# ⚙️ Pool de procesos para renderizar en paralelo
+# ======================================================
+_ejecutor = None
+_ejecutor_lock = threading.Lock()
+MAX_LOTE_RENDER = 8  # invitaciones por envío al pool (acota los bytes en vuelo)
+
+
+def workers_render():
+    """Número de procesos de render (INVITACIONES_WORKERS, por defecto = núcleos)."""
+    try:
+        return max(1, int(os.getenv("INVITACIONES_WORKERS", os.cpu_count() or 1)))
+    except ValueError:
+        return os.cpu_count() or 1
+
+
+def ejecutor_render():
+    """Pool compartido por el worker; se crea la primera vez que se necesita."""
+    global _ejecutor
+    with _ejecutor_lock:
+        if _ejecutor is None:
+            # 'spawn': los hijos no heredan conexiones de BD ni hilos del worker web
+            _ejecutor = ProcessPoolExecutor(
+                max_workers=workers_render(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _ejecutor
+
+
+def _cerrar_ejecutor():
+    global _ejecutor
+    if _ejecutor is not None:
+        _ejecutor.shutdown(wait=False, cancel_futures=True)
+        _ejecutor = None
+
+
+atexit.register(_cerrar_ejecutor)
+
+
+def _resultados_pool(trabajos):
+    """
+    Genera (nombre_archivo, bytes | None, error | None) por cada trabajo, en el MISMO orden
+    de entrada. Usa el pool de procesos cuando hay más de un worker y más de un trabajo.
+    Solo hay ~2 × workers lotes en vuelo: los bytes pendientes no crecen con el total.
+    """
+    if not trabajos:
+        return
+
+    workers = workers_render()
+    if workers <= 1 or len(trabajos) == 1:
+        yield from map(_renderizar_trabajo, trabajos)
+        return
+
+    tamano_lote = max(1, min(MAX_LOTE_RENDER, len(trabajos) // (workers * 4)))
+    ejecutor = ejecutor_render()
+    en_vuelo = deque()
+    for inicio in range(0, len(trabajos), tamano_lote):
+        en_vuelo.append(ejecutor.submit(_renderizar_lote, trabajos[inicio:inicio + tamano_lote]))
+        if len(en_vuelo) >= workers * 2:
+            yield from en_vuelo.popleft().result()
+    while en_vuelo:
+        yield from en_vuelo.popleft().result()
+
+
+def resultados_render(trabajos, ciclo=None):
+    """
+    Igual que el pool, pero si se indica el ciclo reutiliza las invitaciones ya renderizadas
+    (caché en disco) y solo manda a renderizar las que cambiaron.
+    """
+    trabajos = list(trabajos)
+    if ciclo is None:
+        return _resultados_pool(trabajos)
+    return _resultados_con_cache(trabajos, str(ciclo))
+
+
+def renderizar_en_paralelo(trabajos, ciclo=None):
+    """
+    Recibe una lista de (nombre_archivo, plantilla, contexto) y genera (nombre_archivo, bytes)
+    en el MISMO orden de entrada. Los errores se reportan y esa invitación se omite.
+    """
+    for nombre, contenido, error in resultados_render(trabajos, ciclo):
+        if error:
+            print(f"⚠️ Error generando invitación {nombre}: {error}")
+            continue
+        yield nombre, contenido
+
+
+# ======================================================
+# 🧾 Caché de invitaciones renderizadas (direccionada por contenido)
+# ======================================================
+class CacheInvitaciones:
+    """
+    Guarda cada .docx renderizado en invitaciones/<ciclo>/cache/<hash>.docx, donde el hash
+    sale del digest de la plantilla + el contexto. Si nada cambió, se reutilizan los bytes.
+    El mtime del archivo marca el último uso para desalojar por LRU al pasar el límite.
+    """
+
+    def __init__(self, carpeta=CARPETA_INVITACIONES, limite_mb=None):
+        self.carpeta = carpeta
+        if limite_mb is None:
+            try:
+                limite_mb = int(os.getenv("INVITACIONES_CACHE_MB", "512"))
+            except ValueError:
+                limite_mb = 512
+        self.limite_bytes = limite_mb * 1024 * 1024
+        self._digests = {}  # ruta plantilla -> (mtime, sha256)
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def carpeta_ciclo(self, ciclo):
+        return os.path.join(self.carpeta, str(ciclo), "cache")
+
+    def _digest_plantilla(self, nombre):
+        ruta = os.path.join(CARPETA_PLANTILLAS, nombre)
+        mtime = os.path.getmtime(ruta)
+        with self._lock:
+            guardado = self._digests.get(ruta)
+            if guardado and guardado[0] == mtime:
+                return guardado[1]
+
+        with open(ruta, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        with self._lock:
+            self._digests[ruta] = (mtime, digest)
+        return digest
+
+    def clave(self, plantilla, contexto):
+        contenido = json.dumps(contexto, sort_keys=True, ensure_ascii=False, default=str)
+        h = hashlib.sha256()
+        h.update(self._digest_plantilla(plantilla).encode())
+        h.update(b"\0")
+        h.update(contenido.encode("utf-8"))
+        return h.hexdigest()
+
+    def _ruta(self, ciclo, clave):
+        return os.path.join(self.carpeta_ciclo(ciclo), f"{clave}.docx")
+
+    def existe(self, ciclo, clave):
+        return os.path.exists(self._ruta(ciclo, clave))
+
+    def leer(self, ciclo, clave):
+        ruta = self._ruta(ciclo, clave)
+        try:
+            with open(ruta, "rb") as f:
+                contenido = f.read()
+            os.utime(ruta)  # 🔹 marca de uso reciente (LRU)
+        except OSError:
+            return None
+        with self._lock:
+            self.aciertos += 1
+        return contenido
+
+    def guardar(self, ciclo, clave, contenido):
+        carpeta = self.carpeta_ciclo(ciclo)
+        os.makedirs(carpeta, exist_ok=True)
+        ruta = self._ruta(ciclo, clave)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        try:
+            with open(temporal, "wb") as f:
+                f.write(contenido)
+            os.replace(temporal, ruta)  # ✅ atómico: otro worker nunca lee un archivo a medias
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar en caché {ruta}: {e}")
+        with self._lock:
+            self.fallos += 1  # fallo = no estaba en caché y hubo que renderizar
+
+    def _archivos(self):
+        if not os.path.isdir(self.carpeta):
+            return []
+        archivos = []
+        for ciclo in os.scandir(self.carpeta):
+            cache = os.path.join(ciclo.path, "cache")
+            if not ciclo.is_dir() or not os.path.isdir(cache):
+                continue
+            for entrada in os.scandir(cache):
+                if entrada.is_file() and entrada.name.endswith(".docx"):
+                    st = entrada.stat()
+                    archivos.append((st.st_mtime, st.st_size, entrada.path))
+        return archivos
+
+    def recortar(self):
+        """Desaloja los archivos usados hace más tiempo hasta quedar en el 90% del límite."""
+        archivos = self._archivos()
+        total = sum(tamano for _, tamano, _ in archivos)
+        if total <= self.limite_bytes:
+            return 0
+
+        objetivo = int(self.limite_bytes * 0.9)
+        borrados = 0
+        for _, tamano, ruta in sorted(archivos):
+            if total <= objetivo:
+                break
+            try:
+                os.remove(ruta)
+                total -= tamano
+                borrados += 1
+            except OSError:
+                pass
+        return borrados
+
+    def purgar(self, ciclo):
+        """Borra toda la caché de un ciclo. Devuelve cuántos archivos se eliminaron."""
+        import shutil
+
+        carpeta = self.carpeta_ciclo(ciclo)
+        if not os.path.isdir(carpeta):
+            return 0
+        borrados = sum(1 for e in os.scandir(carpeta) if e.is_file())
+        shutil.rmtree(carpeta, ignore_errors=True)
+        return borrados
+
+    def estadisticas(self):
+        archivos = self._archivos()
+        with self._lock:
+            return {
+                "archivos": len(archivos),
+                "bytes": sum(tamano for _, tamano, _ in archivos),
+                "limite_bytes": self.limite_bytes,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "pid": os.getpid(),
+            }
+
+
+cache_invitaciones = CacheInvitaciones()
+
+
+def _resultados_con_cache(trabajos, ciclo):
+    claves = [cache_invitaciones.clave(plantilla, contexto) for _, plantilla, contexto in trabajos]
+    en_cache = [cache_invitaciones.existe(ciclo, c) for c in claves]
+
+    # 🔹 Solo las invitaciones cuyo contexto cambió pasan por el pool
+    pendientes = [t for t, hay in zip(trabajos, en_cache) if not hay]
+    renderizadas = iter(_resultados_pool(pendientes))
+
+    nuevas = 0
+    for trabajo, clave, hay in zip(trabajos, claves, en_cache):
+        if hay:
+            contenido = cache_invitaciones.leer(ciclo, clave)
+            if contenido is not None:
+                yield trabajo[0], contenido, None
+                continue
+            # Se desalojó entre la revisión y la lectura: se renderiza aquí mismo
+            nombre, contenido, error = _renderizar_trabajo(trabajo)
+        else:
+            nombre, contenido, error = next(renderizadas)
+
+        if not error:
+            cache_invitaciones.guardar(ciclo, clave, contenido)
+            nuevas += 1
+        yield nombre, contenido, error
+
+    if nuevas:
+        cache_invitaciones.recortar()
+
+
+# ======================================================
+# 📦 ZIP en streaming (se envía mientras se renderiza)
+# ======================================================
+class _SalidaZip:
+    """Destino no 'seekable' para ZipFile: acumula bytes hasta que se vacían al cliente."""
+
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b"".join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+def zip_en_streaming(entradas):
+    """
+    Recibe un iterable de (nombre_archivo, bytes) y va generando el ZIP por trozos:
+    cada entrada comprimida se entrega en cuanto se termina de renderizar.
+    """
+    salida = _SalidaZip()
+    with zipfile.ZipFile(salida, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for nombre, contenido in entradas:
+            zf.writestr(nombre, contenido)
+            trozo = salida.vaciar()
+            if trozo:
+                yield trozo
+    # 🔹 Directorio central del ZIP
+    yield salida.vaciar()
+
+
+def respuesta_zip(entradas, nombre_zip):
+    """Respuesta Flask con transferencia por trozos (chunked) para un ZIP generado al vuelo."""
+    from flask import Response, stream_with_context
+
+    resp = Response(stream_with_context(zip_en_streaming(entradas)), mimetype="application/zip")
+    resp.headers["Content-Disposition"] = f"attachment; filename={nombre_zip}"
+    resp.headers["Cache-Control"] = "no-store"
+    resp.headers["X-Accel-Buffering"] = "no"  # evita que un proxy acumule toda la respuesta
+    return resp
+
+
+# ======================================================
+# 🖨️ Documento único para imprimir (todas las invitaciones en un .docx)
+# ======================================================
+def documento_unico(trabajos):
+    """
+    Renderiza cada invitación sobre su plantilla (sin empaquetarla como .docx propio) y
+    agrega su cuerpo al documento maestro, cada una empezando en página nueva.
+    Estilos, numeraciones e imágenes repetidas se comparten: un solo paquete para imprimir.
+    Devuelve los bytes del .docx o None si no se pudo renderizar ninguna.
+    """
+    from docxcompose.composer import Composer
+
+    composer = None
+    for nombre, plantilla, contexto in trabajos:
+        try:
+            doc = plantilla_docx(plantilla)
+            doc.render(_preparar_contexto(contexto))
+        except Exception as e:
+            print(f"⚠️ Error generando invitación {nombre}: {e}")
+            continue
+
+        if composer is None:
+            composer = Composer(doc.docx)  # la primera invitación es el documento maestro
+            continue
+
+        # 🔹 Cada invitación inicia en página nueva (sin párrafo vacío extra al final)
+        if doc.docx.paragraphs:
+            doc.docx.paragraphs[0].paragraph_format.page_break_before = True
+        else:
+            composer.doc.add_page_break()
+        composer.append(doc.docx)
+
+    if composer is None:
+        return None
+
+    salida = io.BytesIO()
+    composer.save(salida)
+    return salida.getvalue()
+
+
+def respuesta_docx(contenido, nombre_archivo):
+    from flask import Response
+
+    resp = Response(
+        contenido,
+        mimetype="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    )
+    resp.headers["Content-Disposition"] = f"attachment; filename={nombre_archivo}"
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+# ======================================================
+# 🧵 Trabajos en segundo plano (ZIP completo sin bloquear al worker web)
+# ======================================================
+INTERVALO_PROGRESO = 1.0   # segundos entre escrituras de progreso a la BD
+VIGENCIA_TRABAJOS = 24 * 3600  # los ZIP terminados se borran después de un día
+
+_cola_trabajos = queue.Queue()
+_hilo_trabajos = None
+_hilo_lock = threading.Lock()
+
+
+def carpeta_trabajos(ciclo_nombre):
+    carpeta = os.path.join(CARPETA_INVITACIONES, str(ciclo_nombre), "trabajos")
+    os.makedirs(carpeta, exist_ok=True)
+    return carpeta
+
+
+def nuevo_id_trabajo():
+    return uuid.uuid4().hex
+
+
+def encolar_trabajo(app, trabajo_id, trabajos):
+    """
+    Deja el trabajo en la cola del proceso. Un único hilo lo atiende; el render pesado
+    ocurre en el pool de procesos, así que el worker web queda libre para otras peticiones.
+    """
+    global _hilo_trabajos
+    _cola_trabajos.put((app, trabajo_id, list(trabajos)))
+    with _hilo_lock:
+        if _hilo_trabajos is None or not _hilo_trabajos.is_alive():
+            _hilo_trabajos = threading.Thread(
+                target=_atender_cola, name="trabajos-invitaciones", daemon=True
+            )
+            _hilo_trabajos.start()
+
+
+def _atender_cola():
+    while True:
+        app, trabajo_id, trabajos = _cola_trabajos.get()
+        try:
+            with app.app_context():
+                _procesar_trabajo(trabajo_id, trabajos)
+        except Exception as e:
+            print(f"⚠️ Error en trabajo de invitaciones {trabajo_id}: {e}")
+        finally:
+            _cola_trabajos.task_done()
+
+
+def _procesar_trabajo(trabajo_id, trabajos):
+    from datetime import datetime
+    from extensions import db
+    from models import TrabajoInvitaciones
+
+    trabajo = db.session.get(TrabajoInvitaciones, trabajo_id)
+    if not trabajo:
+        return
+
+    ciclo_nombre = trabajo.ciclo.nombre
+    ruta_final = os.path.join(carpeta_trabajos(ciclo_nombre), f"{trabajo_id}.zip")
+    ruta_parcial = ruta_final + ".parcial"
+
+    trabajo.estado = "procesando"
+    trabajo.total = len(trabajos)
+    trabajo.actualizado_en = datetime.utcnow()
+    db.session.commit()
+
+    try:
+        ultimo = time.monotonic()
+        with zipfile.ZipFile(ruta_parcial, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for nombre, contenido, error in resultados_render(trabajos, ciclo_nombre):
+                if error:
+                    print(f"⚠️ Error generando invitación {nombre}: {error}")
+                    trabajo.errores += 1
+                else:
+                    zf.writestr(nombre, contenido)
+                    trabajo.renderizadas += 1
+
+                # 🔹 Progreso visible para el polling (sin un commit por archivo)
+                if time.monotonic() - ultimo >= INTERVALO_PROGRESO:
+                    trabajo.actualizado_en = datetime.utcnow()
+                    db.session.commit()
+                    ultimo = time.monotonic()
+
+        os.replace(ruta_parcial, ruta_final)
+        trabajo.archivo = ruta_final
+        trabajo.estado = "terminado"
+    except Exception as e:
+        db.session.rollback()
+        if os.path.exists(ruta_parcial):
+            os.remove(ruta_parcial)
+        trabajo = db.session.get(TrabajoInvitaciones, trabajo_id)
+        trabajo.estado = "error"
+        trabajo.mensaje = str(e)
+
+    trabajo.actualizado_en = datetime.utcnow()
+    db.session.commit()
+    db.session.remove()
+
+
+def limpiar_trabajos_vencidos():
+    """Borra los ZIP de trabajos con más de VIGENCIA_TRABAJOS segundos (y sus registros)."""
+    from datetime import datetime, timedelta
+    from extensions import db
+    from models import TrabajoInvitaciones
+
+    limite = datetime.utcnow() - timedelta(seconds=VIGENCIA_TRABAJOS)
+    vencidos = TrabajoInvitaciones.query.filter(TrabajoInvitaciones.creado_en < limite).all()
+    for t in vencidos:
+        if t.archivo and os.path.exists(t.archivo):
+            try:
+                os.remove(t.archivo)
+            except OSError as e:
+                print(f"⚠️ No se pudo borrar {t.archivo}: {e}")
+        db.session.delete(t)
+    if vencidos:
+        db.session.commit()
@@ -0,0 +1,25 @@
+"""Agrega la versión de nominaciones (invalida cachés del dashboard)
+
+Revision ID: 2c9f5a7b3e18
+Revises: d4b7e2a91f36
+Create Date: 2026-10-18 18:04:37.551820
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c9f5a7b3e18'
+down_revision = 'd4b7e2a91f36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    versiones = sa.table('versiones_catalogo', sa.column('nombre', sa.String), sa.column('version', sa.Integer))
+    op.bulk_insert(versiones, [{'nombre': 'nominaciones', 'version': 1}])
+
+
+def downgrade():
+    op.execute("DELETE FROM versiones_catalogo WHERE nombre = 'nominaciones'")
@@ -1,6 +1,7 @@
 # models.py
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
+from sqlalchemy.ext.hybrid import hybrid_property
 from extensions import db
 from datetime import datetime
 from zoneinfo import ZoneInfo
@@ -147,6 +148,26 @@ class Nominacion(db.Model):
     tipo = db.Column(db.String(20), default='alumno')  # 'alumno' o 'personal'
     evento_id = db.Column(db.Integer, db.ForeignKey('evento_asamblea.id'), nullable=True)  # 🔗 Nueva relación
     evento = db.relationship('EventoAsamblea', backref='nominaciones', lazy=True)
+
+    # 🔒 Una sola nominación por (evento, tipo, nominado, maestro, valor)
+    # Permiten INSERT ... ON CONFLICT DO NOTHING en la inserción masiva.
+    # Solo cubren nominaciones con evento (NULL nunca choca); todas las altas exigen evento abierto.
+    __table_args__ = (
+        db.Index(
+            'ux_nominacion_alumno_evento',
+            'evento_id', 'tipo', 'alumno_id', 'maestro_id', 'valor_id', 'ciclo_id',
+            unique=True,
+            postgresql_where=db.text('alumno_id IS NOT NULL AND evento_id IS NOT NULL'),
+            sqlite_where=db.text('alumno_id IS NOT NULL AND evento_id IS NOT NULL'),
+        ),
+        db.Index(
+            'ux_nominacion_personal_evento',
+            'evento_id', 'tipo', 'maestro_nominado_id', 'maestro_id', 'valor_id', 'ciclo_id',
+            unique=True,
+            postgresql_where=db.text('maestro_nominado_id IS NOT NULL AND evento_id IS NOT NULL'),
+            sqlite_where=db.text('maestro_nominado_id IS NOT NULL AND evento_id IS NOT NULL'),
+        ),
+    )
     
     def __repr__(self):
         if self.alumno_id:
@@ -211,12 +232,17 @@ class EventoAsamblea(db.Model):
     def __repr__(self):
         return f"<EventoAsamblea Bloque {self.bloque_id} Mes {self.nombre_mes}>"
     # ✅ Propiedad para verificar si el evento está abierto
-    @property
+    @hybrid_property
     def esta_abierto(self):
         """Devuelve True si el evento sigue activo y la fecha actual es menor a la de cierre."""
         ahora = datetime.utcnow()
         return self.activo and ahora < self.fecha_cierre_nominaciones
 
+    @esta_abierto.expression
+    def esta_abierto(cls):
+        """Mismo criterio en SQL: EventoAsamblea.query.filter(EventoAsamblea.esta_abierto)."""
+        return db.and_(cls.activo.is_(True), cls.fecha_cierre_nominaciones > datetime.utcnow())
+
 
 # ===============================
 # 🖼️ MODELO: Plantilla de invitación
@@ -237,3 +263,139 @@ class PlantillaInvitacion(db.Model):
     def __repr__(self):
         return f"<PlantillaInvitacion {self.nombre}>"
 
+
+
+# ===============================
+# 🧵 MODELO: Trabajo de generación de invitaciones (segundo plano)
+# ===============================
+class TrabajoInvitaciones(db.Model):
+    __tablename__ = "trabajos_invitaciones"
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    ciclo_id = db.Column(db.Integer, db.ForeignKey("ciclos_escolares.id"), nullable=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey("usuarios.id"), nullable=True)
+    tipo = db.Column(db.String(20), nullable=False)  # 'bloque' o 'profesores'
+    descripcion = db.Column(db.String(200))
+    estado = db.Column(db.String(20), default="pendiente")  # pendiente | procesando | terminado | error
+    total = db.Column(db.Integer, default=0)
+    renderizadas = db.Column(db.Integer, default=0)
+    errores = db.Column(db.Integer, default=0)
+    mensaje = db.Column(db.Text, nullable=True)
+    archivo = db.Column(db.String(255), nullable=True)
+    nombre_zip = db.Column(db.String(255), nullable=True)
+    creado_en = db.Column(db.DateTime, default=datetime.utcnow)
+    actualizado_en = db.Column(db.DateTime, default=datetime.utcnow)
+
+    ciclo = db.relationship("CicloEscolar", backref="trabajos_invitaciones")
+
+    def __repr__(self):
+        return f"<TrabajoInvitaciones {self.id} {self.estado} {self.renderizadas}/{self.total}>"
+
+
+# ===============================
+# 🏅 MODELO: Contador de EXCELENCIA por alumno y evento
+# ===============================
+class ContadorExcelencia(db.Model):
+    """
+    Estado de EXCELENCIA de un alumno en un evento (mes), mantenido en la misma transacción
+    que cada alta/baja de nominación: cuántas nominaciones 'normales' lleva y cuál es su
+    nominación EXCELENCIA (si la tiene). Se reconstruye con reconstruir_contadores_excelencia.py.
+    """
+    __tablename__ = "contadores_excelencia"
+
+    alumno_id = db.Column(db.Integer, db.ForeignKey("alumnos.id", ondelete="CASCADE"), primary_key=True)
+    evento_id = db.Column(db.Integer, db.ForeignKey("evento_asamblea.id", ondelete="CASCADE"), primary_key=True)
+    ciclo_id = db.Column(db.Integer, db.ForeignKey("ciclos_escolares.id"), nullable=False, index=True)
+    normales = db.Column(db.Integer, nullable=False, default=0)
+    excelencia_id = db.Column(db.Integer, nullable=True)  # id de la nominación EXCELENCIA
+    actualizado_en = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ContadorExcelencia Alumno {self.alumno_id} Evento {self.evento_id}: {self.normales}>"
+
+
+# ===============================
+# 🔁 MODELO: Envíos de formulario ya procesados (idempotencia)
+# ===============================
+class EnvioFormulario(db.Model):
+    """
+    Un registro por token de formulario. Si el mismo formulario se envía dos veces
+    (doble clic, reintento del navegador), el segundo envío repite el resultado guardado
+    en lugar de volver a insertar nominaciones. Se purgan al vencer su TTL.
+    """
+    __tablename__ = "envios_formulario"
+
+    token = db.Column(db.String(64), primary_key=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey("usuarios.id"), nullable=True)
+    endpoint = db.Column(db.String(100), nullable=False)
+    estado = db.Column(db.String(20), nullable=False, default="procesando")  # procesando | listo
+    mensajes = db.Column(db.Text, nullable=True)  # JSON: [[categoria, mensaje], ...]
+    destino = db.Column(db.String(500), nullable=True)
+    creado_en = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f"<EnvioFormulario {self.token} {self.endpoint} ({self.estado})>"
+
+
+# ===============================
+# 🔢 MODELO: Versión de catálogos (invalida cachés de todos los workers)
+# ===============================
+class VersionCatalogo(db.Model):
+    """
+    Contadores de versión que comparten todos los workers:
+      - 'ciclo': sube cada vez que cambia el catálogo del ciclo (ciclo activo, bloques,
+        eventos, valores, maestros o alumnos)
+      - 'nominaciones': sube en cada commit que altera nominaciones
+      - 'usuarios': sube cada vez que se crea, modifica o borra un usuario
+    Cada worker compara la versión de lo que tiene en caché contra estas filas.
+    """
+    __tablename__ = "versiones_catalogo"
+
+    nombre = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<VersionCatalogo {self.nombre}: {self.version}>"
+
+
+# ===============================
+# 📈 MODELO: Resumen materializado de nominaciones por mes
+# ===============================
+class ResumenNominacion(db.Model):
+    """
+    Una fila por (evento, tipo, nominado, valor) con cuántas nominaciones hay y su primera/última
+    fecha. La mantienen las altas, bajas y ediciones de nominaciones en su misma transacción;
+    se reconstruye con reconstruir_resumen_nominaciones.py.
+    """
+    __tablename__ = "resumen_nominaciones"
+
+    id = db.Column(db.Integer, primary_key=True)
+    ciclo_id = db.Column(db.Integer, db.ForeignKey("ciclos_escolares.id"), nullable=False, index=True)
+    evento_id = db.Column(db.Integer, db.ForeignKey("evento_asamblea.id", ondelete="CASCADE"), nullable=False)
+    tipo = db.Column(db.String(20), nullable=False, default="alumno")
+    alumno_id = db.Column(db.Integer, db.ForeignKey("alumnos.id", ondelete="CASCADE"), nullable=True)
+    maestro_nominado_id = db.Column(db.Integer, db.ForeignKey("maestros.id", ondelete="CASCADE"), nullable=True)
+    valor_id = db.Column(db.Integer, db.ForeignKey("valores.id"), nullable=False)
+    nominaciones = db.Column(db.Integer, nullable=False, default=0)
+    primera_fecha = db.Column(db.Date, nullable=True)
+    ultima_fecha = db.Column(db.Date, nullable=True)
+
+    __table_args__ = (
+        db.Index(
+            'ux_resumen_alumno',
+            'evento_id', 'tipo', 'alumno_id', 'valor_id',
+            unique=True,
+            postgresql_where=db.text('alumno_id IS NOT NULL'),
+            sqlite_where=db.text('alumno_id IS NOT NULL'),
+        ),
+        db.Index(
+            'ux_resumen_personal',
+            'evento_id', 'tipo', 'maestro_nominado_id', 'valor_id',
+            unique=True,
+            postgresql_where=db.text('maestro_nominado_id IS NOT NULL'),
+            sqlite_where=db.text('maestro_nominado_id IS NOT NULL'),
+        ),
+    )
+
+    def __repr__(self):
+        return f"<ResumenNominacion Evento {self.evento_id} {self.tipo} Valor {self.valor_id}: {self.nominaciones}>"
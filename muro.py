@@ -0,0 +1,279 @@
+# muro.py
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict, defaultdict, namedtuple
+from datetime import datetime
+
+CARPETA_MURO = "muro"
+MAX_PAGINAS_MURO = 256
+MAX_AGE_MURO = 60  # segundos que navegadores y proxies pueden reutilizar la página sin preguntar
+TIPOS_MURO = ("alumno", "personal")
+
+PaginaMuro = namedtuple("PaginaMuro", "version etag modificada html")
+
+
+# ======================================================
+# 🧱 Datos y render del muro
+# ======================================================
+def meses_muro(contexto):
+    """Un evento por mes (el primero de cada nombre_mes), en el orden del ciclo."""
+    meses = []
+    vistos = set()
+    for e in contexto.eventos():
+        if e.nombre_mes not in vistos:
+            meses.append(e)
+            vistos.add(e.nombre_mes)
+    return meses
+
+
+def ultimo_mes(contexto):
+    return max((e.mes_ordinal for e in meses_muro(contexto)), default=None)
+
+
+def mes_cerrado(contexto, mes, bloque_id=None):
+    """True si el mes tiene eventos (del bloque, si se indica) y ninguno admite nominaciones."""
+    eventos = [e for e in contexto.eventos(bloque_id) if e.mes_ordinal == mes]
+    return bool(eventos) and not any(e.esta_abierto for e in eventos)
+
+
+def nominados_muro(ciclo_id, mes, tipo, bloque_id=None):
+    """Personas nominadas del mes agrupadas con sus valores, de más a menos valores."""
+    from extensions import db
+    from models import Alumno, Bloque, EventoAsamblea, Maestro, ResumenNominacion as R, Valor
+
+    query = (
+        db.session.query(
+            R.alumno_id, Alumno.nombre, Bloque.nombre,
+            R.maestro_nominado_id, Maestro.nombre,
+            Valor.nombre, EventoAsamblea.nombre_mes,
+        )
+        .join(EventoAsamblea, EventoAsamblea.id == R.evento_id)
+        .join(Valor, Valor.id == R.valor_id)
+        .outerjoin(Alumno, Alumno.id == R.alumno_id)
+        .outerjoin(Bloque, Bloque.id == Alumno.bloque_id)
+        .outerjoin(Maestro, Maestro.id == R.maestro_nominado_id)
+        .filter(
+            R.ciclo_id == ciclo_id,
+            R.tipo == tipo,
+            EventoAsamblea.mes_ordinal == mes
+        )
+        .order_by(R.id)
+    )
+
+    if bloque_id:
+        query = query.filter(Alumno.bloque_id == bloque_id)
+
+    # 🧩 Agrupar por persona (alumno o maestro nominado)
+    agrupadas = defaultdict(lambda: {"nombre": "", "bloque": "", "valores": set(), "evento": None})
+
+    for alumno_id, alumno, bloque, maestro_id, maestro, valor, nombre_mes in query:
+        if tipo == "alumno" and alumno_id and alumno:
+            clave = alumno_id
+            agrupadas[clave]["nombre"] = alumno
+            agrupadas[clave]["bloque"] = bloque or ""
+        elif tipo == "personal" and maestro_id and maestro:
+            clave = maestro_id
+            agrupadas[clave]["nombre"] = maestro
+            agrupadas[clave]["bloque"] = "-"
+        else:
+            continue
+
+        agrupadas[clave]["valores"].add(valor)
+        agrupadas[clave]["evento"] = nombre_mes
+
+    # 🧮 Convertir a lista y ordenar por cantidad de valores (mayor a menor)
+    return sorted(agrupadas.values(), key=lambda x: len(x["valores"]), reverse=True)
+
+
+def render_muro(contexto, mes, tipo, bloque_id=None):
+    from flask import render_template
+
+    return render_template(
+        "public_muro.html",
+        ciclo=contexto.ciclo,
+        eventos=meses_muro(contexto),
+        nominaciones=nominados_muro(contexto.ciclo_id, mes, tipo, bloque_id),
+        mes=mes,
+        tipo=tipo,
+        bloque_id=bloque_id,
+        bloques=contexto.bloques()
+    )
+
+
+# ======================================================
+# 🗄️ Caché de páginas del muro (una por worker)
+# ======================================================
+def etag_muro(clave, version):
+    """ETag determinista: igual en todos los workers para la misma página y versión."""
+    return hashlib.sha1(repr((clave, version)).encode()).hexdigest()[:20]
+
+
+class CacheMuro:
+    """
+    HTML ya renderizado por (ciclo, mes, tipo, bloque). Cada página guarda la versión
+    (nominaciones, ciclo) con la que se generó y deja de servirse en cuanto cualquiera cambia.
+    """
+
+    def __init__(self, limite=MAX_PAGINAS_MURO):
+        self.limite = limite
+        self._paginas = OrderedDict()  # clave -> PaginaMuro
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave, version):
+        with self._lock:
+            pagina = self._paginas.get(clave)
+            if pagina is None or pagina.version != version:
+                self.fallos += 1
+                return None
+            self._paginas.move_to_end(clave)
+            self.aciertos += 1
+            return pagina
+
+    def guardar(self, clave, version, html):
+        pagina = PaginaMuro(version, etag_muro(clave, version), datetime.utcnow().replace(microsecond=0), html)
+        with self._lock:
+            self._paginas[clave] = pagina
+            self._paginas.move_to_end(clave)
+            while len(self._paginas) > self.limite:
+                self._paginas.popitem(last=False)
+        return pagina
+
+    def limpiar(self):
+        with self._lock:
+            self._paginas.clear()
+            self.aciertos = 0
+            self.fallos = 0
+
+
+cache_muro = CacheMuro()
+
+
+# ======================================================
+# 🖼️ Fotos estáticas de los meses cerrados
+# ======================================================
+class FotosMuro:
+    """
+    HTML del muro escrito en muro/<ciclo>/v<versión del ciclo>/<mes>-<tipo>-<bloque>.html.
+    Solo se guardan meses cerrados; si sus nominaciones cambian, las fotos del mes se borran
+    al hacer commit y se vuelven a generar en la siguiente visita.
+    """
+
+    def __init__(self, carpeta=CARPETA_MURO):
+        self.carpeta = carpeta
+
+    def carpeta_ciclo(self, ciclo_id):
+        return os.path.join(self.carpeta, str(ciclo_id))
+
+    def ruta(self, contexto, mes, tipo, bloque_id=None):
+        # 🔒 tipo llega de la URL pública: fuera de TIPOS_MURO podría salirse de la carpeta
+        if tipo not in TIPOS_MURO:
+            raise ValueError(f"Tipo de muro no válido: {tipo!r}")
+        nombre = f"{mes}-{tipo}-{bloque_id or 'todos'}.html"
+        return os.path.join(self.carpeta_ciclo(contexto.ciclo_id), f"v{contexto.version}", nombre)
+
+    def existente(self, contexto, mes, tipo, bloque_id=None):
+        ruta = self.ruta(contexto, mes, tipo, bloque_id)
+        return ruta if os.path.exists(ruta) else None
+
+    def guardar(self, contexto, mes, tipo, bloque_id, html, version_nominaciones):
+        """
+        Escribe la foto de forma atómica. Si las nominaciones cambiaron mientras se renderizaba,
+        no se escribe (el HTML ya no sería el vigente).
+        """
+        from utils import version_catalogo, VERSION_NOMINACIONES
+
+        if version_catalogo(VERSION_NOMINACIONES) != version_nominaciones:
+            return None
+
+        ruta = self.ruta(contexto, mes, tipo, bloque_id)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(html)
+        os.replace(temporal, ruta)
+        return ruta
+
+    def borrar_meses(self, ciclo_id, meses=None):
+        """Borra las fotos de esos meses (de todas las versiones) o, con meses=None, todo el ciclo."""
+        carpeta = self.carpeta_ciclo(ciclo_id)
+        if meses is None:
+            shutil.rmtree(carpeta, ignore_errors=True)
+            return
+        if not os.path.isdir(carpeta):
+            return
+        prefijos = tuple(f"{mes}-" for mes in meses)
+        for version in os.listdir(carpeta):
+            ruta_version = os.path.join(carpeta, version)
+            if not os.path.isdir(ruta_version):
+                continue
+            for nombre in os.listdir(ruta_version):
+                if nombre.startswith(prefijos):
+                    try:
+                        os.remove(os.path.join(ruta_version, nombre))
+                    except OSError:
+                        pass
+
+    def limpiar_versiones(self, ciclo_id, version_vigente):
+        """Quita las carpetas de versiones anteriores del ciclo."""
+        carpeta = self.carpeta_ciclo(ciclo_id)
+        if not os.path.isdir(carpeta):
+            return
+        for version in os.listdir(carpeta):
+            if version != f"v{version_vigente}":
+                shutil.rmtree(os.path.join(carpeta, version), ignore_errors=True)
+
+    def purgar(self, ciclo_id=None):
+        """Borra todas las fotos (o las de un ciclo). Devuelve cuántos archivos se eliminaron."""
+        carpeta = self.carpeta_ciclo(ciclo_id) if ciclo_id is not None else self.carpeta
+        total = sum(len(archivos) for _, _, archivos in os.walk(carpeta))
+        shutil.rmtree(carpeta, ignore_errors=True)
+        return total
+
+
+fotos_muro = FotosMuro()
+
+
+def combinaciones_cerradas(contexto):
+    """(mes, tipo, bloque_id) de cada página del muro cuyo mes ya no admite nominaciones."""
+    combinaciones = []
+    for mes in sorted({e.mes_ordinal for e in meses_muro(contexto)}):
+        if mes_cerrado(contexto, mes):
+            combinaciones += [(mes, "alumno", None), (mes, "personal", None)]
+        for bloque in contexto.bloques():
+            if mes_cerrado(contexto, mes, bloque.id):
+                combinaciones.append((mes, "alumno", bloque.id))
+    return combinaciones
+
+
+def publicar_fotos_muro(contexto=None):
+    """
+    Escribe las fotos que falten de los meses cerrados del ciclo activo. Se llama al cerrar
+    eventos; funciona también fuera de una petición. Devuelve cuántas fotos se escribieron.
+    """
+    from flask import current_app, has_request_context
+    from utils import contexto_ciclo, version_catalogo, VERSION_NOMINACIONES
+
+    contexto = contexto or contexto_ciclo()
+    if not contexto.ciclo_id:
+        return 0
+
+    fotos_muro.limpiar_versiones(contexto.ciclo_id, contexto.version)
+    pendientes = [c for c in combinaciones_cerradas(contexto) if not fotos_muro.existente(contexto, *c)]
+    if not pendientes:
+        return 0
+
+    version_nominaciones = version_catalogo(VERSION_NOMINACIONES)
+    escritas = 0
+    for mes, tipo, bloque_id in pendientes:
+        if has_request_context():
+            html = render_muro(contexto, mes, tipo, bloque_id)
+        else:
+            with current_app.test_request_context():
+                html = render_muro(contexto, mes, tipo, bloque_id)
+        if fotos_muro.guardar(contexto, mes, tipo, bloque_id, html, version_nominaciones):
+            escritas += 1
+    return escritas
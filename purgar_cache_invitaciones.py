@@ -0,0 +1,32 @@
+# purgar_cache_invitaciones.py
+"""
+Borra la caché de invitaciones ya renderizadas (invitaciones/<ciclo>/cache/).
+Útil al cerrar un ciclo o si se cambió algo que no forma parte del contexto de la plantilla.
+
+Ejecutar:
+    python purgar_cache_invitaciones.py 2025-2026
+    python purgar_cache_invitaciones.py --todos
+"""
+import os
+import sys
+
+from invitaciones import cache_invitaciones
+
+args = sys.argv[1:]
+if not args:
+    print(__doc__)
+    sys.exit(1)
+
+if args == ["--todos"]:
+    carpeta = cache_invitaciones.carpeta
+    ciclos = sorted(e.name for e in os.scandir(carpeta) if e.is_dir()) if os.path.isdir(carpeta) else []
+else:
+    ciclos = args
+
+total = 0
+for ciclo in ciclos:
+    borrados = cache_invitaciones.purgar(ciclo)
+    total += borrados
+    print(f"🧹 {ciclo}: {borrados} invitaciones eliminadas de la caché")
+
+print(f"✅ Listo. Total eliminado: {total}")
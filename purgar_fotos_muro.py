@@ -0,0 +1,26 @@
+# purgar_fotos_muro.py
+"""
+Borra las fotos estáticas del muro público (muro/<ciclo>/...). Se regeneran solas al cerrar
+eventos o en la siguiente visita a un mes cerrado.
+
+Ejecutar:
+    python purgar_fotos_muro.py            (todos los ciclos)
+    python purgar_fotos_muro.py 2025-2026
+"""
+import sys
+
+from app import app
+from models import CicloEscolar
+from muro import fotos_muro
+
+with app.app_context():
+    ciclo_id = None
+    if len(sys.argv) > 1:
+        ciclo = CicloEscolar.query.filter_by(nombre=sys.argv[1]).first()
+        if not ciclo:
+            print("⚠️ No se encontró el ciclo escolar.")
+            sys.exit(1)
+        ciclo_id = ciclo.id
+
+    total = fotos_muro.purgar(ciclo_id)
+    print(f"🧹 {total} fotos del muro eliminadas")
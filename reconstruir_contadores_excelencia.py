@@ -0,0 +1,29 @@
+# reconstruir_contadores_excelencia.py
+"""
+Recalcula los contadores de EXCELENCIA (alumno, evento) a partir de las nominaciones.
+Útil si se editaron nominaciones directo en la base de datos.
+
+Ejecutar:
+    python reconstruir_contadores_excelencia.py            (ciclo activo)
+    python reconstruir_contadores_excelencia.py 2025-2026
+"""
+import sys
+
+from app import app
+from extensions import db
+from models import CicloEscolar
+from utils import reconstruir_contadores_excelencia
+
+with app.app_context():
+    if len(sys.argv) > 1:
+        ciclo = CicloEscolar.query.filter_by(nombre=sys.argv[1]).first()
+    else:
+        ciclo = CicloEscolar.query.filter_by(activo=True).first()
+
+    if not ciclo:
+        print("⚠️ No se encontró el ciclo escolar.")
+        sys.exit(1)
+
+    total = reconstruir_contadores_excelencia(ciclo.id)
+    db.session.commit()
+    print(f"✅ Ciclo {ciclo.nombre}: {total} contadores reconstruidos")
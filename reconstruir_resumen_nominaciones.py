@@ -0,0 +1,29 @@
+# reconstruir_resumen_nominaciones.py
+"""
+Recalcula el resumen materializado de nominaciones (evento, tipo, nominado, valor)
+a partir de la tabla de nominaciones. Útil si se editaron nominaciones directo en la base de datos.
+
+Ejecutar:
+    python reconstruir_resumen_nominaciones.py            (ciclo activo)
+    python reconstruir_resumen_nominaciones.py 2025-2026
+"""
+import sys
+
+from app import app
+from extensions import db
+from models import CicloEscolar
+from utils import reconstruir_resumen_nominaciones
+
+with app.app_context():
+    if len(sys.argv) > 1:
+        ciclo = CicloEscolar.query.filter_by(nombre=sys.argv[1]).first()
+    else:
+        ciclo = CicloEscolar.query.filter_by(activo=True).first()
+
+    if not ciclo:
+        print("⚠️ No se encontró el ciclo escolar.")
+        sys.exit(1)
+
+    total = reconstruir_resumen_nominaciones(ciclo.id)
+    db.session.commit()
+    print(f"✅ Ciclo {ciclo.nombre}: {total} filas de resumen reconstruidas")
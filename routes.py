@@ -13,12 +13,20 @@ from io import BytesIO
 from models import Maestro
 from models import Alumno, Bloque
 from flask import send_file
-from datetime import datetime
+from datetime import datetime, timedelta
 from flask import send_file, request, jsonify
 from flask import jsonify
-from datetime import datetime
 from utils import admin_required
-from utils import cerrar_eventos_vencidos
+from utils import (
+    cerrar_eventos_vencidos, insertar_nominaciones, envio_idempotente, nuevo_token_envio,
+    contexto_ciclo, marcar_cambio_ciclo, guardar_identidad, maestro_actual,
+    ajustar_resumen_nominaciones, ajustar_contadores_excelencia, COLUMNAS_RESUMEN,
+    limpiar_derivados_nominaciones,
+    reconstruir_contadores_excelencia, reconstruir_resumen_nominaciones,
+    MARCA_EXCELENCIA_AUTOMATICA, version_catalogo, VERSION_NOMINACIONES,
+)
+from invitaciones import nombre_bonito, slug
+from sqlalchemy import case, cast, func, tuple_, Integer
 from sqlalchemy.exc import IntegrityError
 
 # -------------------------------
@@ -55,31 +63,6 @@ def principal():
 
 import re
 
-def nombre_bonito(nombre: str) -> str:
-    """
-    Convierte: 'ADRIAN ISAAC MENDEZ' -> 'Adrian Isaac Mendez'
-    Respeta conectores comunes: de, del, la, las, los, y, e, etc.
-    """
-    if not nombre:
-        return ""
-
-    # Normalizar espacios
-    s = re.sub(r"\s+", " ", nombre.strip())
-
-    # Partículas que suelen ir en minúscula (cuando NO son la primera palabra)
-    minus = {"de", "del", "la", "las", "los", "y", "e", "da", "dos", "do", "di", "van", "von"}
-
-    partes = s.split(" ")
-    out = []
-    for i, p in enumerate(partes):
-        pl = p.lower()
-        if i > 0 and pl in minus:
-            out.append(pl)
-        else:
-            # Capitalizar conservando acentos
-            out.append(pl[:1].upper() + pl[1:])
-    return " ".join(out)
-
 # -------------------------------
 # 🔹 Login y logout
 # -------------------------------
@@ -92,6 +75,7 @@ def login():
 
         if user and user.check_password(password):
             login_user(user)
+            guardar_identidad(user)
             flash(f'Bienvenido, {user.nombre}', 'success')
             return redirect(url_for('nom.principal'))
         else:
@@ -103,7 +87,10 @@ def login():
 @nom.route('/logout')
 @login_required
 def logout():
+    from flask import session
+
     logout_user()
+    session.pop("identidad", None)
     flash("Sesión cerrada correctamente.", "success")
     return redirect(url_for('nom.login'))
 
@@ -122,131 +109,279 @@ def panel_admin():
 
 
 # ======================================================
-# 🧠 Función auxiliar: actualiza a EXCELENCIA automáticamente
+# 🧠 EXCELENCIA automática (contador por alumno y evento)
 # ======================================================
-def actualizar_a_excelencia(alumno_id, ciclo_id, evento_id):
-    """Convierte las nominaciones de un alumno a EXCELENCIA si ya alcanzó 3 EN EL EVENTO (mes)."""
-    from models import Nominacion, Valor
-    from sqlalchemy.orm import joinedload
-    from datetime import datetime
+ETIQUETA_VISUAL = "[EXCELENCIA-VISUAL]"
+NOMINACIONES_PARA_EXCELENCIA = 3
+
 
-    if not evento_id:
-        return False  # seguridad: sin evento no tiene sentido promover
+def _es_excelencia_automatica():
+    """Filtro SQL: EXCELENCIA creada por la promoción automática (las directas de un maestro no lo cumplen)."""
+    return Nominacion.comentario.contains(MARCA_EXCELENCIA_AUTOMATICA)
+
+
+def _id_valor_excelencia(ciclo_id):
+    """Id del valor EXCELENCIA del ciclo (del contexto en caché; se crea si no existe)."""
+    contexto = contexto_ciclo()
+    if contexto.ciclo_id == ciclo_id and contexto.excelencia_id is not None:
+        return contexto.excelencia_id
 
-    # Buscar valor EXCELENCIA o crearlo si no existe (por ciclo)
     excelencia = Valor.query.filter(
         db.func.lower(Valor.nombre) == "excelencia",
         Valor.ciclo_id == ciclo_id
     ).first()
-    if not excelencia:
-        excelencia = Valor(nombre="EXCELENCIA", ciclo_id=ciclo_id, activo=True)
-        db.session.add(excelencia)
-        db.session.commit()
+    if excelencia:
+        return excelencia.id
 
-    # Si ya tiene EXCELENCIA en ESTE EVENTO, no hacer nada
-    tiene_excelencia_en_evento = (
-        Nominacion.query
-        .filter_by(alumno_id=alumno_id, ciclo_id=ciclo_id, evento_id=evento_id)
-        .join(Valor)
-        .filter(db.func.lower(Valor.nombre) == "excelencia")
-        .first()
-    )
-    if tiene_excelencia_en_evento:
-        return False
+    # Se crea dentro de la transacción actual (el flush sube la versión del catálogo)
+    excelencia = Valor(nombre="EXCELENCIA", ciclo_id=ciclo_id, activo=True)
+    db.session.add(excelencia)
+    db.session.flush()
+    return excelencia.id
 
-    # Traer nominaciones del EVENTO actual (sin contar EXCELENCIA)
-    nominaciones = (
+
+def _datos_excelencia(n):
+    """(id, alumno_id, evento_id, valor_id) de una Nominacion o de una tupla ya armada."""
+    if isinstance(n, tuple):
+        return n
+    return n.id, n.alumno_id, n.evento_id, n.valor_id
+
+
+def _promover_a_excelencia(ciclo_id, valor_excelencia_id, pares):
+    """
+    Crea la nominación EXCELENCIA de cada (alumno_id, evento_id) con el texto de sus
+    nominaciones normales (una sola consulta para todos) y las marca como visuales.
+    Devuelve {(alumno_id, evento_id): id de la nominación EXCELENCIA}.
+    """
+    from sqlalchemy.orm import joinedload
+
+    normales = (
         Nominacion.query
         .options(joinedload(Nominacion.valor))
         .filter(
-            Nominacion.alumno_id == alumno_id,
             Nominacion.ciclo_id == ciclo_id,
-            Nominacion.evento_id == evento_id
+            tuple_(Nominacion.alumno_id, Nominacion.evento_id).in_(list(pares)),
+            Nominacion.valor_id != valor_excelencia_id,
         )
-        .order_by(Nominacion.fecha.asc())
+        .order_by(Nominacion.fecha.asc(), Nominacion.id.asc())
         .all()
     )
+    por_par = {}
+    for n in normales:
+        por_par.setdefault((n.alumno_id, n.evento_id), []).append(n)
+
+    nuevas = {}
+    for (alumno_id, evento_id), lista in por_par.items():
+        valores = [n.valor.nombre for n in lista if n.valor]
+        comentarios = [n.comentario.strip() for n in lista if n.comentario]
+        texto_final = f"{MARCA_EXCELENCIA_AUTOMATICA} {', '.join(valores)}. Comentarios: {' | '.join(comentarios)}"
+
+        for n in lista:
+            if ETIQUETA_VISUAL not in (n.comentario or ""):
+                n.comentario = ((n.comentario or "").strip() + " " + ETIQUETA_VISUAL).strip()
+
+        nueva = Nominacion(
+            alumno_id=alumno_id,
+            maestro_id=lista[-1].maestro_id,
+            valor_id=valor_excelencia_id,
+            ciclo_id=ciclo_id,
+            comentario=texto_final,
+            evento_id=evento_id,
+            tipo="alumno",
+            fecha=datetime.utcnow().date()  # tu columna es Date
+        )
+        db.session.add(nueva)
+        nuevas[(alumno_id, evento_id)] = nueva
 
-    nominaciones_normales = [n for n in nominaciones if n.valor and n.valor.nombre.upper() != "EXCELENCIA"]
+    db.session.flush()
+    ajustar_resumen_nominaciones(altas=nuevas.values())
+    return {par: n.id for par, n in nuevas.items()}
 
-    if len(nominaciones_normales) < 3:
-        return False
 
-    # Construir comentario final
-    valores = []
-    comentarios = []
-    for n in nominaciones_normales:
-        if n.valor:
-            valores.append(n.valor.nombre)
-        if n.comentario:
-            comentarios.append(n.comentario.strip())
+def registrar_cambios_excelencia(ciclo_id, altas=(), bajas=()):
+    """
+    Actualiza los contadores de EXCELENCIA en la MISMA transacción que las altas/bajas de
+    nominaciones de alumno y decide con el conteo devuelto (sin recontar) si promover o revertir:
+      - llega a 3 normales sin EXCELENCIA → se crea la nominación EXCELENCIA
+      - baja de 3 normales con EXCELENCIA automática → se elimina (la registrada directamente
+        por un maestro nunca se toca)
+    altas / bajas: Nominacion (ya con id) o tuplas (id, alumno_id, evento_id, valor_id).
+    Devuelve el set de (alumno_id, evento_id) promovidos. No hace commit.
+    """
+    from models import ContadorExcelencia
 
-    texto_final = f"Valores obtenidos: {', '.join(valores)}. Comentarios: {' | '.join(comentarios)}"
+    valor_excelencia_id = _id_valor_excelencia(ciclo_id)
 
-    # Marcar las nominaciones del evento como visuales
-    for n in nominaciones_normales:
-        if "[EXCELENCIA-VISUAL]" not in (n.comentario or ""):
-            n.comentario = ((n.comentario or "").strip() + " [EXCELENCIA-VISUAL]").strip()
-    db.session.commit()
+    deltas, excelencias_altas, excelencias_bajas = {}, [], []
+    for signo, lista, directas in ((1, altas, excelencias_altas), (-1, bajas, excelencias_bajas)):
+        for n in lista:
+            nominacion_id, alumno_id, evento_id, valor_id = _datos_excelencia(n)
+            if not alumno_id or not evento_id:
+                continue
+            par = (alumno_id, evento_id)
+            if valor_id == valor_excelencia_id:
+                deltas.setdefault(par, 0)
+                directas.append((par, nominacion_id))
+            else:
+                deltas[par] = deltas.get(par, 0) + signo
+
+    estado = ajustar_contadores_excelencia(ciclo_id, deltas)
+    excelencia_de = {par: exc_id for par, (_, exc_id) in estado.items()}
+
+    def fijar_excelencia(par, nominacion_id):
+        excelencia_de[par] = nominacion_id
+        db.session.query(ContadorExcelencia).filter_by(
+            alumno_id=par[0], evento_id=par[1]
+        ).update({"excelencia_id": nominacion_id}, synchronize_session=False)
+
+    # 🔹 EXCELENCIA registrada o eliminada directamente
+    for par, nominacion_id in excelencias_bajas:
+        if excelencia_de.get(par) == nominacion_id:
+            fijar_excelencia(par, None)
+    for par, nominacion_id in excelencias_altas:
+        if excelencia_de.get(par) is None:
+            fijar_excelencia(par, nominacion_id)
+
+    # 🔹 Promociones (solo donde subió el conteo) y reversiones (solo donde bajó)
+    por_promover = {
+        par for par, delta in deltas.items()
+        if delta > 0 and estado[par][0] >= NOMINACIONES_PARA_EXCELENCIA and excelencia_de.get(par) is None
+    }
+    por_revertir = {
+        par: excelencia_de[par] for par, delta in deltas.items()
+        if delta < 0 and estado[par][0] < NOMINACIONES_PARA_EXCELENCIA and excelencia_de.get(par)
+    }
 
-    # Crear la nominación EXCELENCIA EN ESTE EVENTO
-    nueva = Nominacion(
-        alumno_id=alumno_id,
-        maestro_id=nominaciones_normales[-1].maestro_id,
-        valor_id=excelencia.id,
-        ciclo_id=ciclo_id,
-        comentario=texto_final,
-        evento_id=evento_id,
-        tipo="alumno",
-        fecha=datetime.utcnow().date()  # tu columna es Date
-    )
-    db.session.add(nueva)
-    db.session.commit()
+    if por_revertir:
+        automaticas = {
+            nominacion_id for (nominacion_id,) in db.session.query(Nominacion.id).filter(
+                Nominacion.id.in_(list(por_revertir.values())), _es_excelencia_automatica()
+            )
+        }
+        por_revertir = {par: i for par, i in por_revertir.items() if i in automaticas}
+
+    if por_revertir:
+        Nominacion.query.filter(Nominacion.id.in_(list(por_revertir.values()))).delete(
+            synchronize_session=False
+        )
+        ajustar_resumen_nominaciones(bajas=[
+            {"ciclo_id": ciclo_id, "evento_id": e, "tipo": "alumno", "alumno_id": a, "valor_id": valor_excelencia_id}
+            for a, e in por_revertir
+        ])
+        for par in por_revertir:
+            fijar_excelencia(par, None)
+
+    if por_promover:
+        for par, nominacion_id in _promover_a_excelencia(ciclo_id, valor_excelencia_id, por_promover).items():
+            fijar_excelencia(par, nominacion_id)
+
+    return por_promover
 
-    return True
 
 # ======================================================
-# 🧠 Verificar reversión de EXCELENCIA si bajan de 3 nominaciones
+# 🧮 Reconciliar EXCELENCIA de un evento o de todo el ciclo
 # ======================================================
-def verificar_reversion_excelencia(alumno_id, ciclo_id, evento_id):
-    """Elimina la nominación de EXCELENCIA si el alumno baja de 3 nominaciones normales EN EL EVENTO."""
-    from models import Nominacion, Valor
-
-    if not evento_id:
-        return
+def reconciliar_excelencia(ciclo_id, evento_id=None, sin_promover=()):
+    """
+    Deja la EXCELENCIA de un evento (o de todo el ciclo) como debe estar, con SQL por conjuntos:
+      1) una consulta agregada: normales y EXCELENCIA (automáticas y directas) por (alumno, evento)
+      2) un DELETE de las EXCELENCIA automáticas sobrantes (menos de 3 normales, o repetidas)
+      3) un INSERT de las faltantes (3+ normales sin ninguna EXCELENCIA), salvo los pares
+         (alumno_id, evento_id) de `sin_promover` (p. ej. EXCELENCIA que un admin acaba de borrar)
+    Las EXCELENCIA registradas directamente por un maestro nunca se borran.
+      4) reconstruye los contadores y el resumen de nominaciones del mismo alcance
+    Devuelve un reporte de lo que cambió. No hace commit.
+    """
+    import time
 
-    excelencia = Valor.query.filter(
-        db.func.lower(Valor.nombre) == "excelencia",
-        Valor.ciclo_id == ciclo_id
-    ).first()
-    if not excelencia:
-        return
+    inicio = time.perf_counter()
+    valor_excelencia_id = _id_valor_excelencia(ciclo_id)
+    es_excelencia = Nominacion.valor_id == valor_excelencia_id
+    es_automatica = db.and_(es_excelencia, _es_excelencia_automatica())
 
-    nominaciones_normales = (
-        Nominacion.query
-        .join(Valor)
-        .filter(
-            Nominacion.alumno_id == alumno_id,
-            Nominacion.ciclo_id == ciclo_id,
-            Nominacion.evento_id == evento_id,
-            db.func.lower(Valor.nombre) != "excelencia"
-        ).count()
+    alcance = [
+        Nominacion.ciclo_id == ciclo_id,
+        Nominacion.alumno_id.isnot(None),
+        Nominacion.evento_id.isnot(None),
+    ]
+    if evento_id:
+        alcance.append(Nominacion.evento_id == evento_id)
+
+    # 1️⃣ Estado real por (alumno, evento)
+    estado = (
+        db.session.query(
+            Nominacion.alumno_id,
+            Nominacion.evento_id,
+            func.sum(case((es_excelencia, 0), else_=1)),
+            func.min(case((es_automatica, Nominacion.id), else_=None)),
+            func.count(case((es_automatica, 1), else_=None)),
+            func.count(case((es_excelencia, 1), else_=None)),
+        )
+        .filter(*alcance)
+        .group_by(Nominacion.alumno_id, Nominacion.evento_id)
+        .all()
     )
 
-    if nominaciones_normales < 3:
-        nom_excelencia = (
+    por_promover, por_revertir, repetidas = set(), set(), set()
+    conservar = []
+    for alumno_id, evento_id_, normales, primera_automatica, automaticas, total_excelencia in estado:
+        par = (alumno_id, evento_id_)
+        if normales >= NOMINACIONES_PARA_EXCELENCIA:
+            if not total_excelencia:
+                if par not in sin_promover:
+                    por_promover.add(par)
+            elif automaticas > 1:
+                repetidas.add(par)
+                conservar.append(primera_automatica)
+        elif automaticas:
+            por_revertir.add(par)
+
+    # 2️⃣ Quitar EXCELENCIA automáticas sobrantes (reversiones y repetidas; se conserva la más antigua)
+    eliminadas = 0
+    if por_revertir or repetidas:
+        eliminadas = (
             Nominacion.query
-            .filter_by(alumno_id=alumno_id, ciclo_id=ciclo_id, evento_id=evento_id, valor_id=excelencia.id)
-            .first()
+            .filter(
+                *alcance,
+                es_automatica,
+                tuple_(Nominacion.alumno_id, Nominacion.evento_id).in_(list(por_revertir | repetidas)),
+                Nominacion.id.notin_(conservar),
+            )
+            .delete(synchronize_session=False)
         )
-        if nom_excelencia:
-            db.session.delete(nom_excelencia)
-            db.session.commit()
+
+    # 3️⃣ Crear las que faltan
+    if por_promover:
+        _promover_a_excelencia(ciclo_id, valor_excelencia_id, por_promover)
+
+    # 4️⃣ Contadores y resumen al día
+    reconstruir_contadores_excelencia(ciclo_id, evento_id)
+    reconstruir_resumen_nominaciones(ciclo_id, evento_id)
+
+    nombres = {}
+    afectados = {a for a, _ in por_promover | por_revertir | repetidas}
+    if afectados:
+        nombres = dict(db.session.query(Alumno.id, Alumno.nombre).filter(Alumno.id.in_(afectados)))
+
+    def detalle(pares):
+        return sorted(
+            ({"alumno_id": a, "alumno": nombres.get(a), "evento_id": e} for a, e in pares),
+            key=lambda d: (d["evento_id"], d["alumno"] or ""),
+        )
+
+    return {
+        "evaluados": len(estado),
+        "promovidos": detalle(por_promover),
+        "revertidos": detalle(por_revertir),
+        "repetidas_eliminadas": len(repetidas),
+        "nominaciones_eliminadas": eliminadas,
+        "segundos": round(time.perf_counter() - inicio, 3),
+    }
 
 # ======================================================
 # 🔁 Recalcular comentario de la nominación EXCELENCIA
 # ======================================================
-def recalcular_comentario_excelencia(alumno_id, ciclo_id):
+def recalcular_comentario_excelencia(alumno_id, ciclo_id, evento_id):
     """
     Reconstruye el comentario de la nominación EXCELENCIA a partir de las
     3 nominaciones 'visuales' (las que incluyen el tag [EXCELENCIA-VISUAL]).
@@ -507,6 +642,7 @@ def activar_ciclo(ciclo_id):
 
     # Activar este
     ciclo.activo = True
+    marcar_cambio_ciclo()  # 🔹 el UPDATE masivo no pasa por el flush: avisar a todos los workers
     db.session.commit()
 
     return jsonify({"success": True, "activo_id": ciclo_id})
@@ -559,7 +695,7 @@ def importar_maestros_ciclo():
             return redirect(url_for('admin_bp.maestros_ciclo'))
 
         # ✅ Obtener ciclo activo
-        ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+        ciclo_activo = ciclo_actual()
         if not ciclo_activo:
             flash("⚠️ No hay ningún ciclo activo. Activa un ciclo primero.", "warning")
             return redirect(url_for('admin_bp.gestionar_ciclos'))
@@ -628,7 +764,7 @@ def importar_maestros_ciclo():
 @login_required
 @admin_required
 def maestros_ciclo():
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
 
     if not ciclo_activo:
         flash("⚠️ No hay un ciclo activo.", "warning")
@@ -649,6 +785,7 @@ def maestros_ciclo():
 @login_required
 def borrar_maestro_definitivo(id):
     maestro = Maestro.query.get_or_404(id)
+    limpiar_derivados_nominaciones(maestro_nominado_id=maestro.id)
     db.session.delete(maestro)
     db.session.commit()
     flash("🗑️ Maestro eliminado definitivamente.", "success")
@@ -665,7 +802,7 @@ def alumnos_ciclo():
         flash("🚫 Solo los administradores pueden acceder.", "danger")
         return redirect(url_for('nom.principal'))
 
-    ciclo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo = ciclo_actual()
     alumnos = Alumno.query.filter_by(ciclo_id=ciclo.id).all() if ciclo else []
 
     # 🔹 Ordena los bloques numéricamente si se llaman "Bloque 1", "Bloque 2", etc.
@@ -712,7 +849,7 @@ def importar_alumnos_ciclo():
             flash(f"❌ La plantilla debe contener las columnas: {faltan}", "danger")
             return redirect(url_for('admin_bp.alumnos_ciclo'))
 
-        ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+        ciclo_activo = ciclo_actual()
         if not ciclo_activo:
             flash("⚠️ No hay un ciclo activo. Activa un ciclo primero.", "warning")
             return redirect(url_for('admin_bp.gestionar_ciclos'))
@@ -788,7 +925,7 @@ def bloques_ciclo():
         return redirect(url_for('nom.principal'))
 
     # ✅ Obtener ciclo activo
-    ciclo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo = ciclo_actual()
     if not ciclo:
         flash("⚠️ No hay un ciclo activo. Activa un ciclo antes de administrar bloques.", "warning")
         return redirect(url_for('admin_bp.gestionar_ciclos'))
@@ -872,7 +1009,7 @@ def importar_alumnos_por_bloque():
         return redirect(url_for('nom.principal'))
 
     # ✅ Verificar ciclo activo
-    ciclo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo = ciclo_actual()
     if not ciclo:
         flash("⚠️ No hay un ciclo activo. Activa un ciclo primero.", "warning")
         return redirect(url_for('admin_bp.gestionar_ciclos'))
@@ -1025,6 +1162,7 @@ def eliminar_alumno(id):
         return jsonify({"error": "No autorizado"}), 403
 
     alumno = Alumno.query.get_or_404(id)
+    limpiar_derivados_nominaciones(alumno_id=alumno.id)
     db.session.delete(alumno)
     db.session.commit()
     return jsonify({"message": f"Alumno {alumno.nombre} eliminado."}), 200
@@ -1053,7 +1191,7 @@ def admin_required(f):
 @login_required
 def listar_valores():
     # Usar tu modelo correcto
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
     if not ciclo_activo:
         flash("⚠️ No hay ciclo activo.", "warning")
         return redirect(url_for('admin_bp.gestionar_ciclos'))
@@ -1069,7 +1207,7 @@ def listar_valores():
 def crear_valor():
     nombre = request.form.get('nombre', '').strip().title()
     descripcion = request.form.get('descripcion', '').strip()
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
 
     if not ciclo_activo:
         flash("⚠️ No hay ciclo activo.", "danger")
@@ -1114,7 +1252,7 @@ def eliminar_valor(id):
 @admin_required
 def gestionar_nominaciones():
     """Vista de administración para revisar todas las nominaciones del ciclo activo"""
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
     if not ciclo_activo:
         flash("⚠️ No hay ciclo escolar activo.", "warning")
         return redirect(url_for('admin_bp.gestionar_ciclos'))
@@ -1145,6 +1283,7 @@ from sqlalchemy.exc import IntegrityError  # ✅ agregar si no lo tienes
 # Maestro nomina a alumnos (sin dependencia de bloque)
 @nom.route('/nominaciones/alumno', methods=['GET', 'POST'])
 @login_required
+@envio_idempotente
 def nominar_alumno():
     cerrar_eventos_vencidos()
     # 1️⃣ Validar rol del usuario
@@ -1153,24 +1292,19 @@ def nominar_alumno():
         return redirect(url_for('nom.principal'))
 
     # 2️⃣ Validar que haya ciclo activo
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
     if not ciclo_activo:
         flash("⚠️ No hay ciclo activo disponible.", "warning")
         return redirect(url_for('nom.principal'))
 
     # 3️⃣ Obtener maestro actual
-    maestro = Maestro.query.filter_by(correo=current_user.email, ciclo_id=ciclo_activo.id).first()
+    maestro = maestro_actual()
     if not maestro:
         flash("⚠️ No se encontró tu registro como maestro en el ciclo activo.", "warning")
         return redirect(url_for('nom.principal'))
 
     # 4️⃣ Obtener evento activo del BLOQUE del maestro
-    evento_abierto = (
-        EventoAsamblea.query
-        .filter_by(ciclo_id=ciclo_activo.id, activo=True)
-        .order_by(EventoAsamblea.fecha_evento.asc())
-        .first()
-    )
+    evento_abierto = next(iter(contexto_ciclo().eventos_activos()), None)
 
     # 🔍 Validar que exista un evento activo y que esté en tiempo
     if not evento_abierto:
@@ -1178,11 +1312,8 @@ def nominar_alumno():
         return redirect(url_for('nom.principal'))
 
     # 👉 Si el evento está marcado como activo pero su fecha de cierre ya pasó, se debe bloquear también
+    #    (cerrar_eventos_vencidos lo desactivará en su siguiente pasada)
     if not evento_abierto.esta_abierto:
-        # Desactivamos el evento automáticamente (opcional, pero útil)
-        evento_abierto.activo = False
-        db.session.commit()
-
         flash(
             f"🚫 El evento {evento_abierto.nombre_mes} ya cerró las nominaciones "
             f"(cierre: {evento_abierto.fecha_cierre_nominaciones.strftime('%d/%m/%Y %H:%M')}).",
@@ -1192,49 +1323,38 @@ def nominar_alumno():
 
     # 5️⃣ Procesar envío del formulario
     if request.method == 'POST':
-        valor_id = request.form.get('valor_id')
-        alumno_ids = request.form.getlist('alumnos')
+        valor_id = request.form.get('valor_id', type=int)
+        alumno_ids = request.form.getlist('alumnos', type=int)
         comentario = request.form.get('comentario', '').strip()
 
         if not valor_id or not alumno_ids:
             flash("⚠️ Selecciona al menos un alumno y un valor.", "warning")
             return redirect(url_for('nom.nominar_alumno'))
 
-        nuevas = 0
-        duplicadas = 0
-
-        for alumno_id in alumno_ids:
-            # ✅ Pre-check alineado a tu índice único (evento + tipo)
-            existente = Nominacion.query.filter_by(
-                alumno_id=alumno_id,
-                maestro_id=maestro.id,
-                valor_id=valor_id,
-                ciclo_id=ciclo_activo.id,
-                evento_id=evento_abierto.id,
-                tipo='alumno'
-            ).first()
-            if existente:
-                duplicadas += 1
-                continue
-
-            nueva_nom = Nominacion(
-                alumno_id=alumno_id,
-                maestro_id=maestro.id,
-                valor_id=valor_id,
-                ciclo_id=ciclo_activo.id,
-                comentario=comentario,
-                evento_id=evento_abierto.id,
-                tipo='alumno'
-            )
+        # ✅ Un solo INSERT para todo el grupo; los duplicados los descarta el índice único
+        filas = [
+            {
+                "alumno_id": alumno_id,
+                "maestro_id": maestro.id,
+                "valor_id": valor_id,
+                "ciclo_id": ciclo_activo.id,
+                "comentario": comentario,
+                "evento_id": evento_abierto.id,
+                "tipo": "alumno",
+            }
+            for alumno_id in alumno_ids
+        ]
+        creadas, repetidas = insertar_nominaciones(filas)
+        promovidos = registrar_cambios_excelencia(ciclo_activo.id, altas=[
+            (nuevo_id, f["alumno_id"], f["evento_id"], f["valor_id"]) for nuevo_id, f in creadas
+        ])
+        db.session.commit()
 
-            try:
-                db.session.add(nueva_nom)
-                db.session.commit()  # ✅ commit por fila: evita que un duplicado rompa todo
-                nuevas += 1
-            except IntegrityError:
-                db.session.rollback()
-                duplicadas += 1
+        nuevas = len(creadas)
+        duplicadas = len(repetidas)
 
+        if promovidos:
+            flash(f"🏅 {len(promovidos)} alumno(s) alcanzaron EXCELENCIA por acumular 3 nominaciones.", "success")
         if nuevas > 0 and duplicadas == 0:
             flash(f"✅ Se registraron {nuevas} nominaciones al evento {evento_abierto.nombre_mes}.", "success")
         elif nuevas > 0 and duplicadas > 0:
@@ -1251,7 +1371,7 @@ def nominar_alumno():
         .order_by(Alumno.grado, Alumno.grupo, Alumno.nombre)
         .all()
     )
-    valores = Valor.query.filter_by(ciclo_id=ciclo_activo.id, activo=True).all()
+    valores = contexto_ciclo().valores()
 
     # 7️⃣ Mostrar también las nominaciones previas del maestro
     nominaciones = (
@@ -1263,6 +1383,7 @@ def nominar_alumno():
 
     return render_template(
         'nominacion_alumno.html',
+        token_envio=nuevo_token_envio(),
         alumnos=alumnos,
         valores=valores,
         nominaciones=nominaciones,
@@ -1321,6 +1442,7 @@ import zoneinfo
 
 @nom.route('/nominaciones/personal', methods=['GET', 'POST'])
 @login_required
+@envio_idempotente
 def nominar_personal():
     cerrar_eventos_vencidos()
     """Vista para que los profesores (o admins) nominen a otros miembros del personal."""
@@ -1330,7 +1452,7 @@ def nominar_personal():
         return redirect(url_for('nom.principal'))
 
     # 2️⃣ Validar ciclo activo
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
     if not ciclo_activo:
         flash("⚠️ No hay ciclo activo disponible.", "warning")
         return redirect(url_for('nom.principal'))
@@ -1339,7 +1461,7 @@ def nominar_personal():
     sincronizar_admins_como_maestros(ciclo_activo)
 
     # 3️⃣ Obtener maestro actual
-    maestro = Maestro.query.filter_by(correo=current_user.email, ciclo_id=ciclo_activo.id, activo=True).first()
+    maestro = maestro_actual(solo_activo=True)
     if not maestro:
         flash("⚠️ No se encontró tu registro como maestro activo en el ciclo actual.", "warning")
         return redirect(url_for('nom.principal'))
@@ -1358,59 +1480,38 @@ def nominar_personal():
 
     # 5️⃣ Procesar nominaciones (POST)
     if request.method == 'POST':
-        valor_id = request.form.get('valor_id')
-        nominados = request.form.getlist('maestros')
+        valor_id = request.form.get('valor_id', type=int)
+        nominados = request.form.getlist('maestros', type=int)
         comentario = request.form.get('comentario', '').strip()
 
         if not valor_id or not nominados:
             flash("⚠️ Selecciona al menos un maestro y un valor.", "warning")
             return redirect(url_for('nom.nominar_personal'))
 
-        nuevas = 0
-        duplicados = []
-
-        for nominado_id in nominados:
-            # ✅ Pre-check ahora alineado al índice único (incluye evento_id y tipo)
-            existente = Nominacion.query.filter_by(
-                maestro_nominado_id=nominado_id,
-                maestro_id=maestro.id,
-                valor_id=valor_id,
-                ciclo_id=ciclo_activo.id,
-                evento_id=evento_abierto.id,
-                tipo='personal'
-            ).first()
-
-            if existente:
-                nominado = Maestro.query.get(nominado_id)
-                if nominado:
-                    duplicados.append(nominado.nombre)
-                continue
-
-            nueva_nom = Nominacion(
-                maestro_nominado_id=nominado_id,
-                maestro_id=maestro.id,
-                valor_id=valor_id,
-                ciclo_id=ciclo_activo.id,
-                comentario=comentario,
-                evento_id=evento_abierto.id,
-                tipo='personal'
-            )
-
-            try:
-                # ✅ Savepoint: si entra doble request, el índice único bloquea y no truena todo
-                with db.session.begin_nested():
-                    db.session.add(nueva_nom)
-                    db.session.flush()
-                nuevas += 1
-
-            except IntegrityError:
-                db.session.rollback()
-                nominado = Maestro.query.get(nominado_id)
-                if nominado:
-                    duplicados.append(nominado.nombre)
-
+        # ✅ Un solo INSERT para todos los nominados; los duplicados los descarta el índice único
+        filas = [
+            {
+                "maestro_nominado_id": nominado_id,
+                "maestro_id": maestro.id,
+                "valor_id": valor_id,
+                "ciclo_id": ciclo_activo.id,
+                "comentario": comentario,
+                "evento_id": evento_abierto.id,
+                "tipo": "personal",
+            }
+            for nominado_id in nominados
+        ]
+        creadas, repetidas = insertar_nominaciones(filas)
         db.session.commit()
 
+        nuevas = len(creadas)
+        duplicados = []
+        if repetidas:
+            ids_repetidos = {f["maestro_nominado_id"] for f in repetidas}
+            duplicados = [
+                m.nombre for m in Maestro.query.filter(Maestro.id.in_(ids_repetidos)).all()
+            ]
+
         # ✅ Mensajes más detallados (igual que tu lógica, solo contando mejor duplicados)
         if nuevas > 0 and not duplicados:
             flash(f"✅ Se registraron {nuevas} nominaciones de personal al evento {evento_abierto.nombre_mes}.", "success")
@@ -1448,6 +1549,7 @@ def nominar_personal():
 
     return render_template(
         'nominacion_personal.html',
+        token_envio=nuevo_token_envio(),
         maestros=maestros,
         valores=valores,
         valores_json=valores_json,
@@ -1466,7 +1568,7 @@ def exportar_nominaciones_excel():
     Exporta nominaciones del ciclo activo a Excel.
     ?tipo=alumno|personal  (opcional; si no se envía, exporta todo)
     """
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
     if not ciclo_activo:
         return jsonify({"error": "No hay ciclo escolar activo."}), 400
 
@@ -1513,7 +1615,7 @@ def exportar_nominaciones_excel():
 @login_required
 def obtener_nominaciones_data():
     """Devuelve nominaciones del ciclo activo filtradas por parámetros opcionales."""
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
     if not ciclo_activo:
         return jsonify({"items": [], "error": "No hay ciclo activo."})
 
@@ -1567,7 +1669,7 @@ def obtener_nominaciones_data():
 @nom.route('/admin/catalogo/valores')
 @login_required
 def catalogo_valores():
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
     valores = Valor.query.filter_by(ciclo_id=ciclo_activo.id).order_by(Valor.nombre.asc()).all()
     return jsonify([{"id": v.id, "nombre": v.nombre} for v in valores])
 
@@ -1585,7 +1687,7 @@ def lista_alumnos():
     if current_user.rol != 'admin':
         return jsonify({"error": "No autorizado"}), 403
 
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
     if not ciclo_activo:
         return jsonify({"error": "No hay ciclo activo."}), 400
 
@@ -1693,7 +1795,7 @@ def lista_maestros_json():
     if current_user.rol != 'admin':
         return jsonify({"error": "No autorizado"}), 403
 
-    ciclo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo = ciclo_actual()
     if not ciclo:
         return jsonify([])
 
@@ -1790,8 +1892,6 @@ def eliminar_maestro(id):
 # -------------------------------
 # 🔹 Dashboard del Administrador
 
-from datetime import datetime
-
 @admin_bp.route('/dashboard')
 @login_required
 def admin_dashboard():
@@ -1801,7 +1901,7 @@ def admin_dashboard():
         flash("🚫 Solo los administradores pueden acceder al dashboard.", "danger")
         return redirect(url_for('nom.principal'))
 
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
     if not ciclo_activo:
         flash("⚠️ No hay ciclo escolar activo.", "warning")
         return redirect(url_for('nom.panel_admin'))
@@ -1859,52 +1959,68 @@ def admin_dashboard():
     )
 
 # 🔹 Datos JSON para el dashboard (filtrados por mes)
-@admin_bp.route('/dashboard/data/resumen')
-@login_required
-def data_dashboard_resumen():
-    if current_user.rol != 'admin':
-        return jsonify({"error": "Solo los administradores pueden consultar este recurso."}), 403
+# Caché por worker: {(ciclo_id, mes): (versiones, creado, respuesta)}. Se invalida cuando cambia la
+# versión de nominaciones o del catálogo del ciclo; el TTL cubre altas de alumnos (no versionadas).
+TTL_RESUMEN_DASHBOARD = timedelta(minutes=5)
+_cache_resumen_dashboard = {}
 
-    ciclo = CicloEscolar.query.filter_by(activo=True).first()
-    if not ciclo:
-        return jsonify({"error": "No hay ciclo activo."}), 400
 
-    mes = request.args.get("mes")  # p.ej. ?mes=Octubre
+def _calcular_resumen_dashboard(ciclo_id, mes):
+    """KPIs del dashboard con consultas agregadas (solo conteos, sin cargar nominaciones)."""
+    from models import ResumenNominacion
 
-    # Base query: nominaciones del ciclo
-    query = Nominacion.query.filter_by(ciclo_id=ciclo.id)
+    # Conteos por tipo y por valor: desde el resumen de nominaciones
+    por_tipo_q = (
+        db.session.query(ResumenNominacion.tipo, db.func.sum(ResumenNominacion.nominaciones))
+        .filter(ResumenNominacion.ciclo_id == ciclo_id)
+        .group_by(ResumenNominacion.tipo)
+    )
+    por_valor_q = (
+        db.session.query(Valor.nombre, db.func.sum(ResumenNominacion.nominaciones))
+        .join(Valor, Valor.id == ResumenNominacion.valor_id)
+        .filter(ResumenNominacion.ciclo_id == ciclo_id)
+        .group_by(Valor.nombre)
+    )
+    # Por día: desde nominaciones (el resumen solo guarda primera/última fecha), con el mismo
+    # criterio que el resumen (con evento y con nominado) para que los cuatro conteos cuadren
+    por_dia_q = (
+        db.session.query(Nominacion.fecha, db.func.count(Nominacion.id))
+        .filter(
+            Nominacion.ciclo_id == ciclo_id,
+            Nominacion.evento_id.isnot(None),
+            (Nominacion.alumno_id.isnot(None)) | (Nominacion.maestro_nominado_id.isnot(None)),
+        )
+        .group_by(Nominacion.fecha)
+    )
     if mes:
-        query = query.join(EventoAsamblea).filter(EventoAsamblea.nombre_mes == mes)
-
-    nominaciones = query.all()
+        eventos_mes = [e.id for e in contexto_ciclo().eventos() if e.nombre_mes == mes]
+        por_tipo_q = por_tipo_q.filter(ResumenNominacion.evento_id.in_(eventos_mes))
+        por_valor_q = por_valor_q.filter(ResumenNominacion.evento_id.in_(eventos_mes))
+        por_dia_q = por_dia_q.filter(Nominacion.evento_id.in_(eventos_mes))
 
     # KPIs
-    total_maestros = Maestro.query.filter_by(ciclo_id=ciclo.id).count()
-    total_alumnos = Alumno.query.filter_by(ciclo_id=ciclo.id).count()
-    total_nominaciones = len(nominaciones)
+    total_maestros = Maestro.query.filter_by(ciclo_id=ciclo_id).count()
+    total_alumnos = Alumno.query.filter_by(ciclo_id=ciclo_id).count()
 
     # Nominaciones por tipo
     por_tipo = {"alumno": 0, "personal": 0}
-    for n in nominaciones:
-        if n.tipo in por_tipo:
-            por_tipo[n.tipo] += 1
+    total_nominaciones = 0
+    for tipo, n in por_tipo_q:
+        total_nominaciones += n
+        if tipo in por_tipo:
+            por_tipo[tipo] += n
 
     # Top valores
-    conteo_valores = {}
-    for n in nominaciones:
-        if n.valor:
-            nombre = n.valor.nombre
-            conteo_valores[nombre] = conteo_valores.get(nombre, 0) + 1
-    por_valor = [{"valor": v, "n": c} for v, c in sorted(conteo_valores.items(), key=lambda x: x[1], reverse=True)]
+    por_valor = [{"valor": v, "n": c} for v, c in sorted(por_valor_q, key=lambda x: x[1], reverse=True)]
 
     # Nominaciones por día (solo días del mes si se pasó ?mes=)
     fechas = {}
-    for n in nominaciones:
-        fecha_str = n.fecha.strftime("%d/%m/%Y") if n.fecha else "Sin fecha"
-        fechas[fecha_str] = fechas.get(fecha_str, 0) + 1
+    for fecha, n in por_dia_q:
+        fecha_str = fecha.strftime("%d/%m/%Y") if fecha else "Sin fecha"
+        fechas[fecha_str] = fechas.get(fecha_str, 0) + n
     por_dia = [{"fecha": f, "n": c} for f, c in sorted(fechas.items())]
 
-    return jsonify({
+    return {
         "totales": {
             "maestros": total_maestros,
             "alumnos": total_alumnos,
@@ -1913,7 +2029,32 @@ def data_dashboard_resumen():
         "por_tipo": por_tipo,
         "por_valor": por_valor,
         "por_dia": por_dia
-    })
+    }
+
+
+@admin_bp.route('/dashboard/data/resumen')
+@login_required
+def data_dashboard_resumen():
+    if current_user.rol != 'admin':
+        return jsonify({"error": "Solo los administradores pueden consultar este recurso."}), 403
+
+    ciclo = ciclo_actual()
+    if not ciclo:
+        return jsonify({"error": "No hay ciclo activo."}), 400
+
+    mes = request.args.get("mes")  # p.ej. ?mes=Octubre
+
+    # ⚡ Respuesta en caché mientras no cambien nominaciones ni catálogo
+    clave = (ciclo.id, mes or None)
+    versiones = (version_catalogo(VERSION_NOMINACIONES), contexto_ciclo().version)
+    ahora = datetime.utcnow()
+    guardado = _cache_resumen_dashboard.get(clave)
+    if guardado and guardado[0] == versiones and ahora - guardado[1] < TTL_RESUMEN_DASHBOARD:
+        return jsonify(guardado[2])
+
+    respuesta = _calcular_resumen_dashboard(ciclo.id, mes)
+    _cache_resumen_dashboard[clave] = (versiones, ahora, respuesta)
+    return jsonify(respuesta)
 
 
 
@@ -1949,7 +2090,7 @@ def calendario_eventos():
     
     cerrar_eventos_vencidos()
     
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
     if not ciclo_activo:
         flash("⚠️ No hay un ciclo escolar activo.", "warning")
         return redirect(url_for('admin_bp.gestionar_ciclos'))
@@ -2045,6 +2186,7 @@ def eliminar_evento(evento_id):
     if not evento:
         return jsonify({'success': False, 'error': 'Evento no encontrado'}), 404
 
+    limpiar_derivados_nominaciones(evento_id=evento.id)
     db.session.delete(evento)
     db.session.commit()
     return jsonify({'success': True})
@@ -2068,12 +2210,74 @@ def toggle_evento(evento_id):
 # ===============================
 from models import Alumno, Nominacion, EventoAsamblea, Maestro, Valor, Bloque, CicloEscolar
 
+
+def matriz_nominaciones(ciclo_id, alumnos_q, meses, tipo=None):
+    """
+    Motor compartido de las matrices mensuales (admin, panel del maestro y matriz del grupo).
+
+    Ejecuta `alumnos_q` y trae (alumno, mes_ordinal, valor, maestro, fecha) de TODAS sus
+    nominaciones en una sola consulta; luego pivotea en memoria a
+    {alumno_id: {"<mes_ordinal>": [{"valor", "maestro", "fecha"}, ...]}} con una lista por mes de `meses`.
+    Devuelve (alumnos, pivote).
+    """
+    alumnos = alumnos_q.all()
+    plantilla = [str(m) for m in meses]
+    pivote = {a.id: {m: [] for m in plantilla} for a in alumnos}
+    if not alumnos:
+        return alumnos, pivote
+
+    ids_alumnos = alumnos_q.order_by(None).with_entities(Alumno.id).statement
+    filas = (
+        db.session.query(
+            Nominacion.alumno_id,
+            EventoAsamblea.mes_ordinal,
+            Valor.nombre,
+            Maestro.nombre,
+            Nominacion.fecha,
+        )
+        .join(EventoAsamblea, Nominacion.evento_id == EventoAsamblea.id)
+        .outerjoin(Valor, Nominacion.valor_id == Valor.id)
+        .outerjoin(Maestro, Nominacion.maestro_id == Maestro.id)
+        .filter(Nominacion.ciclo_id == ciclo_id, Nominacion.alumno_id.in_(ids_alumnos))
+    )
+    if tipo:
+        filas = filas.filter(Nominacion.tipo == tipo)
+
+    for alumno_id, mes, valor, maestro, fecha in filas.order_by(Nominacion.id.asc()):
+        lista = pivote[alumno_id].get(str(mes)) if mes else None
+        if lista is None:
+            continue
+        lista.append({
+            "valor": valor or "",
+            "maestro": maestro or "",
+            "fecha": fecha.strftime("%Y-%m-%d") if fecha else ""
+        })
+
+    return alumnos, pivote
+
+
+def filas_matriz(alumnos, pivote):
+    """Filas JSON de las matrices mensuales: el alumno, sus valores por mes y si no tiene ninguno."""
+    resultado = []
+    for alumno in alumnos:
+        valores_por_mes = pivote[alumno.id]
+        resultado.append({
+            "id": alumno.id,
+            "nombre": alumno.nombre,
+            "grado": alumno.grado,
+            "grupo": alumno.grupo,
+            "valores_por_mes": valores_por_mes,
+            "sin_nominacion": all(len(v) == 0 for v in valores_por_mes.values())
+        })
+    return resultado
+
+
 @admin_bp.route('/matriz_data', methods=['GET'])
 @login_required
 @admin_required
 def matriz_data():
     """Devuelve los datos estructurados de la matriz mensual."""
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
     if not ciclo_activo:
         return jsonify({"error": "No hay ciclo activo."}), 400
 
@@ -2082,7 +2286,7 @@ def matriz_data():
     grupo = request.args.get('grupo')
 
     # 1️⃣ Obtener eventos del ciclo ordenados por mes
-    eventos = EventoAsamblea.query.filter_by(ciclo_id=ciclo_activo.id).order_by(EventoAsamblea.mes_ordinal.asc()).all()
+    eventos = contexto_ciclo().eventos()
     meses_data = [
         {
             "id": e.id,
@@ -2102,36 +2306,18 @@ def matriz_data():
     if grupo:
         q = q.filter(Alumno.grupo == grupo.upper())
 
-    alumnos = q.order_by(Alumno.grado, Alumno.grupo, Alumno.nombre).all()
-
-    # 3️⃣ Armar estructura de alumnos con sus nominaciones por mes
-    resultado = []
-    for alumno in alumnos:
-        valores_por_mes = {str(e.mes_ordinal): [] for e in eventos}
-        nominaciones = Nominacion.query.filter_by(alumno_id=alumno.id, ciclo_id=ciclo_activo.id).all()
-
-        for n in nominaciones:
-            if n.evento and n.evento.mes_ordinal:
-                valores_por_mes[str(n.evento.mes_ordinal)].append({
-                    "valor": n.valor.nombre if n.valor else "",
-                    "maestro": n.maestro.nombre if n.maestro else "",
-                    "fecha": n.fecha.strftime("%Y-%m-%d") if n.fecha else ""
-                })
-
-        sin_nominacion = all(len(v) == 0 for v in valores_por_mes.values())
+    # 3️⃣ Armar estructura de alumnos con sus nominaciones por mes (una sola consulta)
+    alumnos, pivote = matriz_nominaciones(
+        ciclo_activo.id,
+        q.order_by(Alumno.grado, Alumno.grupo, Alumno.nombre),
+        [e.mes_ordinal for e in eventos],
+    )
 
-        resultado.append({
-            "id": alumno.id,
-            "nombre": alumno.nombre,
-            "grado": alumno.grado,
-            "grupo": alumno.grupo,
-            "valores_por_mes": valores_por_mes,
-            "sin_nominacion": sin_nominacion
-        })
+    resultado = filas_matriz(alumnos, pivote)
 
     return jsonify({
         "ciclo": ciclo_activo.nombre,
-        "bloque": Bloque.query.get(bloque_id).nombre if bloque_id else None,
+        "bloque": next((b.nombre for b in contexto_ciclo().bloques() if b.id == bloque_id), None),
         "meses": meses_data,
         "alumnos": resultado
     })
@@ -2140,7 +2326,7 @@ def matriz_data():
 @login_required
 @admin_required
 def bloques_json():
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
     if not ciclo_activo:
         return jsonify([])
     bloques = Bloque.query.filter_by(ciclo_id=ciclo_activo.id).order_by(Bloque.nombre.asc()).all()
@@ -2176,78 +2362,42 @@ def panel_nominaciones_data():
     if current_user.rol != 'profesor':
         return jsonify({"error": "No autorizado."}), 403
 
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
     if not ciclo_activo:
         return jsonify({"error": "No hay ciclo activo."}), 400
 
-    maestro = Maestro.query.filter_by(correo=current_user.email, ciclo_id=ciclo_activo.id).first()
+    maestro = maestro_actual()
     if not maestro:
         return jsonify({"error": "No se encontró tu registro de maestro."}), 404
 
     # --- Evento activo del ciclo (si hay)
-    evento_activo = (
-        EventoAsamblea.query
-        .filter_by(ciclo_id=ciclo_activo.id, activo=True)
-        .order_by(EventoAsamblea.fecha_evento.asc())
-        .first()
-    )
+    evento_activo = next(iter(contexto_ciclo().eventos_activos()), None)
 
     # --- Lista de meses del ciclo
-    eventos = EventoAsamblea.query.filter_by(ciclo_id=ciclo_activo.id).order_by(EventoAsamblea.mes_ordinal.asc()).all()
+    eventos = contexto_ciclo().eventos()
     meses = [{"id": e.id, "nombre": e.nombre_mes, "mes_ordinal": e.mes_ordinal} for e in eventos]
 
     # --- Detectar bloque actual a partir de los alumnos del ciclo
     primer_alumno = Alumno.query.filter_by(ciclo_id=ciclo_activo.id).first()
     bloque_id = primer_alumno.bloque_id if primer_alumno else None
-    bloque_nombre = None
     grado_actual = primer_alumno.grado if primer_alumno else None
     grupo_actual = primer_alumno.grupo if primer_alumno else None
 
-    if bloque_id:
-        from models import Bloque
-        bloque_obj = Bloque.query.get(bloque_id)
-        bloque_nombre = bloque_obj.nombre if bloque_obj else None
-
-    # --- Filtrar alumnos del mismo bloque / grado / grupo
-    alumnos = (
+    # --- Filtrar alumnos del mismo bloque / grado / grupo (nominaciones en una sola consulta)
+    alumnos, pivote = matriz_nominaciones(
+        ciclo_activo.id,
         Alumno.query
         .filter_by(ciclo_id=ciclo_activo.id, bloque_id=bloque_id, grado=grado_actual, grupo=grupo_actual)
-        .order_by(Alumno.nombre.asc())
-        .all()
+        .order_by(Alumno.nombre.asc()),
+        [e.mes_ordinal for e in eventos],
     )
 
-    resultado = []
-    for alumno in alumnos:
-        valores_por_mes = {str(e.mes_ordinal): [] for e in eventos}
-        nominaciones = Nominacion.query.filter_by(alumno_id=alumno.id, ciclo_id=ciclo_activo.id).all()
-
-        for n in nominaciones:
-            if n.evento and n.evento.mes_ordinal:
-                valores_por_mes[str(n.evento.mes_ordinal)].append({
-                    "valor": n.valor.nombre if n.valor else "",
-                    "maestro": n.maestro.nombre if n.maestro else "",
-                    "fecha": n.fecha.strftime("%Y-%m-%d") if n.fecha else ""
-                })
-
-        sin_nominacion = all(len(v) == 0 for v in valores_por_mes.values())
-
-        resultado.append({
-            "id": alumno.id,
-            "nombre": alumno.nombre,
-            "grado": alumno.grado,
-            "grupo": alumno.grupo,
-            "valores_por_mes": valores_por_mes,
-            "sin_nominacion": sin_nominacion
-        })
+    resultado = filas_matriz(alumnos, pivote)
 
     # Detectar bloque automáticamente a partir de los alumnos cargados
     bloque_nombre = None
-    if alumnos:
-        primer_alumno = alumnos[0]
-        if primer_alumno.bloque_id:
-            from models import Bloque
-            bloque_obj = Bloque.query.get(primer_alumno.bloque_id)
-            bloque_nombre = bloque_obj.nombre if bloque_obj else None
+    if alumnos and alumnos[0].bloque_id:
+        bloque_nombre = next((b.nombre for b in contexto_ciclo().bloques() if b.id == alumnos[0].bloque_id), None)
 
     return jsonify({
         "bloque": bloque_nombre or "Sin bloque",
@@ -2268,6 +2418,7 @@ from datetime import datetime
 
 @nom.route('/nominacion_alumno/<int:alumno_id>', methods=['GET', 'POST'])
 @login_required
+@envio_idempotente
 def nominar_alumno_individual(alumno_id):
     cerrar_eventos_vencidos()
     """Vista individual donde el maestro puede nominar a un alumno."""
@@ -2278,25 +2429,20 @@ def nominar_alumno_individual(alumno_id):
         return redirect(url_for('nom.principal'))
 
     # 2️⃣ Verificar ciclo activo
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
     if not ciclo_activo:
         flash("⚠️ No hay ciclo activo disponible.", "warning")
         return redirect(url_for('nom.panel_nominaciones'))
 
     # 3️⃣ Maestro actual
-    maestro = Maestro.query.filter_by(correo=current_user.email, ciclo_id=ciclo_activo.id).first()
+    maestro = maestro_actual()
     alumno = Alumno.query.get_or_404(alumno_id)
 
     # 4️⃣ Valores activos del ciclo
-    valores = Valor.query.filter_by(ciclo_id=ciclo_activo.id, activo=True).all()
+    valores = contexto_ciclo().valores()
 
-    # 5️⃣ Detectar evento activo del bloque
-    evento_abierto = (
-        EventoAsamblea.query
-        .filter_by(ciclo_id=ciclo_activo.id, bloque_id=alumno.bloque_id, activo=True)
-        .order_by(EventoAsamblea.fecha_evento.asc())
-        .first()
-    )
+    # 5️⃣ Detectar evento abierto del bloque (activo y antes del cierre)
+    evento_abierto = contexto_ciclo().evento_abierto(alumno.bloque_id)
 
     # 🚫 Validar que el evento esté abierto
     if not evento_abierto:
@@ -2321,27 +2467,15 @@ def nominar_alumno_individual(alumno_id):
 
     # 8️⃣ Procesar formulario
     if request.method == 'POST':
-        valor_id = request.form.get('valor_id')
+        valor_id = request.form.get('valor_id', type=int)
         comentario = request.form.get('comentario', '').strip()
 
         if not valor_id:
             flash("⚠️ Debes seleccionar un valor.", "warning")
             return redirect(request.url)
 
-        # 🚫 Bloquear EXCELENCIA SOLO en el evento (mes) actual
-        tiene_excelencia_en_mes = (
-            Nominacion.query
-            .join(Valor)
-            .filter(
-                Nominacion.alumno_id == alumno.id,
-                Nominacion.ciclo_id == ciclo_activo.id,
-                Nominacion.evento_id == evento_abierto.id,   # 👈 FILTRO CLAVE
-                Valor.nombre.ilike("EXCELENCIA")
-            )
-            .first()
-        )
-
-        if tiene_excelencia_en_mes:
+        # 🚫 Bloquear EXCELENCIA SOLO en el evento (mes) actual (ya tenemos sus valores del mes)
+        if _id_valor_excelencia(ciclo_activo.id) in valores_asignados:
             flash("🏆 Este alumno ya alcanzó EXCELENCIA en este mes y no puede recibir más nominaciones aquí.", "warning")
             return redirect(url_for(
                 'nom.matriz_grupo_maestro',
@@ -2350,22 +2484,31 @@ def nominar_alumno_individual(alumno_id):
                 grupo=alumno.grupo
             ))
 
-        # ✅ Registrar la nueva nominación
-        nueva_nom = Nominacion(
-            alumno_id=alumno.id,
-            maestro_id=maestro.id,
-            valor_id=valor_id,
-            ciclo_id=ciclo_activo.id,
-            comentario=comentario,
-            evento_id=evento_abierto.id,
-            tipo='alumno',
-            fecha=datetime.utcnow()
-        )
-        db.session.add(nueva_nom)
-        db.session.commit()
+        # ✅ Registrar la nueva nominación (el índice único descarta la repetida)
+        creadas, _ = insertar_nominaciones([{
+            "alumno_id": alumno.id,
+            "maestro_id": maestro.id,
+            "valor_id": valor_id,
+            "ciclo_id": ciclo_activo.id,
+            "comentario": comentario,
+            "evento_id": evento_abierto.id,
+            "tipo": 'alumno',
+            "fecha": datetime.utcnow(),
+        }])
+        if not creadas:
+            flash(f"⚠️ Ya habías nominado a {alumno.nombre} con ese valor en este mes.", "warning")
+            return redirect(url_for(
+                'nom.matriz_grupo_maestro',
+                bloque_id=alumno.bloque_id,
+                grado=alumno.grado,
+                grupo=alumno.grupo
+            ))
 
-        # 🧠 Verificar si alcanza EXCELENCIA
-        promovido = actualizar_a_excelencia(alumno.id, ciclo_activo.id, evento_abierto.id)
+        # 🧠 Contador de EXCELENCIA en la misma transacción
+        promovido = bool(registrar_cambios_excelencia(ciclo_activo.id, altas=[
+            (nuevo_id, f["alumno_id"], f["evento_id"], f["valor_id"]) for nuevo_id, f in creadas
+        ]))
+        db.session.commit()
 
         if promovido:
             flash(f"🏅 {alumno.nombre} ha alcanzado el valor EXCELENCIA por acumular 3 nominaciones.", "success")
@@ -2382,29 +2525,195 @@ def nominar_alumno_individual(alumno_id):
     # 9️⃣ Renderizar plantilla
     return render_template(
         'nominacion_individual.html',
+        token_envio=nuevo_token_envio(),
         alumno=alumno,
         valores_disponibles=valores_disponibles,
         valores_asignados=nominaciones_previas
     )
 
 # ===============================
-# 🧭 PANEL PRINCIPAL DEL PROFESOR
+# 📦 NOMINACIÓN POR LOTE DESDE LA MATRIZ (JSON)
 # ===============================
-@nom.route('/panel_profesor')
-@login_required
-def panel_profesor():
-    """Panel principal con accesos rápidos para el profesor."""
-    if current_user.rol != 'profesor':
-        flash("🚫 Solo los profesores pueden acceder a este panel.", "danger")
-        return redirect(url_for('nom.principal'))
-
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
-    return render_template('panel_profesor.html', ciclo=ciclo_activo)
+LIMITE_LOTE_NOMINACIONES = 200
 
 
-# =======================================
-# 👨‍🏫 VISTA "MIS GRUPOS" (profesor optimizada y ordenada)
-@nom.route('/mis_grupos')
+@nom.route('/nominaciones/lote', methods=['POST'])
+@login_required
+def nominar_alumnos_lote():
+    """
+    Recibe {"items": [{"alumno_id", "valor_id", "comentario"}, ...]} y registra todo en una
+    sola transacción contra el evento abierto del bloque de cada alumno.
+    Valida en una pasada (evento abierto, valores ya asignados en el mes y regla de EXCELENCIA)
+    y devuelve un resultado por item: registrada | duplicada | rechazada.
+    """
+    cerrar_eventos_vencidos()
+
+    if current_user.rol != 'profesor':
+        return jsonify({"status": "error", "message": "Solo los profesores pueden registrar nominaciones."}), 403
+
+    ciclo_activo = ciclo_actual()
+    if not ciclo_activo:
+        return jsonify({"status": "error", "message": "No hay ciclo activo disponible."}), 400
+
+    maestro = maestro_actual()
+    if not maestro:
+        return jsonify({"status": "error", "message": "No se encontró tu registro como maestro."}), 403
+
+    data = request.get_json(silent=True) or {}
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        return jsonify({"status": "error", "message": "No se recibieron nominaciones."}), 400
+    if len(items) > LIMITE_LOTE_NOMINACIONES:
+        return jsonify({
+            "status": "error",
+            "message": f"Máximo {LIMITE_LOTE_NOMINACIONES} nominaciones por envío."
+        }), 400
+
+    # 1️⃣ Normalizar entrada
+    pedidos = []
+    for item in items:
+        try:
+            pedidos.append((
+                int(item.get("alumno_id")),
+                int(item.get("valor_id")),
+                (item.get("comentario") or "").strip(),
+            ))
+        except (AttributeError, TypeError, ValueError):
+            pedidos.append(None)
+
+    alumno_ids = {p[0] for p in pedidos if p}
+
+    # 2️⃣ Todo lo necesario para validar, en pocas consultas
+    alumnos = {
+        a.id: a for a in Alumno.query.filter(
+            Alumno.id.in_(alumno_ids), Alumno.ciclo_id == ciclo_activo.id
+        )
+    }
+    valores = {v.id: v for v in contexto_ciclo().valores()}
+
+    # 🔹 El evento que admite nominaciones en cada bloque (activo y antes de su cierre)
+    contexto = contexto_ciclo()
+    evento_por_bloque = {
+        bloque_id: contexto.evento_abierto(bloque_id)
+        for bloque_id in {a.bloque_id for a in alumnos.values()}
+    }
+
+    valor_excelencia_id = _id_valor_excelencia(ciclo_activo.id)
+    asignados, normales, con_excelencia = set(), {}, set()
+    eventos_ids = [e.id for e in evento_por_bloque.values() if e]
+    if alumnos and eventos_ids:
+        for alumno_id, evento_id, valor_id in (
+            db.session.query(Nominacion.alumno_id, Nominacion.evento_id, Nominacion.valor_id)
+            .filter(Nominacion.alumno_id.in_(list(alumnos)), Nominacion.evento_id.in_(eventos_ids))
+        ):
+            par = (alumno_id, evento_id)
+            asignados.add((alumno_id, evento_id, valor_id))
+            if valor_id == valor_excelencia_id:
+                con_excelencia.add(par)
+            else:
+                normales[par] = normales.get(par, 0) + 1
+
+    # 3️⃣ Validar en orden (lo aceptado antes en el lote cuenta para lo siguiente)
+    resultados, filas, indice_de_fila = [], [], {}
+    for indice, pedido in enumerate(pedidos):
+        resultado = {"indice": indice, "estado": "rechazada"}
+        resultados.append(resultado)
+        if pedido is None:
+            resultado["mensaje"] = "Datos inválidos."
+            continue
+
+        alumno_id, valor_id, comentario = pedido
+        resultado.update(alumno_id=alumno_id, valor_id=valor_id)
+        alumno = alumnos.get(alumno_id)
+        evento = evento_por_bloque.get(alumno.bloque_id) if alumno else None
+        par = (alumno_id, evento.id if evento else None)
+
+        if not alumno:
+            resultado["mensaje"] = "Alumno no encontrado en el ciclo activo."
+        elif valor_id not in valores:
+            resultado["mensaje"] = "Valor no disponible."
+        elif not evento:
+            resultado["mensaje"] = "Las nominaciones han cerrado para el bloque de este alumno."
+        elif par in con_excelencia:
+            resultado["mensaje"] = "El alumno ya alcanzó EXCELENCIA en este mes."
+        elif (alumno_id, evento.id, valor_id) in asignados:
+            resultado["estado"] = "duplicada"
+            resultado["mensaje"] = "El alumno ya tiene ese valor en este mes."
+        else:
+            asignados.add((alumno_id, evento.id, valor_id))
+            if valor_id == valor_excelencia_id:
+                con_excelencia.add(par)
+            else:
+                normales[par] = normales.get(par, 0) + 1
+                if normales[par] >= NOMINACIONES_PARA_EXCELENCIA:
+                    con_excelencia.add(par)  # 🔹 lo que siga para este alumno ya no procede
+
+            fila = {
+                "alumno_id": alumno_id,
+                "maestro_id": maestro.id,
+                "valor_id": valor_id,
+                "ciclo_id": ciclo_activo.id,
+                "comentario": comentario,
+                "evento_id": evento.id,
+                "tipo": "alumno",
+                "fecha": datetime.utcnow(),
+            }
+            indice_de_fila[id(fila)] = indice
+            filas.append(fila)
+
+    # 4️⃣ Escribir todo en una transacción
+    promovidos = set()
+    if filas:
+        creadas, repetidas = insertar_nominaciones(filas)
+        promovidos = registrar_cambios_excelencia(ciclo_activo.id, altas=[
+            (nuevo_id, f["alumno_id"], f["evento_id"], f["valor_id"]) for nuevo_id, f in creadas
+        ])
+        db.session.commit()
+
+        for nuevo_id, fila in creadas:
+            resultados[indice_de_fila[id(fila)]].update(
+                estado="registrada", mensaje="Nominación registrada.", nominacion_id=nuevo_id
+            )
+        for fila in repetidas:
+            resultados[indice_de_fila[id(fila)]].update(
+                estado="duplicada", mensaje="Ya habías nominado a este alumno con ese valor."
+            )
+
+    alumnos_promovidos = sorted({alumno_id for alumno_id, _ in promovidos})
+    for resultado in resultados:
+        if resultado["estado"] == "registrada" and resultado["alumno_id"] in alumnos_promovidos:
+            resultado["excelencia"] = True
+
+    return jsonify({
+        "status": "success",
+        "registradas": sum(1 for r in resultados if r["estado"] == "registrada"),
+        "duplicadas": sum(1 for r in resultados if r["estado"] == "duplicada"),
+        "rechazadas": sum(1 for r in resultados if r["estado"] == "rechazada"),
+        "promovidos": [
+            {"alumno_id": a, "alumno": alumnos[a].nombre} for a in alumnos_promovidos
+        ],
+        "resultados": resultados,
+    })
+
+
+# ===============================
+# 🧭 PANEL PRINCIPAL DEL PROFESOR
+# ===============================
+@nom.route('/panel_profesor')
+@login_required
+def panel_profesor():
+    """Panel principal con accesos rápidos para el profesor."""
+    if current_user.rol != 'profesor':
+        flash("🚫 Solo los profesores pueden acceder a este panel.", "danger")
+        return redirect(url_for('nom.principal'))
+
+    ciclo_activo = ciclo_actual()
+    return render_template('panel_profesor.html', ciclo=ciclo_activo)
+
+
+# =======================================
+# 👨‍🏫 VISTA "MIS GRUPOS" (profesor optimizada y ordenada)
+@nom.route('/mis_grupos')
 @login_required
 def mis_grupos():
     """Muestra los grupos y alumnos con orden correcto, límites y bloqueo por excelencia (por evento/mes)."""
@@ -2412,12 +2721,12 @@ def mis_grupos():
         flash("🚫 Solo los profesores pueden acceder a esta vista.", "danger")
         return redirect(url_for('nom.principal'))
 
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
     if not ciclo_activo:
         flash("⚠️ No hay ciclo escolar activo.", "warning")
         return redirect(url_for('nom.panel_profesor'))
 
-    maestro = Maestro.query.filter_by(correo=current_user.email, ciclo_id=ciclo_activo.id).first()
+    maestro = maestro_actual()
     if not maestro:
         flash("⚠️ No se encontró tu registro como maestro activo.", "warning")
         return redirect(url_for('nom.panel_profesor'))
@@ -2431,11 +2740,7 @@ def mis_grupos():
     )
 
     # 🔹 Traer TODOS los eventos activos del ciclo y mapearlos por bloque (el más reciente por fecha_evento)
-    eventos_activos = (
-        EventoAsamblea.query
-        .filter_by(ciclo_id=ciclo_activo.id, activo=True)
-        .all()
-    )
+    eventos_activos = contexto_ciclo().eventos_activos()
 
     evento_por_bloque = {}
     for e in eventos_activos:
@@ -2443,20 +2748,21 @@ def mis_grupos():
         if not actual or e.fecha_evento > actual.fecha_evento:
             evento_por_bloque[e.bloque_id] = e
 
-    # ✅ Cargar todas las nominaciones del ciclo en una sola vez (con Valor para evitar N+1)
-    from sqlalchemy.orm import joinedload
-    nominaciones_ciclo = (
-        Nominacion.query
-        .options(joinedload(Nominacion.valor))
-        .filter_by(ciclo_id=ciclo_activo.id)
-        .all()
-    )
-
-    nominaciones_por_alumno = {}
-    for n in nominaciones_ciclo:
-        if n.alumno_id is None:
-            continue
-        nominaciones_por_alumno.setdefault(n.alumno_id, []).append(n)
+    # ✅ (alumno, evento, valor) de los eventos vigentes, desde el resumen de nominaciones
+    from models import ResumenNominacion
+    nominados_mes, con_excelencia = set(), set()
+    if evento_por_bloque:
+        excelencia_id = contexto_ciclo().excelencia_id
+        for alumno_id, evento_id, valor_id in (
+            db.session.query(ResumenNominacion.alumno_id, ResumenNominacion.evento_id, ResumenNominacion.valor_id)
+            .filter(
+                ResumenNominacion.evento_id.in_([e.id for e in evento_por_bloque.values()]),
+                ResumenNominacion.alumno_id.isnot(None),
+            )
+        ):
+            nominados_mes.add((alumno_id, evento_id))
+            if valor_id == excelencia_id:
+                con_excelencia.add((alumno_id, evento_id))
 
     grupos = {}
 
@@ -2466,25 +2772,15 @@ def mis_grupos():
         if clave not in grupos:
             grupos[clave] = []
 
-        nominaciones = nominaciones_por_alumno.get(alumno.id, [])
-
         # 🎯 Evento vigente del bloque del alumno (define “mes”)
         evento_bloque = evento_por_bloque.get(alumno.bloque_id)
+        par = (alumno.id, evento_bloque.id if evento_bloque else None)
 
         # 🟢 Nominado en el mes (por evento del bloque)
-        tiene_nominaciones_mes = False
-        if evento_bloque:
-            tiene_nominaciones_mes = any(n.evento_id == evento_bloque.id for n in nominaciones)
+        tiene_nominaciones_mes = par in nominados_mes
 
         # 🟡 EXCELENCIA SOLO EN EL MES (por evento del bloque)
-        tiene_excelencia = False
-        if evento_bloque:
-            tiene_excelencia = any(
-                (n.evento_id == evento_bloque.id)
-                and n.valor
-                and getattr(n.valor, "nombre", "").upper() == "EXCELENCIA"
-                for n in nominaciones
-            )
+        tiene_excelencia = par in con_excelencia
 
         grupos[clave].append({
             "id": alumno.id,
@@ -2543,7 +2839,7 @@ def mis_grupos():
 @nom.route('/seleccionar_bloque')
 @login_required
 def seleccionar_bloque():
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
 
     # 🔹 Ordenar por número si el nombre contiene un número (Bloque 1, Bloque 2, etc.)
     bloques = (
@@ -2561,18 +2857,11 @@ def seleccionar_bloque():
 @nom.route('/bloque/<int:bloque_id>/grados')
 @login_required
 def seleccionar_grado(bloque_id):
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
     bloque = Bloque.query.get_or_404(bloque_id)
 
-    # 🔍 Obtener los grados únicos dentro del bloque
-    grados = (
-        db.session.query(Alumno.grado)
-        .filter_by(bloque_id=bloque.id, ciclo_id=ciclo_activo.id)
-        .distinct()
-        .order_by(Alumno.grado)
-        .all()
-    )
-    grados = [g[0] for g in grados]  # Convierte [(1,), (2,), (3,)] → [1,2,3]
+    # 🔍 Grados únicos dentro del bloque (índice del contexto del ciclo)
+    grados = contexto_ciclo().grados(bloque.id)
 
     return render_template('seleccionar_grado.html', bloque=bloque, grados=grados, ciclo=ciclo_activo)
 
@@ -2636,7 +2925,7 @@ def eliminar_usuario(id):
 @login_required
 @admin_required
 def gestionar_maestros():
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
     if not ciclo_activo:
         flash("⚠️ No hay ciclo escolar activo.", "warning")
         return redirect(url_for('admin_bp.gestionar_ciclos'))
@@ -2652,7 +2941,7 @@ def gestionar_maestros():
 @login_required
 @admin_required
 def nuevo_maestro():
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
     if not ciclo_activo:
         flash("⚠️ No hay un ciclo activo para registrar maestros.", "warning")
         return redirect(url_for('admin_bp.maestros_ciclo'))
@@ -2699,7 +2988,7 @@ def nuevo_maestro():
 @admin_required
 def crear_alumno_manual():
 
-    ciclo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo = ciclo_actual()
     if not ciclo:
         flash("No hay un ciclo activo.", "danger")
         return redirect(url_for('admin_bp.alumnos_ciclo'))
@@ -2790,20 +3079,15 @@ def detectar_nivel(grado):
 @nom.route('/bloque/<int:bloque_id>/grado/<grado>')
 @login_required
 def grupos_por_grado(bloque_id, grado):
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
     if not ciclo_activo:
         flash("⚠️ No hay ciclo activo.", "warning")
         return redirect(url_for('nom.inicio_rapido'))
 
-    # Obtener todos los alumnos del grado dentro del bloque
-    alumnos = (
-        Alumno.query
-        .filter_by(ciclo_id=ciclo_activo.id, bloque_id=bloque_id, grado=grado)
-        .order_by(Alumno.grupo.asc())
-        .all()
-    )
+    # Grupos del grado dentro del bloque (índice del contexto del ciclo, ya ordenados por grupo)
+    grupos = contexto_ciclo().grupos(bloque_id, grado)
 
-    if not alumnos:
+    if not grupos:
         return render_template(
             'grupos_por_grado.html',
             bloque=Bloque.query.get_or_404(bloque_id),
@@ -2814,9 +3098,9 @@ def grupos_por_grado(bloque_id, grado):
     # Construir diccionario nivel → grupos únicos
     niveles_dict = {}
 
-    for alumno in alumnos:
-        nivel = alumno.nivel.strip()
-        grupo = alumno.grupo.strip()
+    for nivel, grupo, _ in grupos:
+        nivel = nivel.strip()
+        grupo = grupo.strip()
 
         if nivel not in niveles_dict:
             niveles_dict[nivel] = []
@@ -2843,7 +3127,7 @@ def grupos_por_grado(bloque_id, grado):
 @nom.route('/bloque/<int:bloque_id>/grado/<grado>/grupo/<grupo>')
 @login_required
 def lista_alumnos_grupo(bloque_id, grado, grupo):
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
     alumnos = (
         Alumno.query
         .filter_by(ciclo_id=ciclo_activo.id, bloque_id=bloque_id, grado=grado, grupo=grupo)
@@ -2868,74 +3152,43 @@ def matriz_grupo_maestro(bloque_id, grado, grupo):
         return redirect(url_for('nom.principal'))
 
     hoy = datetime.now().date()
-    ciclo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo = ciclo_actual()
     bloque = Bloque.query.get_or_404(bloque_id)
 
+    # 🔹 Cargar todos los eventos del ciclo del bloque (desde el contexto del ciclo)
+    eventos = contexto_ciclo().eventos(bloque.id)
+
     # 🔹 Buscar evento vigente (activo y dentro de fechas válidas)
-    evento_abierto = (
-        EventoAsamblea.query
-        .filter(
-            EventoAsamblea.ciclo_id == ciclo.id,
-            EventoAsamblea.bloque_id == bloque.id,
-            EventoAsamblea.activo == True,
-            EventoAsamblea.fecha_evento >= hoy  # aún no ha pasado
-        )
-        .order_by(EventoAsamblea.fecha_evento.asc())
-        .first()
+    evento_abierto = next(
+        (e for e in contexto_ciclo().eventos_activos(bloque.id) if e.fecha_evento >= hoy),  # aún no ha pasado
+        None,
     )
 
     # Si no hay futuros, usar el último pasado (el más reciente)
-    if not evento_abierto:
-        evento_abierto = (
-            EventoAsamblea.query
-            .filter_by(ciclo_id=ciclo.id, bloque_id=bloque.id)
-            .order_by(EventoAsamblea.fecha_evento.desc())
-            .first()
-        )
+    if not evento_abierto and eventos:
+        evento_abierto = max(eventos, key=lambda e: e.fecha_evento)
 
     mes_actual = evento_abierto.mes_ordinal if evento_abierto else None
 
-    # 🔹 Cargar todos los eventos del ciclo del bloque
-    eventos = (
-        EventoAsamblea.query
-        .filter_by(ciclo_id=ciclo.id, bloque_id=bloque.id)
-        .order_by(EventoAsamblea.mes_ordinal.asc())
-        .all()
-    )
-
     # 🔹 Agrupar por mes
     eventos_por_mes = {}
     for e in eventos:
         if e.mes_ordinal not in eventos_por_mes:
             eventos_por_mes[e.mes_ordinal] = e
 
-    # 🔹 Cargar alumnos del grupo
-    alumnos = (
+    # 🔹 Cargar alumnos del grupo y sus nominaciones por mes (una sola consulta)
+    alumnos, pivote = matriz_nominaciones(
+        ciclo.id,
         Alumno.query
         .filter_by(ciclo_id=ciclo.id, bloque_id=bloque.id, grado=grado, grupo=grupo)
-        .order_by(Alumno.nombre.asc())
-        .all()
+        .order_by(Alumno.nombre.asc()),
+        eventos_por_mes.keys(),
+        tipo='alumno',
     )
 
     data = []
     for a in alumnos:
-        nominaciones = (
-            Nominacion.query
-            .filter_by(alumno_id=a.id, ciclo_id=ciclo.id, tipo='alumno')
-            .join(EventoAsamblea, Nominacion.evento_id == EventoAsamblea.id)
-            .add_entity(EventoAsamblea)
-            .all()
-        )
-
-        valores_por_mes = {str(e.mes_ordinal): [] for e in eventos_por_mes.values()}
-
-        for n, evento in nominaciones:
-            if evento and evento.mes_ordinal:
-                valores_por_mes[str(evento.mes_ordinal)].append({
-                    "valor": n.valor.nombre if n.valor else "",
-                    "maestro": n.maestro.nombre if n.maestro else "",
-                    "fecha": n.fecha.strftime("%Y-%m-%d") if n.fecha else ""
-                })
+        valores_por_mes = pivote[a.id]
 
         tiene_nominaciones = any(len(v) > 0 for v in valores_por_mes.values())
         sin_nominacion_total = not tiene_nominaciones
@@ -2946,8 +3199,15 @@ def matriz_grupo_maestro(bloque_id, grado, grupo):
             "sin_nominacion_total": sin_nominacion_total
         })
 
+    # 🔹 Valores para la nominación por lote (EXCELENCIA se asigna sola), desde el contexto del ciclo
+    valores_lote = sorted(
+        (v for v in contexto_ciclo().valores() if (v.nombre or "").lower() != "excelencia"),
+        key=lambda v: v.nombre or "",
+    )
+
     return render_template(
         "matriz_grupo_maestro.html",
+        valores_lote=valores_lote,
         ciclo=ciclo,
         bloque=bloque,
         grado=grado,
@@ -2967,12 +3227,12 @@ def mis_nominaciones():
         flash("🚫 Solo los profesores pueden acceder a esta vista.", "danger")
         return redirect(url_for('nom.principal'))
 
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
     if not ciclo_activo:
         flash("⚠️ No hay ciclo escolar activo.", "warning")
         return redirect(url_for('nom.panel_profesor'))
 
-    maestro = Maestro.query.filter_by(correo=current_user.email, ciclo_id=ciclo_activo.id).first()
+    maestro = maestro_actual()
     if not maestro:
         flash("⚠️ No se encontró tu registro como maestro en el ciclo activo.", "warning")
         return redirect(url_for('nom.panel_profesor'))
@@ -3013,13 +3273,19 @@ def mis_nominaciones():
         else:
             mes_seleccionado = None
 
-    # Nominaciones del maestro del mes seleccionado
+    from sqlalchemy.orm import joinedload
+
+    # Nominaciones del maestro del mes seleccionado (con alumno/bloque y personal nominado ya cargados)
     if mes_seleccionado:
         nominaciones = (
             Nominacion.query
             .filter_by(maestro_id=maestro.id, ciclo_id=ciclo_activo.id)
             .join(EventoAsamblea)
             .filter(EventoAsamblea.nombre_mes == mes_seleccionado)
+            .options(
+                joinedload(Nominacion.alumno).joinedload(Alumno.bloque),
+                joinedload(Nominacion.maestro_nominado),
+            )
             .order_by(Nominacion.fecha.desc())
             .all()
         )
@@ -3035,6 +3301,7 @@ def mis_nominaciones():
             EventoAsamblea.activo.is_(True),
             EventoAsamblea.fecha_cierre_nominaciones > ahora
         )
+        .options(joinedload(EventoAsamblea.bloque))
         .all()
         if mes_seleccionado else []
     )
@@ -3045,18 +3312,35 @@ def mis_nominaciones():
     valores = Valor.query.filter_by(ciclo_id=ciclo_activo.id, activo=True).all()
     valores_json = [{"id": v.id, "nombre": v.nombre} for v in valores]
 
-    # Mapa de valores permitidos por nominación
+    # Mapa de valores permitidos por nominación: los valores ya usados de todos los alumnos
+    # y del personal de la página salen de UNA sola consulta (DISTINCT)
+    alumnos_ids = {n.alumno_id for n in nominaciones if n.tipo == "alumno" and n.alumno_id}
+    nominados_ids = {n.maestro_nominado_id for n in nominaciones if n.tipo != "alumno" and n.maestro_nominado_id}
+    usados_por = defaultdict(set)  # ("alumno", alumno_id) / ("personal", maestro_nominado_id) -> {valor_id}
+    condiciones = []
+    if alumnos_ids:
+        condiciones.append(db.and_(Nominacion.tipo == "alumno", Nominacion.alumno_id.in_(alumnos_ids)))
+    if nominados_ids:
+        condiciones.append(db.and_(
+            Nominacion.tipo == "personal",
+            Nominacion.maestro_id == maestro.id,
+            Nominacion.maestro_nominado_id.in_(nominados_ids),
+        ))
+    if condiciones:
+        filas = (
+            db.session.query(Nominacion.tipo, Nominacion.alumno_id, Nominacion.maestro_nominado_id, Nominacion.valor_id)
+            .filter(Nominacion.ciclo_id == ciclo_activo.id, db.or_(*condiciones))
+            .distinct()
+        )
+        for tipo, alumno_id, nominado_id, valor_id in filas:
+            usados_por[(tipo, alumno_id if tipo == "alumno" else nominado_id)].add(valor_id)
+
     allowed_map = {}
     for n in nominaciones:
         if n.tipo == "alumno":
-            usados = {nom.valor_id for nom in Nominacion.query.filter_by(
-                ciclo_id=ciclo_activo.id, tipo='alumno', alumno_id=n.alumno_id
-            )}
+            usados = usados_por[("alumno", n.alumno_id)]
         else:
-            usados = {nom.valor_id for nom in Nominacion.query.filter_by(
-                ciclo_id=ciclo_activo.id, tipo='personal',
-                maestro_id=n.maestro_id, maestro_nominado_id=n.maestro_nominado_id
-            )}
+            usados = usados_por[("personal", n.maestro_nominado_id)]
         disponibles = [v for v in valores if v.id not in usados or v.id == n.valor_id]
         allowed_map[n.id] = [{"id": v.id, "nombre": v.nombre} for v in disponibles]
 
@@ -3075,7 +3359,6 @@ def mis_nominaciones():
         mes_abierto_map=mes_abierto_map
     )
 
-from sqlalchemy import cast, Integer, func
 # ===========================
 # 🔹 Nueva vista visual de bloques
 # ===========================
@@ -3086,7 +3369,7 @@ def admin_bloques_vista():
         flash("🚫 Solo los administradores pueden ver esta sección.", "danger")
         return redirect(url_for('nom.principal'))
 
-    ciclo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo = ciclo_actual()
     if not ciclo:
         flash("⚠️ No hay ciclo escolar activo.", "warning")
         return redirect(url_for('nom.principal'))
@@ -3098,22 +3381,13 @@ def admin_bloques_vista():
     .all()
     )
 
+    # 🔹 Grados y grupos salen del índice del contexto del ciclo (sin consultas por bloque)
+    contexto = contexto_ciclo()
     data = []
     for b in bloques:
-        grados_raw = db.session.query(Alumno.grado).filter(
-            Alumno.ciclo_id == ciclo.id,
-            Alumno.bloque_id == b.id
-        ).distinct().all()
-        grados = [g[0] for g in grados_raw]
-
         grados_info = []
-        for g in grados:
-            grupos_raw = db.session.query(Alumno.grupo).filter(
-                Alumno.ciclo_id == ciclo.id,
-                Alumno.bloque_id == b.id,
-                Alumno.grado == g
-            ).distinct().all()
-            grupos = [x[0] for x in grupos_raw]
+        for g in contexto.grados(b.id):
+            grupos = list(dict.fromkeys(grupo for _, grupo, _ in contexto.grupos(b.id, g)))
             grados_info.append({"grado": g, "grupos": grupos})
 
         data.append({"bloque": b, "grados": grados_info})
@@ -3208,14 +3482,15 @@ def eliminar_nominacion_personal(id):
     nominacion = Nominacion.query.get_or_404(id)
 
     # Validar que sea del maestro actual
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
-    maestro = Maestro.query.filter_by(correo=current_user.email, ciclo_id=ciclo_activo.id).first()
+    ciclo_activo = ciclo_actual()
+    maestro = maestro_actual()
 
     if not maestro or nominacion.maestro_id != maestro.id:
         flash("🚫 No tienes permiso para eliminar esta nominación.", "danger")
         return redirect(url_for('nom.nominar_personal'))
 
     db.session.delete(nominacion)
+    ajustar_resumen_nominaciones(bajas=[nominacion])
     db.session.commit()
     flash("🗑️ Nominación eliminada correctamente.", "success")
     return redirect(url_for('nom.nominar_personal'))
@@ -3228,8 +3503,8 @@ def eliminar_nominacion_personal(id):
 def editar_nominacion_personal(id):
     nominacion = Nominacion.query.get_or_404(id)
 
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
-    maestro = Maestro.query.filter_by(correo=current_user.email, ciclo_id=ciclo_activo.id).first()
+    ciclo_activo = ciclo_actual()
+    maestro = maestro_actual()
 
     if not maestro or nominacion.maestro_id != maestro.id:
         flash("🚫 No puedes editar esta nominación.", "danger")
@@ -3238,11 +3513,14 @@ def editar_nominacion_personal(id):
     nuevo_valor = request.form.get('valor_id')
     nuevo_comentario = request.form.get('comentario', '').strip()
 
+    anterior = {c: getattr(nominacion, c) for c in COLUMNAS_RESUMEN}
     if nuevo_valor:
-        nominacion.valor_id = nuevo_valor
+        nominacion.valor_id = int(nuevo_valor)
     nominacion.comentario = nuevo_comentario if nuevo_comentario else None
     nominacion.fecha = datetime.utcnow()
 
+    # 📈 Resumen: sale de la clave anterior y entra (con su nueva fecha) a la nueva
+    ajustar_resumen_nominaciones(altas=[nominacion], bajas=[anterior])
     db.session.commit()
     
     
@@ -3258,13 +3536,13 @@ def editar_nominacion(id):
     from flask import jsonify
 
     nominacion = Nominacion.query.get_or_404(id)
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
 
     # 🔐 Validar rol y propiedad
     if current_user.rol != 'profesor':
         return jsonify({"status": "error", "message": "Solo los maestros pueden editar nominaciones."}), 403
 
-    maestro = Maestro.query.filter_by(correo=current_user.email, ciclo_id=ciclo_activo.id).first()
+    maestro = maestro_actual()
     if not maestro or nominacion.maestro_id != maestro.id:
         return jsonify({"status": "error", "message": "No tienes permiso para editar esta nominación."}), 403
 
@@ -3316,9 +3594,18 @@ def editar_nominacion(id):
             }), 400
 
     # ✅ Guardar cambios base
+    valor_anterior = nominacion.valor_id
+    anterior = {c: getattr(nominacion, c) for c in COLUMNAS_RESUMEN}
     nominacion.valor_id = valor_id
     nominacion.comentario = comentario
 
+    # 🧠 Cambio de valor: baja del anterior + alta del nuevo en el contador de EXCELENCIA y en el resumen
+    if valor_anterior != valor_id:
+        ajustar_resumen_nominaciones(altas=[nominacion], bajas=[anterior])
+    if nominacion.tipo == 'alumno' and valor_anterior != valor_id:
+        datos = (nominacion.id, nominacion.alumno_id, nominacion.evento_id)
+        registrar_cambios_excelencia(ciclo_id, bajas=[datos + (valor_anterior,)], altas=[datos + (valor_id,)])
+
     # 🟡 Reapegar etiqueta de control si aplica
     if "[EXCELENCIA-VISUAL]" not in (nominacion.comentario or ""):
         nominacion.comentario = (nominacion.comentario or "").strip() + " [EXCELENCIA-VISUAL]"
@@ -3345,14 +3632,14 @@ def editar_nominacion(id):
 @login_required
 def eliminar_nominacion(id):
     nominacion = Nominacion.query.get_or_404(id)
-    ciclo_activo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo_activo = ciclo_actual()
 
     # 🔐 Validar rol y propiedad
     if current_user.rol != 'profesor':
         flash("🚫 Solo los maestros pueden eliminar nominaciones.", "danger")
         return redirect(url_for('nom.mis_nominaciones'))
 
-    maestro = Maestro.query.filter_by(correo=current_user.email, ciclo_id=ciclo_activo.id).first()
+    maestro = maestro_actual()
     if not maestro or nominacion.maestro_id != maestro.id:
         flash("⚠️ No tienes permiso para eliminar esta nominación.", "warning")
         return redirect(url_for('nom.mis_nominaciones'))
@@ -3364,8 +3651,9 @@ def eliminar_nominacion(id):
 
     # ✅ Eliminar si todo está correcto
     db.session.delete(nominacion)
+    ajustar_resumen_nominaciones(bajas=[nominacion])
+    registrar_cambios_excelencia(nominacion.ciclo_id, bajas=[nominacion])
     db.session.commit()
-    verificar_reversion_excelencia(nominacion.alumno_id, nominacion.ciclo_id, nominacion.evento_id)
     flash("🗑️ Nominación eliminada correctamente.", "success")
     return redirect(url_for('nom.mis_nominaciones'))
 
@@ -3373,7 +3661,7 @@ def eliminar_nominacion(id):
 @login_required
 @admin_required
 def nominaciones_por_maestro_y_mes():
-    ciclo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo = ciclo_actual()
     maestro_id = request.args.get('maestro_id', type=int)
     mes_ordinal = request.args.get('mes', type=int)
 
@@ -3426,11 +3714,14 @@ def nominaciones_por_maestro_y_mes():
 @login_required
 @admin_required
 def generar_invitaciones_stream():
-    import io, zipfile, time, os, gc
-    from flask import send_file, request, make_response
-    from docxtpl import DocxTemplate
+    import time
+    from flask import request
     from sqlalchemy.orm import joinedload
     from models import Nominacion, CicloEscolar
+    from invitaciones import (
+        renderizar_en_paralelo, respuesta_zip, seleccionar_invitaciones_ids,
+        PLANTILLA_ALUMNO, PLANTILLA_PERSONAL,
+    )
 
     ids = request.args.get("ids", "")
     if not ids:
@@ -3438,7 +3729,7 @@ def generar_invitaciones_stream():
 
     ids = [int(i) for i in ids.split(",")]
 
-    ciclo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo = ciclo_actual()
     if not ciclo:
         return "No hay ciclo activo", 400
 
@@ -3464,125 +3755,68 @@ def generar_invitaciones_stream():
     # - Si NO tiene EXCELENCIA -> exporta TODAS sus nominaciones seleccionadas (deduplicadas por valor)
     # - Personal: no se filtra
     # =====================================================
-    from datetime import datetime
-
-    nominaciones_filtradas = []
-
-    # 1) "personal" se queda tal cual
-    personales = [n for n in nominaciones if (n.tipo or "").lower() == "personal"]
-    nominaciones_filtradas.extend(personales)
-
-    # 2) Agrupar "alumno" por alumno_id
-    grupos = {}
-    for n in nominaciones:
-        if (n.tipo or "").lower() != "alumno":
-            continue
-        if not n.alumno_id:
-            # raro, pero por seguridad lo dejamos pasar
-            nominaciones_filtradas.append(n)
-            continue
-        grupos.setdefault(n.alumno_id, []).append(n)
-
-    # 3) Aplicar regla EXCELENCIA
-    for alumno_id, arr in grupos.items():
-        excels = [x for x in arr if x.valor and (x.valor.nombre or "").upper() == "EXCELENCIA"]
-
-        if excels:
-            # solo 1 excelencia (la más antigua dentro de los IDs seleccionados)
-            exc = sorted(excels, key=lambda x: x.fecha or datetime.min)[0]
-            nominaciones_filtradas.append(exc)
-        else:
-            # exportar todas las seleccionadas, pero sin duplicar mismo valor
-            seen_valor = set()
-            for x in sorted(arr, key=lambda x: x.fecha or datetime.min):
-                key_val = x.valor_id or ("SIN_VALOR")
-                if key_val in seen_valor:
-                    continue
-                seen_valor.add(key_val)
-                nominaciones_filtradas.append(x)
-
-    nominaciones = nominaciones_filtradas
+    nominaciones = seleccionar_invitaciones_ids(nominaciones)
 
     # =====================================================
-    # 🔹 Generar ZIP totalmente en memoria
+    # 🔹 Serializar cada nominación a un contexto plano
     # =====================================================
-    mem_zip = io.BytesIO()
-    with zipfile.ZipFile(mem_zip, "w", zipfile.ZIP_DEFLATED) as zf:
-        for n in nominaciones:
-            try:
-                tipo = n.tipo or "alumno"
-                plantilla = (
-                    "formato_asamblea.docx"
-                    if tipo == "alumno"
-                    else "invitacion colaborador 1.docx"
-                )
-                doc = DocxTemplate(os.path.join("docx_templates", plantilla))
-
-                # =====================================================
-                # 🔹 Ajuste del comentario para EXCELENCIA
-                # =====================================================
-                comentario_final = n.comentario or ""
-                if n.valor and n.valor.nombre.upper() == "EXCELENCIA":
-                    # Eliminar tags visuales
-                    comentario_final = comentario_final.replace("[EXCELENCIA-VISUAL]", "").replace("  ", " ").strip()
-
-                    # Reemplazar texto genérico
-                    if "Valores obtenidos:" in comentario_final:
-                        comentario_final = comentario_final.replace("Valores obtenidos:", "Por sus valores de")
-                    if "Comentarios:" in comentario_final:
-                        comentario_final = comentario_final.replace("Comentarios:", "— Comentarios de los maestros:")
-
-                    # Limpieza adicional (quitar números tipo 1 | 2 | 3)
-                    comentario_final = comentario_final.replace("1 |", "").replace("2 |", "").replace("3 |", "").strip()
-                    comentario_final = comentario_final.replace("|", " ").replace("  ", " ").strip()
-
-                # =====================================================
-                # 🔹 Contexto del documento
-                # =====================================================
-                quien_nomina = nombre_bonito(n.maestro.nombre) if n.maestro else ""
-
-                nominado_raw = (
-                    n.alumno.nombre if tipo == "alumno"
-                    else n.maestro_nominado.nombre if n.maestro_nominado else ""
-                )
-                nominado = nombre_bonito(nominado_raw)
+    trabajos = []
+    for n in nominaciones:
+        try:
+            tipo = n.tipo or "alumno"
+            plantilla = PLANTILLA_ALUMNO if tipo == "alumno" else PLANTILLA_PERSONAL
+
+            # =====================================================
+            # 🔹 Ajuste del comentario para EXCELENCIA
+            # =====================================================
+            comentario_final = n.comentario or ""
+            if n.valor and n.valor.nombre.upper() == "EXCELENCIA":
+                # Eliminar tags visuales
+                comentario_final = comentario_final.replace("[EXCELENCIA-VISUAL]", "").replace("  ", " ").strip()
+
+                # Reemplazar texto genérico
+                if "Valores obtenidos:" in comentario_final:
+                    comentario_final = comentario_final.replace("Valores obtenidos:", "Por sus valores de")
+                if "Comentarios:" in comentario_final:
+                    comentario_final = comentario_final.replace("Comentarios:", "— Comentarios de los maestros:")
+
+                # Limpieza adicional (quitar números tipo 1 | 2 | 3)
+                comentario_final = comentario_final.replace("1 |", "").replace("2 |", "").replace("3 |", "").strip()
+                comentario_final = comentario_final.replace("|", " ").replace("  ", " ").strip()
+
+            # =====================================================
+            # 🔹 Contexto del documento
+            # =====================================================
+            quien_nomina = nombre_bonito(n.maestro.nombre) if n.maestro else ""
+
+            nominado_raw = (
+                n.alumno.nombre if tipo == "alumno"
+                else n.maestro_nominado.nombre if n.maestro_nominado else ""
+            )
+            nominado = nombre_bonito(nominado_raw)
 
-                context = {
-                    "quien_nomina": quien_nomina,
-                    "nominado": nominado,
-                    "valor": n.valor.nombre if n.valor else "",
-                    "fecha_evento": n.evento.fecha_evento.strftime("%d/%m/%Y") if n.evento else "",
-                    "texto_adicional": comentario_final,
-                }
+            context = {
+                "quien_nomina": quien_nomina,
+                "nominado": nominado,
+                "valor": n.valor.nombre if n.valor else "",
+                "fecha_evento": n.evento.fecha_evento.strftime("%d/%m/%Y") if n.evento else "",
+                "texto_adicional": comentario_final,
+            }
 
-                doc.render(context)
+            nombre_nominado = n.alumno.nombre if tipo == "alumno" else (
+                n.maestro_nominado.nombre if n.maestro_nominado else ""
+            )
+            filename = f"{nombre_nominado.replace(' ', '_')}_{tipo}_{n.valor.nombre if n.valor else 'SinValor'}.docx"
+        except Exception as e:
+            print(f"⚠️ Error generando invitación {n.id}: {e}")
+            continue
 
-                temp = io.BytesIO()
-                doc.save(temp)
-                temp.seek(0)
+        trabajos.append((filename, plantilla, context))
 
-                nombre_nominado = n.alumno.nombre if tipo == "alumno" else (
-                    n.maestro_nominado.nombre if n.maestro_nominado else ""
-                )
-                filename = f"{nombre_nominado.replace(' ', '_')}_{tipo}_{n.valor.nombre if n.valor else 'SinValor'}.docx"
-                zf.writestr(filename, temp.read())
-                temp.close()
-                gc.collect()
-            except Exception as e:
-                print(f"⚠️ Error generando invitación {n.id}: {e}")
-
-    mem_zip.seek(0)
     filename_zip = f"invitaciones_{ciclo.nombre}_{time.strftime('%Y%m%d_%H%M')}.zip"
 
-    # ✅ Generamos respuesta explícita y segura
-    response = make_response(mem_zip.read())
-    response.headers["Content-Type"] = "application/zip"
-    response.headers["Content-Disposition"] = f"attachment; filename={filename_zip}"
-    response.headers["Content-Length"] = str(mem_zip.tell())
-    response.headers["Cache-Control"] = "no-store"
-    mem_zip.close()
-
-    return response
+    # ✅ Render en paralelo (pool de procesos) y ZIP en streaming, en el mismo orden
+    return respuesta_zip(renderizar_en_paralelo(trabajos, ciclo.nombre), filename_zip)
 
 
 # ==========================
@@ -3594,86 +3828,64 @@ from collections import defaultdict
 
 @nom.route('/muro_publico')
 def muro_publico():
-    """Vista pública de nominados por mes, bloque y tipo."""
-    ciclo = CicloEscolar.query.filter_by(activo=True).first()
-    if not ciclo:
-        return render_template("public_muro.html", error="No hay ciclo activo actualmente.")
+    """
+    Vista pública de nominados por mes, bloque y tipo.
+    Los meses cerrados se sirven desde su foto estática; el resto, desde la caché de páginas
+    con ETag / Last-Modified (304 si el navegador ya tiene la versión vigente).
+    """
+    from flask import make_response
+    from muro import (
+        MAX_AGE_MURO, TIPOS_MURO, cache_muro, etag_muro, fotos_muro, mes_cerrado, render_muro,
+        ultimo_mes,
+    )
 
-    # Parámetros de filtro
+    # Parámetros de filtro (tipo llega a la clave de caché y al nombre de la foto: solo valores conocidos)
     mes = request.args.get("mes", type=int)
     tipo = request.args.get("tipo", "alumno")
     bloque_id = request.args.get("bloque", type=int)
+    if tipo not in TIPOS_MURO:
+        return "Tipo no válido", 400
 
-    # Obtener eventos del ciclo activo y agrupar meses únicos
-    eventos_query = EventoAsamblea.query.filter_by(ciclo_id=ciclo.id).order_by(EventoAsamblea.mes_ordinal).all()
-
-    # 🔹 Extraer solo meses únicos (por nombre y ordinal)
-    eventos_unicos = []
-    vistos = set()
-    for e in eventos_query:
-        if e.nombre_mes not in vistos:
-            eventos_unicos.append(e)
-            vistos.add(e.nombre_mes)
-
-    # Si no se especifica mes, tomar el último evento activo
-    if not mes and eventos_unicos:
-        mes = max(e.mes_ordinal for e in eventos_unicos)
-
-    # 📦 Obtener lista de bloques (para el filtro)
-    bloques = Bloque.query.filter_by(ciclo_id=ciclo.id).order_by(Bloque.orden).all()
-
-    # Filtrar nominaciones por ciclo, mes, tipo y bloque (si aplica)
-    query = Nominacion.query.options(
-        joinedload(Nominacion.valor),
-        joinedload(Nominacion.alumno),
-        joinedload(Nominacion.maestro_nominado),
-        joinedload(Nominacion.evento)
-    ).filter(
-        Nominacion.ciclo_id == ciclo.id,
-        Nominacion.tipo == tipo,
-        Nominacion.evento.has(EventoAsamblea.mes_ordinal == mes)
-    )
-
-    if bloque_id:
-        query = query.join(Alumno).filter(Alumno.bloque_id == bloque_id)
-
-    nominaciones_raw = query.all()
-
-    # 🧩 Agrupar por persona (alumno o maestro nominado)
-    agrupadas = defaultdict(lambda: {"nombre": "", "bloque": "", "valores": set(), "evento": None})
-
-    for n in nominaciones_raw:
-        if tipo == "alumno" and n.alumno:
-            clave = n.alumno.id
-            agrupadas[clave]["nombre"] = n.alumno.nombre
-            agrupadas[clave]["bloque"] = n.alumno.bloque.nombre if n.alumno.bloque else ""
-        elif tipo == "personal" and n.maestro_nominado:
-            clave = n.maestro_nominado.id
-            agrupadas[clave]["nombre"] = n.maestro_nominado.nombre
-            agrupadas[clave]["bloque"] = "-"
-        else:
-            continue
-
-        agrupadas[clave]["valores"].add(n.valor.nombre)
-        agrupadas[clave]["evento"] = n.evento.nombre_mes
-
-    # 🧮 Convertir a lista y ordenar por cantidad de valores (mayor a menor)
-    nominaciones = sorted(
-        agrupadas.values(),
-        key=lambda x: len(x["valores"]),
-        reverse=True
-    )
+    contexto = contexto_ciclo()
+    if not contexto.ciclo_id:
+        return render_template("public_muro.html", error="No hay ciclo activo actualmente.")
 
-    return render_template(
-        "public_muro.html",
-        ciclo=ciclo,
-        eventos=eventos_unicos,
-        nominaciones=nominaciones,
-        mes=mes,
-        tipo=tipo,
-        bloque_id=bloque_id,
-        bloques=bloques
-    )
+    # Si no se especifica mes, tomar el último del ciclo
+    if not mes:
+        mes = ultimo_mes(contexto)
+
+    # 🖼️ Mes cerrado con foto ya escrita: no se consultan nominaciones
+    foto = fotos_muro.existente(contexto, mes, tipo, bloque_id)
+    if foto:
+        return send_file(foto, mimetype="text/html", conditional=True, max_age=MAX_AGE_MURO)
+
+    clave = (contexto.ciclo_id, mes, tipo, bloque_id)
+    version = (version_catalogo(VERSION_NOMINACIONES), contexto.version)
+
+    # 🔹 El navegador ya tiene esta versión: 304 sin renderizar
+    etag = etag_muro(clave, version)
+    if request.if_none_match.contains(etag):
+        respuesta = make_response("", 304)
+        respuesta.set_etag(etag)
+        respuesta.cache_control.public = True
+        respuesta.cache_control.max_age = MAX_AGE_MURO
+        return respuesta
+
+    pagina = cache_muro.obtener(clave, version)
+    if pagina is None:
+        pagina = cache_muro.guardar(clave, version, render_muro(contexto, mes, tipo, bloque_id))
+        if mes_cerrado(contexto, mes, bloque_id):
+            try:
+                fotos_muro.guardar(contexto, mes, tipo, bloque_id, pagina.html, version[0])
+            except OSError as e:
+                print(f"⚠️ No se pudo escribir la foto del muro: {e}")
+
+    respuesta = make_response(pagina.html)
+    respuesta.set_etag(pagina.etag)
+    respuesta.last_modified = pagina.modificada
+    respuesta.cache_control.public = True
+    respuesta.cache_control.max_age = MAX_AGE_MURO
+    return respuesta.make_conditional(request)
 @nom.route('/inicio_rapido')
 @login_required
 def inicio_rapido():
@@ -3689,48 +3901,19 @@ def inicio_rapido():
         return redirect(url_for('nom.logout'))
     
 # ======================================================
-# 📦 Generar invitaciones por bloque (solo exporta EXCELENCIA si existe)
-# ======================================================
-# ======================================================
-# 📦 Generar invitaciones por bloque (solo exporta EXCELENCIA si existe)
+# 📦 Trabajos de render para un bloque (solo exporta EXCELENCIA si existe)
 # ======================================================
-@nom.route('/admin/dashboard/generar_invitaciones_bloque_unico')
-@login_required
-@admin_required
-def generar_invitaciones_bloque_unico():
-    import io, zipfile, time, os, re, gc
-    from flask import make_response, request
+def _trabajos_invitaciones_bloque(ciclo, bloque_id, evento=None):
+    """
+    Devuelve [(nombre_archivo, plantilla, contexto)] con las invitaciones del bloque
+    (y del evento, si se indica). Lo usan la descarga directa y los trabajos en segundo plano.
+    """
+    import re
     from sqlalchemy.orm import joinedload
-    from docxtpl import DocxTemplate
-    from models import Nominacion, Alumno, Bloque, CicloEscolar, EventoAsamblea
-
-    LOTE_SIZE = 20  # 🔥 tamaño fijo
-
-    bloque_id = request.args.get("bloque_id", type=int)
-    mes_nombre = request.args.get("mes", type=str)
-    lote = request.args.get("lote", default=None, type=int)
-
-    if not bloque_id:
-        return "No se especificó bloque.", 400
-
-    ciclo = CicloEscolar.query.filter_by(activo=True).first()
-    if not ciclo:
-        return "No hay ciclo activo.", 400
-
-    bloque = Bloque.query.get(bloque_id)
-    if not bloque:
-        return "Bloque no encontrado.", 404
-
-    # 🔹 Si viene mes, buscar evento exacto
-    evento = None
-    if mes_nombre:
-        evento = EventoAsamblea.query.filter_by(
-            bloque_id=bloque_id,
-            nombre_mes=mes_nombre,
-            ciclo_id=ciclo.id
-        ).first()
-        if not evento:
-            return f"No hay evento de {mes_nombre} para este bloque.", 404
+    from models import Nominacion, Alumno
+    from invitaciones import (
+        seleccionar_invitaciones, texto_enriquecido, PLANTILLA_ALUMNO, PLANTILLA_PERSONAL,
+    )
 
     # =====================
     # 🔹 Traer nominaciones
@@ -3746,8 +3929,8 @@ def generar_invitaciones_bloque_unico():
         )
         .join(Alumno, Alumno.id == Nominacion.alumno_id)
         .filter(Nominacion.ciclo_id == ciclo.id)
-        .filter(Alumno.bloque_id == bloque.id)
-        .order_by(Nominacion.fecha.asc())
+        .filter(Alumno.bloque_id == bloque_id)
+        .order_by(Nominacion.fecha.asc(), Nominacion.id.asc())
     )
 
     if evento:
@@ -3758,250 +3941,240 @@ def generar_invitaciones_bloque_unico():
     # =====================================================
     # 🔹 Filtrar: si hay EXCELENCIA -> solo EXCELENCIA
     # 🔹 si NO hay EXCELENCIA -> exportar TODAS (sin duplicados)
+    # (misma regla que contar_lotes)
     # =====================================================
-    filtradas = []
-    procesados = set()
-
-    # Para deduplicar por alumno+valor (por si hubiera repetidas)
-    keys = set()
-
+    filtradas = seleccionar_invitaciones(nominaciones)
+
+    todas = nominaciones
+    nominaciones = filtradas
+
+    # =========================================================
+    # 🔹 Pre-pase EXCELENCIA: valores previos + comentarios por maestro
+    # Todas las nominaciones previas (mismo alumno + evento) ya vienen en la
+    # consulta del bloque con valor y maestro cargados → se agrupan en memoria
+    # en lugar de consultar la BD por cada alumno con excelencia.
+    # =========================================================
+    por_alumno_evento = {}
+    for x in todas:
+        if x.evento_id is not None:
+            por_alumno_evento.setdefault((x.alumno_id, x.evento_id), []).append(x)
+
+    previos_excelencia = {}
     for n in nominaciones:
-        if n.alumno_id in procesados:
+        if not (n.valor and n.valor.nombre.upper() == "EXCELENCIA"):
             continue
 
-        # ¿tiene excelencia este alumno?
-        tiene_excelencia = any(
-            x.alumno_id == n.alumno_id and x.valor and x.valor.nombre.upper() == "EXCELENCIA"
-            for x in nominaciones
-        )
+        prev = [
+            x for x in por_alumno_evento.get((n.alumno_id, n.evento_id), [])
+            if x.valor_id != n.valor_id
+        ]
 
-        if tiene_excelencia:
-            # exportar solo la de excelencia (la primera que encuentre)
-            exc = next(
-                (x for x in nominaciones
-                if x.alumno_id == n.alumno_id and x.valor and x.valor.nombre.upper() == "EXCELENCIA"),
-                None
-            )
-            if exc:
-                k = (exc.alumno_id, exc.valor_id, exc.evento_id, exc.tipo)
-                if k not in keys:
-                    filtradas.append(exc)
-                    keys.add(k)
+        # ✅ Deduplicar valores (por si se repite el mismo valor en ese evento)
+        valores_previos = []
+        seen = set()
+        for x in prev:
+            if not x.valor:
+                continue
+            nombre_valor = (x.valor.nombre or "").strip()
+            key = nombre_valor.upper()
+            if key == "EXCELENCIA":
+                continue
+            if key in seen:
+                continue
+            seen.add(key)
+            valores_previos.append(nombre_valor)
 
-        else:
-            # ✅ exportar todas las nominaciones del alumno (distintas por valor)
-            for x in nominaciones:
-                if x.alumno_id != n.alumno_id:
-                    continue
-                k = (x.alumno_id, x.valor_id, x.evento_id, x.tipo)
-                if k in keys:
-                    continue
-                filtradas.append(x)
-                keys.add(k)
-
-        procesados.add(n.alumno_id)
+        # Comentarios previos agrupados
+        comentarios_previos = {}
+        for x in prev:
+            maestro = x.maestro.nombre if x.maestro else "Maestro desconocido"
+            maestro = nombre_bonito(maestro)  # ✅ SOLO VISUAL
+            c = (x.comentario or "").replace("[EXCELENCIA-VISUAL]", "").strip()
+            if c:
+                comentarios_previos.setdefault(maestro, []).append(c)
 
-    # ===================================
-    # 🔥 Aplicar LOTES si se especificó
-    # ===================================
-    if lote:
-        start = (lote - 1) * LOTE_SIZE
-        end = start + LOTE_SIZE
-        nominaciones = filtradas[start:end]
-    else:
-        nominaciones = filtradas
+        previos_excelencia[n.id] = (valores_previos, comentarios_previos)
 
     # ===================================
-    # 🔹 SLUG helper
+    # 🔹 Serializar cada nominación a un contexto plano
     # ===================================
-    def slug(s):
-        s = (s or "").strip()
-        s = re.sub(r"[^\w\-\.]+", "_", s)
-        return s[:80] or "archivo"
+    trabajos = []
+    for n in nominaciones:
+        try:
+            tipo = (n.tipo or "alumno").lower()
+            plantilla = PLANTILLA_ALUMNO if tipo == "alumno" else PLANTILLA_PERSONAL
 
-    # ===================================
-    # ✅ Helper visual para nombres (SOLO VISUAL)
-    # ===================================
-    def nombre_bonito(nombre: str) -> str:
-        if not nombre:
-            return ""
-        s = re.sub(r"\s+", " ", nombre.strip())
-        minus = {"de", "del", "la", "las", "los", "y", "e", "da", "dos", "do", "di", "van", "von"}
-        partes = s.split(" ")
-        out = []
-        for i, p in enumerate(partes):
-            pl = p.lower()
-            if i > 0 and pl in minus:
-                out.append(pl)
-            else:
-                out.append(pl[:1].upper() + pl[1:])
-        return " ".join(out)
+            nominado = (
+                n.alumno.nombre if tipo == "alumno"
+                else n.maestro_nominado.nombre if n.maestro_nominado else ""
+            )
+            # ✅ SOLO VISUAL
+            nominado = nombre_bonito(nominado)
+
+            comentario_final = (n.comentario or "").strip()
+
+            # =========================================================
+            # 🔥 EXCELENCIA — BLOQUE CORREGIDO CON RICHTEXT
+            # (segmentos serializables; el RichText se arma al renderizar)
+            # =========================================================
+            if n.valor and n.valor.nombre.upper() == "EXCELENCIA":
+
+                # Valores y comentarios previos ya agrupados en el pre-pase
+                valores_previos, comentarios_previos = previos_excelencia.get(n.id, ([], {}))
+
+                # Caso 1: Excelencia AUTOMÁTICA (3 valores previos)
+                if len(valores_previos) >= 3:
+                    segs = [
+                        (f"Por sus valores de {', '.join(valores_previos)}.\n", {"size": 28}),
+                        ("— Comentarios de los maestros:\n", {"size": 28}),
+                    ]
+
+                    for m, cs in comentarios_previos.items():
+                        segs.append((f"{m}:\n", {"size": 28, "bold": True}))
+                        for c in cs:
+                            segs.append((f"• {c}\n", {"size": 28}))
+
+                    comentario_final = texto_enriquecido(segs)
+
+                # Caso 2: Excelencia DIRECTA sin valores previos
+                elif len(valores_previos) == 0:
+                    comentario_final = (n.comentario or "").strip()
+
+                # Caso 3: Excelencia DIRECTA con 1–2 valores previos
+                else:
+                    comentario_directo = (n.comentario or "").strip()
+
+                    segs = [
+                        (f"Por sus valores de {', '.join(valores_previos)} y Excelencia.\n", {"size": 28}),
+                        ("— Comentarios de los maestros:\n", {"size": 28}),
+                    ]
+
+                    for m, cs in comentarios_previos.items():
+                        segs.append((f"{m}:\n", {"size": 28, "bold": True}))
+                        for c in cs:
+                            segs.append((f"• {c}\n", {"size": 28}))
+
+                    if comentario_directo:
+                        maestro_excelencia = nombre_bonito(n.maestro.nombre) if n.maestro else "Maestro desconocido"
+                        segs.append(("\n", {"size": 28}))
+                        segs.append((f"— {maestro_excelencia}:\n", {"size": 28, "bold": True}))
+                        segs.append((f"• {comentario_directo}\n", {"size": 28}))
+
+                    comentario_final = texto_enriquecido(segs)
+
+            # =========================================================
+            # ✅ FECHA + HORA (SOLO ALUMNOS)
+            # Bloque 1 = 8:30 am
+            # Bloque 2 = 7:30 am
+            # Bloque 3 = 7:30 am
+            # Bloque 4 = 8:30 am
+            # =========================================================
+            hora_por_bloque = {
+                "BLOQUE 1": "8:30 a. m.",
+                "BLOQUE 2": "7:30 a. m.",
+                "BLOQUE 3": "7:30 a. m.",
+                "BLOQUE 4": "8:30 a. m.",
+            }
 
-    # ===================================
-    # 🔹 Generación ZIP
-    # ===================================
-    zip_buffer = io.BytesIO()
+            fecha_str = ""
+            if n.evento and n.evento.fecha_evento:
+                fecha_str = n.evento.fecha_evento.strftime("%d/%m/%Y")
 
-    with zipfile.ZipFile(zip_buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-        for n in nominaciones:
-            try:
-                tipo = (n.tipo or "alumno").lower()
-                plantilla = "formato_asamblea.docx" if tipo == "alumno" else "invitacion colaborador 1.docx"
-                plantilla_path = os.path.join("docx_templates", plantilla)
+            bloque_nombre = ""
+            if n.alumno and n.alumno.bloque and n.alumno.bloque.nombre:
+                bloque_nombre = n.alumno.bloque.nombre.strip().upper()
 
-                doc = DocxTemplate(plantilla_path)
+            hora_str = hora_por_bloque.get(bloque_nombre, "")
+            fecha_con_hora = f"{fecha_str} - {hora_str}".strip(" -")
+
+            # =========================================================
+
+            context = {
+                "quien_nomina": nombre_bonito(n.maestro.nombre) if n.maestro else "",
+                "nominado": nominado,
+                "valor": n.valor.nombre if n.valor else "",
+                "fecha_evento": fecha_con_hora,  # ✅ aquí ya va fecha + hora
+                "texto_adicional": comentario_final,
+            }
+
+            valor_nombre = n.valor.nombre if n.valor else "SinValor"
+            filename = f"{slug(nominado)}_{slug(valor_nombre)}.docx"
+
+        except Exception as e:
+            print(f"⚠️ Error generando invitación alumno ID={n.id}: {e}")
+            continue
+
+        trabajos.append((filename, plantilla, context))
+
+    return trabajos
+
+
+# ======================================================
+# 📦 Generar invitaciones por bloque (solo exporta EXCELENCIA si existe)
+# ======================================================
+# ======================================================
+# 📦 Generar invitaciones por bloque (solo exporta EXCELENCIA si existe)
+# ======================================================
+@nom.route('/admin/dashboard/generar_invitaciones_bloque_unico')
+@login_required
+@admin_required
+def generar_invitaciones_bloque_unico():
+    import time, re
+    from flask import request
+    from models import Bloque, CicloEscolar, EventoAsamblea
+    from invitaciones import renderizar_en_paralelo, respuesta_zip, documento_unico, respuesta_docx
+
+    bloque_id = request.args.get("bloque_id", type=int)
+    mes_nombre = request.args.get("mes", type=str)
+    formato = (request.args.get("formato") or "zip").lower()  # zip | unico (un .docx para imprimir) | pdf
+
+    if not bloque_id:
+        return "No se especificó bloque.", 400
+
+    ciclo = ciclo_actual()
+    if not ciclo:
+        return "No hay ciclo activo.", 400
+
+    bloque = Bloque.query.get(bloque_id)
+    if not bloque:
+        return "Bloque no encontrado.", 404
+
+    # 🔹 Si viene mes, buscar evento exacto
+    evento = None
+    if mes_nombre:
+        evento = EventoAsamblea.query.filter_by(
+            bloque_id=bloque_id,
+            nombre_mes=mes_nombre,
+            ciclo_id=ciclo.id
+        ).first()
+        if not evento:
+            return f"No hay evento de {mes_nombre} para este bloque.", 404
+
+    trabajos = _trabajos_invitaciones_bloque(ciclo, bloque.id, evento)
 
-                nominado = (
-                    n.alumno.nombre if tipo == "alumno"
-                    else n.maestro_nominado.nombre if n.maestro_nominado else ""
-                )
-                # ✅ SOLO VISUAL
-                nominado = nombre_bonito(nominado)
-
-                comentario_final = (n.comentario or "").strip()
-
-                # =========================================================
-                # 🔥 EXCELENCIA — BLOQUE CORREGIDO CON RICHTEXT
-                # =========================================================
-                from docxtpl import RichText
-
-                if n.valor and n.valor.nombre.upper() == "EXCELENCIA":
-
-                    # Obtener valores previos (sin incluir excelencia)
-                    prev = (
-                        Nominacion.query
-                        .filter(
-                            Nominacion.alumno_id == n.alumno_id,
-                            Nominacion.ciclo_id == n.ciclo_id,
-                            Nominacion.evento_id == n.evento_id,   # ✅ clave: solo el evento actual
-                            Nominacion.valor_id != n.valor_id
-                        )
-                        .order_by(Nominacion.fecha.asc())
-                        .all()
-                    )
-
-                    # ✅ Deduplicar valores (por si se repite el mismo valor en ese evento)
-                    valores_previos = []
-                    seen = set()
-                    for x in prev:
-                        if not x.valor:
-                            continue
-                        nombre_valor = (x.valor.nombre or "").strip()
-                        key = nombre_valor.upper()
-                        if key == "EXCELENCIA":
-                            continue
-                        if key in seen:
-                            continue
-                        seen.add(key)
-                        valores_previos.append(nombre_valor)
-
-                    # Comentarios previos agrupados
-                    comentarios_previos = {}
-                    for x in prev:
-                        maestro = x.maestro.nombre if x.maestro else "Maestro desconocido"
-                        maestro = nombre_bonito(maestro)  # ✅ SOLO VISUAL
-                        c = (x.comentario or "").replace("[EXCELENCIA-VISUAL]", "").strip()
-                        if c:
-                            comentarios_previos.setdefault(maestro, []).append(c)
-
-                    # Caso 1: Excelencia AUTOMÁTICA (3 valores previos)
-                    if len(valores_previos) >= 3:
-                        rt = RichText()
-                        rt.add(f"Por sus valores de {', '.join(valores_previos)}.\n", size=28)
-                        rt.add("— Comentarios de los maestros:\n", size=28)
-
-                        for m, cs in comentarios_previos.items():
-                            rt.add(f"{m}:\n", size=28, bold=True)
-                            for c in cs:
-                                rt.add(f"• {c}\n", size=28)
-
-                        comentario_final = rt
-
-                    # Caso 2: Excelencia DIRECTA sin valores previos
-                    elif len(valores_previos) == 0:
-                        comentario_final = (n.comentario or "").strip()
-
-                    # Caso 3: Excelencia DIRECTA con 1–2 valores previos
-                    else:
-                        comentario_directo = (n.comentario or "").strip()
-
-                        rt = RichText()
-                        rt.add(f"Por sus valores de {', '.join(valores_previos)} y Excelencia.\n", size=28)
-                        rt.add("— Comentarios de los maestros:\n", size=28)
-
-                        for m, cs in comentarios_previos.items():
-                            rt.add(f"{m}:\n", size=28, bold=True)
-                            for c in cs:
-                                rt.add(f"• {c}\n", size=28)
-
-                        if comentario_directo:
-                            maestro_excelencia = nombre_bonito(n.maestro.nombre) if n.maestro else "Maestro desconocido"
-                            rt.add("\n", size=28)
-                            rt.add(f"— {maestro_excelencia}:\n", size=28, bold=True)
-                            rt.add(f"• {comentario_directo}\n", size=28)
-
-                        comentario_final = rt
-
-                # =========================================================
-                # ✅ FECHA + HORA (SOLO ALUMNOS)
-                # Bloque 1 = 8:30 am
-                # Bloque 2 = 7:30 am
-                # Bloque 3 = 7:30 am
-                # Bloque 4 = 8:30 am
-                # =========================================================
-                hora_por_bloque = {
-                    "BLOQUE 1": "8:30 a. m.",
-                    "BLOQUE 2": "7:30 a. m.",
-                    "BLOQUE 3": "7:30 a. m.",
-                    "BLOQUE 4": "8:30 a. m.",
-                }
-
-                fecha_str = ""
-                if n.evento and n.evento.fecha_evento:
-                    fecha_str = n.evento.fecha_evento.strftime("%d/%m/%Y")
-
-                bloque_nombre = ""
-                if n.alumno and n.alumno.bloque and n.alumno.bloque.nombre:
-                    bloque_nombre = n.alumno.bloque.nombre.strip().upper()
-
-                hora_str = hora_por_bloque.get(bloque_nombre, "")
-                fecha_con_hora = f"{fecha_str} - {hora_str}".strip(" -")
-
-                # =========================================================
-
-                context = {
-                    "quien_nomina": nombre_bonito(n.maestro.nombre) if n.maestro else "",
-                    "nominado": nominado,
-                    "valor": n.valor.nombre if n.valor else "",
-                    "fecha_evento": fecha_con_hora,  # ✅ aquí ya va fecha + hora
-                    "texto_adicional": comentario_final,
-                }
-
-                doc_io = io.BytesIO()
-                doc.render(context)
-                doc.save(doc_io)
-                doc_io.seek(0)
-
-                valor_nombre = n.valor.nombre if n.valor else "SinValor"
-                filename = f"{slug(nominado)}_{slug(valor_nombre)}.docx"
-                zf.writestr(filename, doc_io.read())
-                gc.collect()
-
-            except Exception as e:
-                print(f"⚠️ Error generando invitación alumno ID={n.id}: {e}")
-
-    zip_buffer.seek(0)
-
-    sufijo = f"Lote{lote}_" if lote else ""
     filename_zip = (
-        f"Invitaciones_{slug(bloque.nombre)}_{slug(mes_nombre)}_{sufijo}{time.strftime('%Y%m%d_%H%M')}.zip"
+        f"Invitaciones_{slug(bloque.nombre)}_{slug(mes_nombre)}_{time.strftime('%Y%m%d_%H%M')}.zip"
     )
 
-    resp = make_response(zip_buffer.read())
-    resp.headers["Content-Type"] = "application/zip"
-    resp.headers["Content-Disposition"] = f"attachment; filename={filename_zip}"
-    resp.headers["Cache-Control"] = "no-store"
-    return resp
+    # 🖨️ Un solo documento con todas las invitaciones (una por página)
+    if formato == "unico":
+        contenido = documento_unico(trabajos)
+        if contenido is None:
+            return "No hay invitaciones para generar.", 404
+        return respuesta_docx(contenido, filename_zip.replace(".zip", "_Impresion.docx"))
+
+    # 🖨️ PDF desde las mismas plantillas .docx (pool de LibreOffice del worker)
+    if formato == "pdf":
+        from conversion_pdf import pdf_disponible, convertir_a_pdf
+        if not pdf_disponible():
+            return "La conversión a PDF no está disponible en este servidor.", 503
+        return respuesta_zip(
+            convertir_a_pdf(renderizar_en_paralelo(trabajos, ciclo.nombre)),
+            filename_zip.replace(".zip", "_PDF.zip"),
+        )
+
+    # ✅ Render en paralelo (pool de procesos) y ZIP en streaming, en el mismo orden
+    return respuesta_zip(renderizar_en_paralelo(trabajos, ciclo.nombre), filename_zip)
 
 # ======================================================
 # == Exportar concentrado general de nominaciones (Excel)
@@ -4022,28 +4195,12 @@ def exportar_concentrado_excel():
     from sqlalchemy.orm import joinedload
     from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
 
-    ciclo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo = ciclo_actual()
     if not ciclo:
         return "No hay ciclo activo.", 400
 
     mes = request.args.get("mes")  # ✅ ej: "Febrero" (igual que tu dashboard)
 
-    # ✅ Helper visual para nombres (SOLO VISUAL)
-    def nombre_bonito(nombre: str) -> str:
-        if not nombre:
-            return ""
-        s = re.sub(r"\s+", " ", str(nombre).strip())
-        minus = {"de", "del", "la", "las", "los", "y", "e", "da", "dos", "do", "di", "van", "von"}
-        partes = s.split(" ")
-        out = []
-        for i, p in enumerate(partes):
-            pl = p.lower()
-            if i > 0 and pl in minus:
-                out.append(pl)
-            else:
-                out.append(pl[:1].upper() + pl[1:])
-        return " ".join(out)
-
     # 🔹 Cargar nominaciones (con relaciones)
     query = (
         Nominacion.query
@@ -4217,6 +4374,64 @@ def exportar_concentrado_excel():
     return response
 
 
+# ======================================================
+# 📦 Trabajos de render para PROFESORES (colaboradores)
+# ======================================================
+def _trabajos_invitaciones_profesores(ciclo, eventos_ids):
+    """Devuelve [(nombre_archivo, plantilla, contexto)] con las nominaciones de personal de esos eventos."""
+    import re
+    from sqlalchemy.orm import joinedload
+    from models import Nominacion
+    from invitaciones import PLANTILLA_PERSONAL
+
+    nominaciones = (
+        Nominacion.query
+        .options(
+            joinedload(Nominacion.maestro),
+            joinedload(Nominacion.maestro_nominado),
+            joinedload(Nominacion.valor),
+            joinedload(Nominacion.evento)
+        )
+        .filter(
+            Nominacion.ciclo_id == ciclo.id,
+            Nominacion.tipo == "personal",
+            Nominacion.evento_id.in_(eventos_ids)
+        )
+        .order_by(Nominacion.fecha.asc())
+        .all()
+    )
+
+    trabajos = []
+    for n in nominaciones:
+        nominado = n.maestro_nominado.nombre if n.maestro_nominado else ""
+        valor = n.valor.nombre if n.valor else ""
+        comentario = (n.comentario or "").strip()
+
+        # ✅ ARREGLADO (sin SyntaxError)
+        fecha_evento = (
+            n.evento.fecha_evento.strftime("%d/%m/%Y")
+            if (n.evento and n.evento.fecha_evento)
+            else ""
+        )
+
+        # ✅ SOLO VISUAL
+        nominado_bonito = nombre_bonito(nominado)
+        quien_nomina_bonito = nombre_bonito(n.maestro.nombre) if n.maestro else ""
+
+        context = {
+            "quien_nomina": quien_nomina_bonito,
+            "nominado": nominado_bonito,
+            "valor": valor,
+            "fecha_evento": fecha_evento,
+            "texto_adicional": comentario,
+        }
+
+        filename = f"{slug(nominado_bonito)}_{slug(valor)}.docx"
+        trabajos.append((filename, PLANTILLA_PERSONAL, context))
+
+    return trabajos
+
+
 # ======================================================
 # 📦 Generar invitaciones para PROFESORES (colaboradores)
 # ======================================================
@@ -4227,39 +4442,17 @@ def exportar_concentrado_excel():
 @login_required
 @admin_required
 def generar_invitaciones_profesores():
-    import io, zipfile, os, re
-    from flask import make_response, request
-    from sqlalchemy.orm import joinedload
-    from docxtpl import DocxTemplate
-    from models import Nominacion, CicloEscolar, EventoAsamblea
-
-    def slug(s):
-        s = (s or "").strip()
-        s = re.sub(r"[^\w\-\.]+", "_", s, flags=re.UNICODE)
-        return s[:80] or "archivo"
-
-    # ✅ SOLO VISUAL: nombre "bonito"
-    def nombre_bonito(nombre: str) -> str:
-        if not nombre:
-            return ""
-        s = re.sub(r"\s+", " ", nombre.strip())
-        minus = {"de", "del", "la", "las", "los", "y", "e", "da", "dos", "do", "di", "van", "von"}
-        partes = s.split(" ")
-        out = []
-        for i, p in enumerate(partes):
-            pl = p.lower()
-            if i > 0 and pl in minus:
-                out.append(pl)
-            else:
-                out.append(pl[:1].upper() + pl[1:])
-        return " ".join(out)
+    import re
+    from flask import request
+    from models import CicloEscolar, EventoAsamblea
+    from invitaciones import renderizar_en_paralelo, respuesta_zip, documento_unico, respuesta_docx
 
-    ciclo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo = ciclo_actual()
     if not ciclo:
         return "No hay ciclo activo", 400
 
     mes_nombre = request.args.get("mes", "").strip()
-    lote = request.args.get("lote", type=int)
+    formato = (request.args.get("formato") or "zip").lower()  # zip | unico (un .docx para imprimir) | pdf
 
     if not mes_nombre:
         return "No se especificó el mes.", 400
@@ -4275,85 +4468,31 @@ def generar_invitaciones_profesores():
 
     eventos_ids = [e.id for e in eventos_del_mes]
 
-    # 2. Obtener nominaciones tipo "personal"
-    nominaciones = (
-        Nominacion.query
-        .options(
-            joinedload(Nominacion.maestro),
-            joinedload(Nominacion.maestro_nominado),
-            joinedload(Nominacion.valor),
-            joinedload(Nominacion.evento)
-        )
-        .filter(
-            Nominacion.ciclo_id == ciclo.id,
-            Nominacion.tipo == "personal",
-            Nominacion.evento_id.in_(eventos_ids)
-        )
-        .order_by(Nominacion.fecha.asc())
-        .all()
-    )
+    # 2. Serializar contextos de las nominaciones tipo "personal"
+    trabajos = _trabajos_invitaciones_profesores(ciclo, eventos_ids)
 
-    if not nominaciones:
+    if not trabajos:
         return f"No hay nominaciones para profesores en {mes_nombre}.", 404
 
-    # 3. Dividir nominaciones en lotes
-    LOTE_SIZE = 20
-    lotes = [nominaciones[i:i+LOTE_SIZE] for i in range(0, len(nominaciones), LOTE_SIZE)]
-
-    # 4. Si el usuario pidió un lote en particular, usar solo ese
-    if lote:
-        if lote < 1 or lote > len(lotes):
-            return "Lote inválido.", 400
-        nominaciones = lotes[lote - 1]
-    else:
-        nominaciones = lotes[0]
-
-    # 5. Generar ZIP de ese lote
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
-        for n in nominaciones:
-            plantilla = os.path.join("docx_templates", "invitacion colaborador 1.docx")
-            doc = DocxTemplate(plantilla)
-
-            nominado = n.maestro_nominado.nombre if n.maestro_nominado else ""
-            valor = n.valor.nombre if n.valor else ""
-            comentario = (n.comentario or "").strip()
-
-            # ✅ ARREGLADO (sin SyntaxError)
-            fecha_evento = (
-                n.evento.fecha_evento.strftime("%d/%m/%Y")
-                if (n.evento and n.evento.fecha_evento)
-                else ""
-            )
-
-            # ✅ SOLO VISUAL
-            nominado_bonito = nombre_bonito(nominado)
-            quien_nomina_bonito = nombre_bonito(n.maestro.nombre) if n.maestro else ""
-
-            context = {
-                "quien_nomina": quien_nomina_bonito,
-                "nominado": nominado_bonito,
-                "valor": valor,
-                "fecha_evento": fecha_evento,
-                "texto_adicional": comentario,
-            }
-
-            temp = io.BytesIO()
-            doc.render(context)
-            doc.save(temp)
-            temp.seek(0)
-
-            filename = f"{slug(nominado_bonito)}_{slug(valor)}.docx"
-            zf.writestr(filename, temp.read())
+    # 3a. Un solo documento con todas las invitaciones (una por página)
+    if formato == "unico":
+        contenido = documento_unico(trabajos)
+        if contenido is None:
+            return "No se pudo generar el documento.", 500
+        return respuesta_docx(contenido, f"Profesores_{slug(mes_nombre)}_Impresion.docx")
+
+    # 3b. PDF desde la plantilla .docx (pool de LibreOffice del worker)
+    if formato == "pdf":
+        from conversion_pdf import pdf_disponible, convertir_a_pdf
+        if not pdf_disponible():
+            return "La conversión a PDF no está disponible en este servidor.", 503
+        return respuesta_zip(
+            convertir_a_pdf(renderizar_en_paralelo(trabajos, ciclo.nombre)),
+            f"Profesores_{slug(mes_nombre)}_PDF.zip",
+        )
 
-    zip_buffer.seek(0)
-
-    response = make_response(zip_buffer.read())
-    response.headers["Content-Type"] = "application/zip"
-    response.headers["Content-Disposition"] = (
-        f"attachment; filename=Profesores_{slug(mes_nombre)}_Lote{lote or 1}.zip"
-    )
-    return response
+    # 3c. Render en paralelo y ZIP en streaming
+    return respuesta_zip(renderizar_en_paralelo(trabajos, ciclo.nombre), f"Profesores_{slug(mes_nombre)}.zip")
 
 
 # ======================================================
@@ -4371,7 +4510,7 @@ def admin_gestor_nominaciones():
     """
     Renderiza la NUEVA página de gestión de nominaciones.
     """
-    ciclo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo = ciclo_actual()
     return render_template('admin_gestor_nominaciones.html', ciclo=ciclo)
 
 
@@ -4382,7 +4521,7 @@ def admin_gestor_nominaciones_data():
     """
     Devuelve todas las nominaciones del ciclo activo en JSON para DataTables.
     """
-    ciclo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo = ciclo_actual()
     if not ciclo:
         return jsonify([])
 
@@ -4447,128 +4586,370 @@ def admin_gestor_nominaciones_eliminar():
         return jsonify({"success": False, "message": "No se recibieron IDs."}), 400
 
     try:
+        # 🔹 Eventos tocados (una consulta) para reconciliar su EXCELENCIA en la misma transacción
+        eventos = (
+            db.session.query(Nominacion.ciclo_id, Nominacion.evento_id)
+            .filter(
+                Nominacion.id.in_(ids),
+                Nominacion.alumno_id.isnot(None),
+                Nominacion.evento_id.isnot(None),
+            )
+            .distinct()
+            .all()
+        )
+
+        borradas = [
+            dict(zip(COLUMNAS_RESUMEN, fila))
+            for fila in db.session.query(
+                *(getattr(Nominacion, c) for c in COLUMNAS_RESUMEN)
+            ).filter(Nominacion.id.in_(ids))
+        ]
         Nominacion.query.filter(Nominacion.id.in_(ids)).delete(synchronize_session=False)
+        ajustar_resumen_nominaciones(bajas=borradas)
+
+        # 🔹 Una EXCELENCIA borrada a propósito no se vuelve a crear en esta misma petición
+        id_excelencia = {c: _id_valor_excelencia(c) for c in {f["ciclo_id"] for f in borradas}}
+        excelencias_borradas = {
+            (f["alumno_id"], f["evento_id"]) for f in borradas
+            if f["alumno_id"] and f["valor_id"] == id_excelencia[f["ciclo_id"]]
+        }
+        revertidos = 0
+        for ciclo_id, evento_id in eventos:
+            reporte = reconciliar_excelencia(ciclo_id, evento_id, sin_promover=excelencias_borradas)
+            revertidos += len(reporte["revertidos"])
         db.session.commit()
-        return jsonify({"success": True, "eliminadas": len(ids)})
+        return jsonify({"success": True, "eliminadas": len(ids), "excelencias_revertidas": revertidos})
     except Exception as e:
         db.session.rollback()
         print("❌ Error al eliminar nominaciones:", e)
         return jsonify({"success": False, "message": "Error interno."}), 500
 
+def _conteo_invitaciones_por_evento(ciclo_id):
+    """
+    Cuántas invitaciones de alumnos genera cada evento (bloque + mes), calculado 100% en SQL
+    con la misma regla que seleccionar_invitaciones:
+    - alumno con EXCELENCIA → 1
+    - alumno sin EXCELENCIA → nº de (valor, tipo) distintos (un valor nulo cuenta como uno más)
+    - nominación de otro tipo (personal) → 1 cada una, sin deduplicar
+    Solo cuentan alumnos cuyo bloque coincide con el del evento (igual que la exportación).
+    """
+    from models import Nominacion, Alumno, Bloque, EventoAsamblea, Valor
+
+    es_excelencia = case((func.upper(Valor.nombre) == "EXCELENCIA", 1), else_=0)
+    # Igual que seleccionar_invitaciones: tipo nulo cuenta como "alumno"; el resto no se agrupa
+    individual = case(
+        (func.lower(func.coalesce(Nominacion.tipo, "alumno")) != "alumno", Nominacion.id),
+        else_=None,
+    )
+
+    # 1) Nominaciones distintas por alumno + evento + valor + tipo
+    distintas = (
+        db.session.query(
+            Nominacion.evento_id.label("evento_id"),
+            Nominacion.alumno_id.label("alumno_id"),
+            Nominacion.valor_id.label("valor_id"),
+            Nominacion.tipo.label("tipo"),
+            individual.label("individual"),
+            es_excelencia.label("es_excelencia"),
+        )
+        .join(Alumno, Alumno.id == Nominacion.alumno_id)
+        .join(EventoAsamblea, EventoAsamblea.id == Nominacion.evento_id)
+        .outerjoin(Valor, Valor.id == Nominacion.valor_id)
+        .filter(
+            Nominacion.ciclo_id == ciclo_id,
+            Alumno.bloque_id == EventoAsamblea.bloque_id,
+        )
+        .distinct()
+        .subquery()
+    )
+
+    # 2) Invitaciones por alumno (o por nominación individual) dentro de cada evento
+    por_alumno = (
+        db.session.query(
+            distintas.c.evento_id.label("evento_id"),
+            case(
+                (func.max(distintas.c.es_excelencia) == 1, 1),
+                else_=func.count(),
+            ).label("invitaciones"),
+        )
+        .group_by(distintas.c.evento_id, distintas.c.alumno_id, distintas.c.individual)
+        .subquery()
+    )
+
+    # 3) Suma por evento (incluye eventos sin nominaciones con 0)
+    filas = (
+        db.session.query(
+            EventoAsamblea.id,
+            EventoAsamblea.bloque_id,
+            Bloque.nombre,
+            EventoAsamblea.nombre_mes,
+            EventoAsamblea.mes_ordinal,
+            func.coalesce(func.sum(por_alumno.c.invitaciones), 0),
+        )
+        .join(Bloque, Bloque.id == EventoAsamblea.bloque_id)
+        .outerjoin(por_alumno, por_alumno.c.evento_id == EventoAsamblea.id)
+        .filter(EventoAsamblea.ciclo_id == ciclo_id)
+        .group_by(
+            EventoAsamblea.id, EventoAsamblea.bloque_id, Bloque.nombre, Bloque.orden,
+            EventoAsamblea.nombre_mes, EventoAsamblea.mes_ordinal,
+        )
+        .order_by(EventoAsamblea.mes_ordinal, Bloque.orden, Bloque.nombre)
+        .all()
+    )
+
+    return [
+        {
+            "evento_id": evento_id,
+            "bloque_id": bloque_id,
+            "bloque": bloque,
+            "mes": mes,
+            "mes_ordinal": mes_ordinal,
+            "total": int(total or 0),
+        }
+        for evento_id, bloque_id, bloque, mes, mes_ordinal, total in filas
+    ]
+
+
 @nom.route('/admin/dashboard/contar_lotes')
 @login_required
 @admin_required
 def contar_lotes():
-    from models import Nominacion, Alumno, CicloEscolar, EventoAsamblea
-    from sqlalchemy.orm import joinedload
-    import math
+    """
+    Conteo de invitaciones sin cargar nominaciones como objetos ORM.
+    Con ?bloque_id=&mes= devuelve además el total de ese bloque/mes;
+    siempre incluye el desglose por evento, por bloque, por mes y de profesores por mes.
+    """
+    from models import Nominacion, CicloEscolar, EventoAsamblea
 
     bloque_id = request.args.get("bloque_id", type=int)
     mes_nombre = request.args.get("mes", type=str)
 
-    if not bloque_id or not mes_nombre:
+    if bool(bloque_id) != bool(mes_nombre):
         return {"error": "Falta bloque o mes"}, 400
 
-    ciclo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo = ciclo_actual()
     if not ciclo:
         return {"error": "No hay ciclo activo"}, 400
 
-    evento = EventoAsamblea.query.filter_by(
-        ciclo_id=ciclo.id,
-        bloque_id=bloque_id,
-        nombre_mes=mes_nombre
-    ).first()
+    por_evento = _conteo_invitaciones_por_evento(ciclo.id)
 
-    if not evento:
-        return {"error": f"No existe evento para {mes_nombre}"}, 404
+    por_bloque, por_mes = {}, {}
+    for fila in por_evento:
+        por_bloque.setdefault(fila["bloque"], 0)
+        por_bloque[fila["bloque"]] += fila["total"]
+        por_mes.setdefault(fila["mes"], 0)
+        por_mes[fila["mes"]] += fila["total"]
 
-    # Contar nominaciones únicas por alumno (solo una invitación de excelencia)
-    query = (
-        Nominacion.query
-        .join(Alumno, Alumno.id == Nominacion.alumno_id)
+    # 🔹 Personal (profesores) por mes: un COUNT agrupado
+    profesores_por_mes = dict(
+        db.session.query(EventoAsamblea.nombre_mes, func.count(Nominacion.id))
+        .join(Nominacion, Nominacion.evento_id == EventoAsamblea.id)
         .filter(
+            EventoAsamblea.ciclo_id == ciclo.id,
             Nominacion.ciclo_id == ciclo.id,
-            Alumno.bloque_id == bloque_id,
-            Nominacion.evento_id == evento.id
-        )
-        .options(
-            joinedload(Nominacion.valor),
-            joinedload(Nominacion.alumno)
+            Nominacion.tipo == "personal",
         )
-        .order_by(Nominacion.fecha.asc())
+        .group_by(EventoAsamblea.nombre_mes)
+        .all()
     )
 
-    nominaciones = query.all()
+    respuesta = {
+        "por_evento": por_evento,
+        "por_bloque": por_bloque,
+        "por_mes": por_mes,
+        "profesores_por_mes": profesores_por_mes,
+    }
 
-    # Filtrar duplicados con excelencia
-    procesados = set()
-    filtradas = []
+    if bloque_id:
+        fila = next(
+            (f for f in por_evento if f["bloque_id"] == bloque_id and f["mes"] == mes_nombre),
+            None
+        )
+        if not fila:
+            return {"error": f"No existe evento para {mes_nombre}"}, 404
 
-    for n in nominaciones:
-        if n.alumno_id in procesados:
-            continue
+        respuesta["total"] = fila["total"]
 
-        tiene_excelencia = any(
-            x.alumno_id == n.alumno_id and x.valor and x.valor.nombre.upper() == "EXCELENCIA"
-            for x in nominaciones
-        )
+    return respuesta
 
-        if tiene_excelencia:
-            exc = next(
-                (x for x in nominaciones
-                    if x.alumno_id == n.alumno_id and x.valor and x.valor.nombre.upper() == "EXCELENCIA"),
-                None
-            )
-            if exc:
-                filtradas.append(exc)
-        else:
-            filtradas.append(n)
+# ============================================================
+# 🗂️ Estado de la caché de plantillas DOCX (monitoreo)
+# ============================================================
+@nom.route('/admin/dashboard/cache_plantillas')
+@login_required
+@admin_required
+def estado_cache_plantillas():
+    """Aciertos / fallos de las cachés de plantillas e invitaciones (y modo del pool PDF) del worker."""
+    from conversion_pdf import pool_pdf
+    from invitaciones import cache_plantillas, cache_invitaciones
+    datos = cache_plantillas.estadisticas()
+    datos["invitaciones"] = cache_invitaciones.estadisticas()
+    datos["pdf"] = pool_pdf.estadisticas()
+    return jsonify(datos)
+
+
+# ============================================================
+# 🏅 RECONCILIAR EXCELENCIA (bajo demanda desde el dashboard)
+# ============================================================
+@nom.route('/admin/dashboard/reconciliar_excelencia', methods=['POST'])
+@login_required
+@admin_required
+def reconciliar_excelencia_dashboard():
+    ciclo = ciclo_actual()
+    if not ciclo:
+        return jsonify({"error": "No hay ciclo activo"}), 400
 
-        procesados.add(n.alumno_id)
+    data = request.get_json(silent=True) or {}
+    evento_id = data.get("evento_id")
+    try:
+        evento_id = int(evento_id) if evento_id else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "Evento inválido"}), 400
 
-    total = len(filtradas)
-    lotes = math.ceil(total / 20)
+    try:
+        reporte = reconciliar_excelencia(ciclo.id, evento_id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print("⚠️ Error reconciliando EXCELENCIA:", e)
+        return jsonify({"error": "No se pudo reconciliar EXCELENCIA"}), 500
+
+    return jsonify({"success": True, **reporte})
 
-    return {"total": total, "total_lotes": lotes}
 
 # ============================================================
-# 🔹 CONTAR LOTES PARA PROFESORES (20 POR LOTE)
+# 🧵 Trabajos de invitaciones en segundo plano (sin lotes)
+# POST crea el trabajo → GET consulta progreso → GET descarga el ZIP
 # ============================================================
-@nom.route('/admin/dashboard/contar_lotes_profesores')
+@nom.route('/admin/dashboard/trabajos_invitaciones', methods=['POST'])
 @login_required
 @admin_required
-def contar_lotes_profesores():
-    from models import Nominacion, CicloEscolar, EventoAsamblea
+def crear_trabajo_invitaciones():
+    import re
+    from flask import current_app
+    from models import Bloque, CicloEscolar, EventoAsamblea, TrabajoInvitaciones
+    from invitaciones import encolar_trabajo, nuevo_id_trabajo, limpiar_trabajos_vencidos
 
-    mes = request.args.get("mes", "").strip()
-    ciclo = CicloEscolar.query.filter_by(activo=True).first()
+    data = request.get_json(silent=True) or request.form
+    tipo = (data.get("tipo") or "bloque").strip()
+    mes_nombre = (data.get("mes") or "").strip()
 
-    # 1. Obtener todos los eventos del mes
-    eventos = EventoAsamblea.query.filter(
-        EventoAsamblea.ciclo_id == ciclo.id,
-        EventoAsamblea.nombre_mes == mes
-    ).all()
+    ciclo = ciclo_actual()
+    if not ciclo:
+        return jsonify({"error": "No hay ciclo activo."}), 400
 
-    if not eventos:
-        return jsonify({"total_lotes": 0})
+    if tipo == "bloque":
+        try:
+            bloque_id = int(data.get("bloque_id") or 0)
+        except (TypeError, ValueError):
+            bloque_id = 0
+        bloque = Bloque.query.get(bloque_id) if bloque_id else None
+        if not bloque:
+            return jsonify({"error": "Bloque no encontrado."}), 404
+
+        evento = None
+        if mes_nombre:
+            evento = EventoAsamblea.query.filter_by(
+                bloque_id=bloque.id, nombre_mes=mes_nombre, ciclo_id=ciclo.id
+            ).first()
+            if not evento:
+                return jsonify({"error": f"No hay evento de {mes_nombre} para este bloque."}), 404
 
-    eventos_ids = [e.id for e in eventos]
+        trabajos = _trabajos_invitaciones_bloque(ciclo, bloque.id, evento)
+        descripcion = f"{bloque.nombre} {mes_nombre}".strip()
 
-    # 2. Contar nominaciones de PERSONAL asociadas a esos eventos
-    total = (
-        Nominacion.query
-        .filter(
-            Nominacion.ciclo_id == ciclo.id,
-            Nominacion.tipo == "personal",
-            Nominacion.evento_id.in_(eventos_ids)
-        )
-        .count()
+    elif tipo == "profesores":
+        if not mes_nombre:
+            return jsonify({"error": "No se especificó el mes."}), 400
+
+        eventos_ids = [
+            e.id for e in EventoAsamblea.query.filter_by(ciclo_id=ciclo.id, nombre_mes=mes_nombre).all()
+        ]
+        if not eventos_ids:
+            return jsonify({"error": f"No existen eventos para el mes {mes_nombre}."}), 404
+
+        trabajos = _trabajos_invitaciones_profesores(ciclo, eventos_ids)
+        descripcion = f"Profesores {mes_nombre}"
+
+    else:
+        return jsonify({"error": "Tipo de trabajo inválido."}), 400
+
+    if not trabajos:
+        return jsonify({"error": "No hay nominaciones para generar."}), 404
+
+    limpiar_trabajos_vencidos()
+
+    trabajo = TrabajoInvitaciones(
+        id=nuevo_id_trabajo(),
+        ciclo_id=ciclo.id,
+        usuario_id=current_user.id,
+        tipo=tipo,
+        descripcion=descripcion,
+        total=len(trabajos),
+        nombre_zip=f"Invitaciones_{slug(descripcion, 'invitaciones')}_{datetime.now().strftime('%Y%m%d_%H%M')}.zip",
     )
+    db.session.add(trabajo)
+    db.session.commit()
+
+    encolar_trabajo(current_app._get_current_object(), trabajo.id, trabajos)
+
+    return jsonify({
+        "id": trabajo.id,
+        "total": trabajo.total,
+        "progreso_url": url_for('nom.progreso_trabajo_invitaciones', trabajo_id=trabajo.id),
+    }), 202
+
+
+@nom.route('/admin/dashboard/trabajos_invitaciones/<trabajo_id>')
+@login_required
+@admin_required
+def progreso_trabajo_invitaciones(trabajo_id):
+    from models import TrabajoInvitaciones
+
+    trabajo = db.session.get(TrabajoInvitaciones, trabajo_id)
+    if not trabajo:
+        return jsonify({"error": "Trabajo no encontrado."}), 404
+
+    # 🔹 Si el proceso que lo atendía se reinició, el progreso deja de avanzar
+    estado = trabajo.estado
+    if estado in ("pendiente", "procesando") and trabajo.actualizado_en:
+        if datetime.utcnow() - trabajo.actualizado_en > timedelta(minutes=10):
+            estado = "interrumpido"
+
+    return jsonify({
+        "id": trabajo.id,
+        "descripcion": trabajo.descripcion,
+        "estado": estado,
+        "total": trabajo.total or 0,
+        "renderizadas": trabajo.renderizadas or 0,
+        "errores": trabajo.errores or 0,
+        "mensaje": trabajo.mensaje,
+        "descarga_url": (
+            url_for('nom.descargar_trabajo_invitaciones', trabajo_id=trabajo.id)
+            if estado == "terminado" else None
+        ),
+    })
 
-    # 3. Calcular lotes de 20
-    total_lotes = (total + 19) // 20
 
-    return jsonify({"total_lotes": total_lotes})
+@nom.route('/admin/dashboard/trabajos_invitaciones/<trabajo_id>/descargar')
+@login_required
+@admin_required
+def descargar_trabajo_invitaciones(trabajo_id):
+    import os
+    from models import TrabajoInvitaciones
+
+    trabajo = db.session.get(TrabajoInvitaciones, trabajo_id)
+    if not trabajo or trabajo.estado != "terminado" or not trabajo.archivo:
+        return "El archivo todavía no está listo.", 404
+    if not os.path.exists(trabajo.archivo):
+        return "El archivo ya no está disponible. Genera las invitaciones de nuevo.", 410
+
+    return send_file(
+        os.path.abspath(trabajo.archivo),
+        as_attachment=True,
+        download_name=trabajo.nombre_zip,
+        mimetype="application/zip",
+    )
 
 @admin_bp.route('/dashboard/reportes_rapidos_excel')
 @login_required
@@ -4579,7 +4960,7 @@ def reportes_rapidos_excel():
     from sqlalchemy import func
     from models import Nominacion, Alumno, Valor, Maestro, CicloEscolar, EventoAsamblea, Bloque
 
-    ciclo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo = ciclo_actual()
     if not ciclo:
         return "No hay ciclo activo.", 400
 
@@ -4723,7 +5104,7 @@ def dashboard_data_nominaciones():
     if current_user.rol != "admin":
         return jsonify({"error": "Solo administradores"}), 403
 
-    ciclo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo = ciclo_actual()
     if not ciclo:
         return jsonify({"error": "No hay ciclo activo"}), 400
 
@@ -4845,7 +5226,7 @@ def dashboard_data_nominaciones():
 @login_required
 @admin_required
 def dashboard_nominaciones_live():
-    ciclo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo = ciclo_actual()
     if not ciclo:
         return jsonify([])
 
@@ -4946,7 +5327,7 @@ def dashboard_buscar_alumno():
     if len(q) < 2:
         return jsonify([])
 
-    ciclo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo = ciclo_actual()
     if not ciclo:
         return jsonify({"error": "No hay ciclo activo"}), 400
 
@@ -5007,7 +5388,7 @@ def dashboard_resumen_alumno():
     if not alumno_id:
         return jsonify({"error": "Falta alumno_id"}), 400
 
-    ciclo = CicloEscolar.query.filter_by(activo=True).first()
+    ciclo = ciclo_actual()
     if not ciclo:
         return jsonify({"error": "No hay ciclo activo"}), 400
 
@@ -0,0 +1,43 @@
+import os
+import sys
+import types
+
+import pytest
+
+# Los módulos de la app viven en la raíz del repositorio (sin paquete)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    """App de Flask sobre un SQLite temporal (nunca la base de DATABASE_URL)."""
+    os.environ["DATABASE_URL"] = "sqlite:///" + str(tmp_path_factory.mktemp("db") / "tests.db")
+
+    # 🔹 utils importa weasyprint al cargar; sin pango en la máquina basta con que exista el módulo
+    try:
+        import weasyprint  # noqa: F401
+    except (ImportError, OSError):
+        sys.modules["weasyprint"] = types.SimpleNamespace(HTML=None)
+
+    import app as modulo_app
+
+    modulo_app.app.config["TESTING"] = True
+    return modulo_app.app
+
+
+@pytest.fixture
+def claves_foraneas(app):
+    """SQLite con PRAGMA foreign_keys=ON (como Postgres) mientras dura la prueba."""
+    from sqlalchemy import event
+    from extensions import db
+
+    def activar(conexion, _registro):
+        conexion.execute("PRAGMA foreign_keys=ON")
+
+    with app.app_context():
+        db.engine.dispose()
+        event.listen(db.engine, "connect", activar)
+    yield
+    with app.app_context():
+        event.remove(db.engine, "connect", activar)
+        db.engine.dispose()
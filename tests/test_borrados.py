@@ -0,0 +1,102 @@
+from datetime import date, datetime, timedelta
+
+
+def _sembrar(db, sufijo="alumno"):
+    """Ciclo inactivo propio con un alumno que llega a EXCELENCIA (3 nominaciones) en un evento."""
+    from models import Alumno, Bloque, CicloEscolar, EventoAsamblea, Maestro, Usuario, Valor
+    from routes import registrar_cambios_excelencia
+    from utils import insertar_nominaciones
+
+    ciclo = CicloEscolar(nombre=f"borrados-{sufijo}", activo=False)
+    db.session.add(ciclo)
+    db.session.flush()
+    bloque = Bloque(nombre="BLOQUE B", ciclo_id=ciclo.id, orden=1)
+    valores = [Valor(nombre=n, ciclo_id=ciclo.id) for n in ("Respeto", "Honestidad", "Empatia", "EXCELENCIA")]
+    maestro = Maestro(nombre="PROFE B", correo=f"borrados-{sufijo}@x.mx", ciclo_id=ciclo.id)
+    admin = Usuario(nombre="Admin", email=f"admin-{sufijo}@x.mx", rol="admin")
+    admin.set_password("x")
+    db.session.add_all([bloque, maestro, admin] + valores)
+    db.session.flush()
+    evento = EventoAsamblea(
+        ciclo_id=ciclo.id, bloque_id=bloque.id, mes_ordinal=1, nombre_mes="Octubre",
+        fecha_evento=date.today() + timedelta(days=10),
+        fecha_cierre_nominaciones=datetime.utcnow() + timedelta(days=5),
+    )
+    alumno = Alumno(nombre="ALUMNO B", grado="01", grupo="A", nivel="Primaria",
+                    ciclo_id=ciclo.id, bloque_id=bloque.id)
+    db.session.add_all([evento, alumno])
+    db.session.flush()
+
+    creadas, _ = insertar_nominaciones([
+        {"alumno_id": alumno.id, "maestro_id": maestro.id, "valor_id": v.id, "ciclo_id": ciclo.id,
+         "evento_id": evento.id, "tipo": "alumno", "comentario": "bien"}
+        for v in valores[:3]
+    ])
+    registrar_cambios_excelencia(ciclo.id, altas=[
+        (nuevo_id, f["alumno_id"], f["evento_id"], f["valor_id"]) for nuevo_id, f in creadas
+    ])
+    db.session.commit()
+    return alumno.id, evento.id
+
+
+def _admin(app, sufijo="alumno"):
+    cliente = app.test_client()
+    cliente.post("/login", data={"email": f"admin-{sufijo}@x.mx", "password": "x"})
+    return cliente
+
+
+def test_eliminar_alumno_con_nominaciones(app, claves_foraneas):
+    from extensions import db
+    from models import Alumno, ContadorExcelencia, Nominacion, ResumenNominacion
+
+    with app.app_context():
+        alumno_id, _ = _sembrar(db)
+        assert ResumenNominacion.query.filter_by(alumno_id=alumno_id).count() == 4
+        assert ContadorExcelencia.query.filter_by(alumno_id=alumno_id).count() == 1
+
+    respuesta = _admin(app).delete(f"/admin/alumnos/eliminar/{alumno_id}")
+
+    assert respuesta.status_code == 200
+    with app.app_context():
+        assert db.session.get(Alumno, alumno_id) is None
+        assert ResumenNominacion.query.filter_by(alumno_id=alumno_id).count() == 0
+        assert ContadorExcelencia.query.filter_by(alumno_id=alumno_id).count() == 0
+        assert Nominacion.query.filter_by(alumno_id=alumno_id).count() == 0
+
+
+def test_eliminar_evento_con_excelencia_contada(app, claves_foraneas):
+    from extensions import db
+    from models import ContadorExcelencia, EventoAsamblea, ResumenNominacion
+
+    with app.app_context():
+        _, evento_id = _sembrar(db, sufijo="evento")
+        assert ContadorExcelencia.query.filter_by(evento_id=evento_id).count() == 1
+
+    respuesta = _admin(app, "evento").delete(f"/admin/calendario/eliminar/{evento_id}")
+
+    assert respuesta.status_code == 200
+    with app.app_context():
+        assert db.session.get(EventoAsamblea, evento_id) is None
+        assert ContadorExcelencia.query.filter_by(evento_id=evento_id).count() == 0
+        assert ResumenNominacion.query.filter_by(evento_id=evento_id).count() == 0
+
+
+def test_admin_borra_excelencia_automatica_y_no_se_vuelve_a_crear(app):
+    from extensions import db
+    from models import Nominacion
+    from utils import MARCA_EXCELENCIA_AUTOMATICA
+
+    with app.app_context():
+        alumno_id, evento_id = _sembrar(db, sufijo="gestor")
+        excelencia_id = db.session.query(Nominacion.id).filter(
+            Nominacion.alumno_id == alumno_id,
+            Nominacion.comentario.contains(MARCA_EXCELENCIA_AUTOMATICA),
+        ).scalar()
+        assert excelencia_id
+
+    respuesta = _admin(app, "gestor").post("/admin/gestor_nominaciones/eliminar", json={"ids": [excelencia_id]})
+
+    assert respuesta.get_json()["success"]
+    with app.app_context():
+        assert db.session.get(Nominacion, excelencia_id) is None
+        assert Nominacion.query.filter_by(alumno_id=alumno_id, evento_id=evento_id).count() == 3
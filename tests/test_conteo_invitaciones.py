@@ -0,0 +1,72 @@
+from datetime import date, datetime, timedelta
+
+
+def _sembrar(db):
+    from models import Alumno, Bloque, CicloEscolar, EventoAsamblea, Maestro, Nominacion, Valor
+
+    ciclo = CicloEscolar(nombre="2025-2026", activo=True)
+    db.session.add(ciclo)
+    db.session.flush()
+    bloques = [Bloque(nombre=f"BLOQUE {i}", ciclo_id=ciclo.id, orden=i) for i in (1, 2)]
+    valores = [Valor(nombre=n, ciclo_id=ciclo.id) for n in ("Respeto", "Honestidad", "EXCELENCIA")]
+    maestros = [Maestro(nombre=f"PROFE {i}", correo=f"p{i}@x.mx", ciclo_id=ciclo.id) for i in range(3)]
+    db.session.add_all(bloques + valores + maestros)
+    db.session.flush()
+
+    eventos = {
+        b.id: EventoAsamblea(
+            ciclo_id=ciclo.id, bloque_id=b.id, mes_ordinal=1, nombre_mes="Octubre",
+            fecha_evento=date.today() + timedelta(days=10),
+            fecha_cierre_nominaciones=datetime.utcnow() + timedelta(days=5),
+        )
+        for b in bloques
+    }
+    db.session.add_all(eventos.values())
+    alumnos = [
+        Alumno(nombre=f"ALUMNO {i}", grado="01", grupo="A", nivel="Primaria",
+               ciclo_id=ciclo.id, bloque_id=bloques[i % 2].id)
+        for i in range(6)
+    ]
+    db.session.add_all(alumnos)
+    db.session.flush()
+
+    respeto, honestidad, excelencia = (v.id for v in valores)
+    casos = [
+        (alumnos[0], [respeto, honestidad]),            # 2 invitaciones
+        (alumnos[1], [respeto, respeto]),               # duplicada → 1
+        (alumnos[2], [respeto, excelencia, excelencia]),  # solo su EXCELENCIA → 1
+        (alumnos[3], [honestidad, honestidad, respeto]),  # 2
+        (alumnos[4], []),
+    ]
+    for alumno, ids_valor in casos:
+        # 🔹 cada repetición viene de otro maestro (la tabla no admite la misma fila dos veces)
+        for maestro, valor_id in zip(maestros, ids_valor):
+            db.session.add(Nominacion(
+                alumno_id=alumno.id, maestro_id=maestro.id, valor_id=valor_id, ciclo_id=ciclo.id,
+                evento_id=eventos[alumno.bloque_id].id, tipo="alumno", comentario="bien",
+            ))
+    # 🔹 Filas "personal" ligadas a un alumno: cada una es su propia invitación
+    for maestro in maestros[:2]:
+        db.session.add(Nominacion(
+            alumno_id=alumnos[5].id, maestro_id=maestro.id, valor_id=respeto, ciclo_id=ciclo.id,
+            evento_id=eventos[alumnos[5].bloque_id].id, tipo="personal", comentario="bien",
+        ))
+    db.session.commit()
+    return ciclo, eventos
+
+
+def test_conteo_por_evento_coincide_con_invitaciones_generadas(app):
+    from extensions import db
+    from models import CicloEscolar
+    from routes import _conteo_invitaciones_por_evento, _trabajos_invitaciones_bloque
+
+    with app.app_context():
+        ciclo, eventos = _sembrar(db)
+        ciclo = db.session.get(CicloEscolar, ciclo.id)
+
+        conteo = {f["evento_id"]: f["total"] for f in _conteo_invitaciones_por_evento(ciclo.id)}
+
+        for bloque_id, evento in eventos.items():
+            generadas = _trabajos_invitaciones_bloque(ciclo, bloque_id, evento)
+            assert conteo[evento.id] == len(generadas)
+        assert sorted(conteo.values()) == [3, 5]
@@ -0,0 +1,179 @@
+import io
+import json
+import threading
+
+import pytest
+
+import conversion_pdf
+from conversion_pdf import PoolSoffice, atender_puente
+
+
+class ServidorFalso:
+    """Hace las veces de un soffice conectado: 'convierte' copiando el DOCX con un prefijo."""
+
+    iniciados = []
+
+    def __init__(self, indice):
+        self.indice = indice
+        self.proceso = None
+        self.conversiones = 0
+        self.detenciones = 0
+        self.hilos = set()
+
+    def vivo(self):
+        return self.proceso is not None
+
+    def convertir(self, ruta_docx, ruta_pdf):
+        if not self.vivo():
+            self.proceso = type("Proceso", (), {"pid": 1000 + self.indice})()
+            ServidorFalso.iniciados.append(self.indice)
+        with open(ruta_docx, "rb") as f:
+            contenido = f.read()
+        if contenido == b"roto":
+            raise RuntimeError("documento inválido")
+        with open(ruta_pdf, "wb") as f:
+            f.write(b"PDF:" + contenido)
+        self.conversiones += 1
+        self.hilos.add(threading.get_ident())
+
+    def detener(self):
+        self.detenciones += 1
+        self.proceso = None
+
+    def eliminar_perfil(self):
+        pass
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(conversion_pdf, "ejecutable_soffice", lambda: "/usr/bin/soffice")
+    ServidorFalso.iniciados = []
+    pool = PoolSoffice(tamano=2, fabrica=ServidorFalso)
+    yield pool
+    pool.detener()
+
+
+def test_pool_conserva_orden_y_reutiliza_procesos(pool):
+    documentos = [(f"inv_{i:03d}.docx", f"doc {i}".encode()) for i in range(60)]
+
+    resultados = list(pool.convertir(iter(documentos)))
+
+    assert [r[0] for r in resultados] == [f"inv_{i:03d}.pdf" for i in range(60)]
+    assert [r[1] for r in resultados] == [b"PDF:doc %d" % i for i in range(60)]
+    assert all(r[2] is None for r in resultados)
+    # 🔹 cada soffice arrancó una sola vez para los 60 documentos
+    assert sorted(ServidorFalso.iniciados) == [0, 1]
+    assert sum(s.conversiones for s in pool._servidores) == 60
+
+
+def test_pool_reinicia_el_servidor_que_falla(pool):
+    documentos = [("a.docx", b"uno"), ("b.docx", b"roto"), ("c.docx", b"tres"), ("d.docx", b"cuatro")]
+
+    resultados = list(pool.convertir(documentos))
+
+    assert [(n, e is None) for n, _, e in resultados] == [
+        ("a.pdf", True), ("b.pdf", False), ("c.pdf", True), ("d.pdf", True),
+    ]
+    assert resultados[1][2] == "documento inválido"
+    assert sum(s.detenciones for s in pool._servidores) == 1
+    assert pool.estadisticas()["modo"] == "pool"
+
+
+def test_pool_consume_la_entrada_con_ventana_acotada(pool):
+    consumidos = []
+
+    def documentos():
+        for i in range(100):
+            consumidos.append(i)
+            yield f"{i}.docx", b"x"
+
+    salida = pool.convertir(documentos())
+    next(salida)
+    assert len(consumidos) <= pool.tamano * 2 + 1
+
+
+def test_atender_puente_responde_una_linea_por_pedido(tmp_path):
+    docx = tmp_path / "a.docx"
+    docx.write_bytes(b"hola")
+    pedidos = [
+        {"docx": str(docx), "pdf": str(tmp_path / "a.pdf")},
+        {"docx": str(tmp_path / "no_existe.docx"), "pdf": str(tmp_path / "b.pdf")},
+        {"docx": str(docx), "pdf": str(tmp_path / "c.pdf")},
+    ]
+    entrada = io.StringIO("".join(json.dumps(p) + "\n" for p in pedidos))
+    salida = io.StringIO()
+    servidor = ServidorFalso(0)
+
+    atender_puente(entrada, salida, servidor)
+
+    respuestas = [json.loads(l) for l in salida.getvalue().splitlines()]
+    assert respuestas[0] == {"ok": True}
+    assert "error" in respuestas[1]
+    assert respuestas[2] == {"ok": True}
+    assert (tmp_path / "c.pdf").read_bytes() == b"PDF:hola"
+    assert servidor.detenciones == 1
+
+
+def test_sin_uno_avisa_y_usa_cli(monkeypatch, capsys):
+    monkeypatch.setattr(conversion_pdf, "ejecutable_soffice", lambda: "/usr/bin/soffice")
+    monkeypatch.setattr(conversion_pdf, "_tiene_uno", lambda: False)
+    monkeypatch.setattr(conversion_pdf, "python_uno", lambda: None)
+    pool = PoolSoffice(tamano=1)
+    lotes = []
+    monkeypatch.setattr(pool, "_convertir_cli", lambda lote: lotes.append(len(lote)) or [])
+
+    list(pool.convertir([(f"{i}.docx", b"x") for i in range(30)]))
+
+    assert pool.modo() == "cli"
+    assert lotes == [conversion_pdf.LOTE_CLI, 30 - conversion_pdf.LOTE_CLI]
+    assert "modo CLI" in capsys.readouterr().out
+    pool.detener()
+
+
+PUENTE_FALSO = """
+import sys
+sys.path.insert(0, {raiz!r})
+from conversion_pdf import atender_puente
+
+class Servidor:
+    def convertir(self, docx, pdf):
+        with open(docx, "rb") as f:
+            contenido = f.read()
+        if contenido == b"roto":
+            raise RuntimeError("documento inválido")
+        with open(pdf, "wb") as f:
+            f.write(b"PDF:" + contenido)
+
+    def detener(self):
+        pass
+
+atender_puente(sys.stdin, sys.stdout, Servidor())
+"""
+
+
+def test_puente_reutiliza_un_solo_proceso(monkeypatch, tmp_path):
+    import os
+    import sys
+    from conversion_pdf import PuenteSoffice
+
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = tmp_path / "puente.py"
+    script.write_text(PUENTE_FALSO.format(raiz=raiz))
+    monkeypatch.setattr(conversion_pdf, "ejecutable_soffice", lambda: "/usr/bin/soffice")
+    monkeypatch.setattr(PuenteSoffice, "comando", lambda self: [sys.executable, str(script)])
+
+    pool = PoolSoffice(tamano=1, fabrica=PuenteSoffice)
+    try:
+        resultados = list(pool.convertir([("a.docx", b"uno")]))
+        puente = pool._servidores[0]
+        pid = puente.proceso.pid
+        resultados += list(pool.convertir([("b.docx", b"roto"), ("c.docx", b"tres"), ("d.docx", b"cuatro")]))
+
+        assert [(n, c) for n, c, _ in resultados] == [
+            ("a.pdf", b"PDF:uno"), ("b.pdf", None), ("c.pdf", b"PDF:tres"), ("d.pdf", b"PDF:cuatro"),
+        ]
+        assert resultados[1][2] == "documento inválido"
+        assert puente.proceso.pid == pid  # 🔹 mismo proceso para todos, aun con un documento fallido
+        assert puente.conversiones == 3
+    finally:
+        pool.detener()
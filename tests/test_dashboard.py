@@ -0,0 +1,40 @@
+from datetime import date, datetime, timedelta
+
+
+def test_resumen_dashboard_cuenta_lo_mismo_en_las_cuatro_cifras(app):
+    from extensions import db
+    from models import Bloque, CicloEscolar, EventoAsamblea, Maestro, Nominacion, Valor
+    from routes import _calcular_resumen_dashboard
+    from utils import insertar_nominaciones
+
+    with app.app_context():
+        ciclo = CicloEscolar(nombre="dashboard", activo=False)
+        db.session.add(ciclo)
+        db.session.flush()
+        bloque = Bloque(nombre="BLOQUE D", ciclo_id=ciclo.id, orden=1)
+        valor = Valor(nombre="Respeto", ciclo_id=ciclo.id)
+        autor, nominado = (Maestro(nombre=f"PROFE {i}", correo=f"dash{i}@x.mx", ciclo_id=ciclo.id) for i in (1, 2))
+        db.session.add_all([bloque, valor, autor, nominado])
+        db.session.flush()
+        evento = EventoAsamblea(
+            ciclo_id=ciclo.id, bloque_id=bloque.id, mes_ordinal=1, nombre_mes="Octubre",
+            fecha_evento=date.today() + timedelta(days=10),
+            fecha_cierre_nominaciones=datetime.utcnow() + timedelta(days=5),
+        )
+        db.session.add(evento)
+        db.session.flush()
+        insertar_nominaciones([{
+            "maestro_nominado_id": nominado.id, "maestro_id": autor.id, "valor_id": valor.id,
+            "ciclo_id": ciclo.id, "evento_id": evento.id, "tipo": "personal", "comentario": "bien",
+        }])
+        # 🔹 sin evento no entra al resumen: tampoco debe contar por día
+        db.session.add(Nominacion(maestro_nominado_id=nominado.id, maestro_id=autor.id, valor_id=valor.id,
+                                  ciclo_id=ciclo.id, tipo="personal"))
+        db.session.commit()
+
+        datos = _calcular_resumen_dashboard(ciclo.id, None)
+
+    assert datos["totales"]["nominaciones"] == 1
+    assert sum(d["n"] for d in datos["por_dia"]) == 1
+    assert sum(v["n"] for v in datos["por_valor"]) == 1
+    assert datos["por_tipo"] == {"alumno": 0, "personal": 1}
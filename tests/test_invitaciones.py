@@ -0,0 +1,63 @@
+from concurrent.futures import Future
+
+import invitaciones
+
+
+class EjecutorFalso:
+    """Ejecuta cada envío en el acto y cuenta cuántos lotes se han enviado."""
+
+    def __init__(self):
+        self.enviados = 0
+
+    def submit(self, funcion, *args):
+        self.enviados += 1
+        futuro = Future()
+        futuro.set_result(funcion(*args))
+        return futuro
+
+
+def test_resultados_pool_mantiene_orden_con_ventana_acotada(monkeypatch):
+    ejecutor = EjecutorFalso()
+    monkeypatch.setattr(invitaciones, "workers_render", lambda: 2)
+    monkeypatch.setattr(invitaciones, "ejecutor_render", lambda: ejecutor)
+    monkeypatch.setattr(invitaciones, "_renderizar_trabajo", lambda t: (t[0], t[2]["n"], None))
+    trabajos = [(f"{i}.docx", "plantilla.docx", {"n": i}) for i in range(500)]
+
+    resultados = invitaciones._resultados_pool(trabajos)
+    primero = next(resultados)
+
+    # 🔹 antes del primer resultado solo hay ~2 × workers lotes enviados, no los 500 trabajos
+    assert ejecutor.enviados == 2 * 2
+    assert primero == ("0.docx", 0, None)
+    resto = list(resultados)
+    assert [r[1] for r in [primero] + resto] == list(range(500))
+    assert ejecutor.enviados == -(-500 // invitaciones.MAX_LOTE_RENDER)
+
+
+def _nominacion(id, alumno_id, valor, fecha, tipo="alumno", evento_id=1):
+    from types import SimpleNamespace
+    from datetime import date
+
+    return SimpleNamespace(
+        id=id, alumno_id=alumno_id, tipo=tipo, evento_id=evento_id,
+        valor_id=valor and hash(valor), valor=valor and SimpleNamespace(nombre=valor),
+        fecha=date(2025, 10, fecha),
+    )
+
+
+def test_seleccion_por_ids_conserva_orden_y_deduplicado_por_valor():
+    nominaciones = [
+        _nominacion(1, 10, "Respeto", 5),
+        _nominacion(2, 20, "Respeto", 3),
+        _nominacion(3, 10, "Respeto", 2, evento_id=2),   # mismo valor en otro evento → fuera
+        _nominacion(4, 10, "Honestidad", 1),
+        _nominacion(5, 20, "EXCELENCIA", 9),
+        _nominacion(6, 20, "EXCELENCIA", 4),
+        _nominacion(7, None, "Respeto", 1, tipo="personal"),
+        _nominacion(8, 30, "Respeto", 1, tipo=None),      # sin tipo → no genera invitación
+    ]
+
+    seleccion = invitaciones.seleccionar_invitaciones_ids(nominaciones)
+
+    # personal primero; luego cada alumno en orden de aparición, con sus filas por fecha
+    assert [n.id for n in seleccion] == [7, 4, 3, 6]
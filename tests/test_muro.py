@@ -0,0 +1,22 @@
+import pytest
+
+from muro import FotosMuro
+
+
+class ContextoFalso:
+    ciclo_id = 1
+    version = 3
+
+
+def test_ruta_de_foto_solo_acepta_tipos_conocidos(tmp_path):
+    fotos = FotosMuro(str(tmp_path))
+
+    assert fotos.ruta(ContextoFalso(), 2, "personal").endswith("2-personal-todos.html")
+    with pytest.raises(ValueError):
+        fotos.ruta(ContextoFalso(), 2, "../../../../tmp/PWNED")
+
+
+def test_muro_publico_rechaza_tipo_desconocido(app):
+    respuesta = app.test_client().get("/muro_publico?mes=1&tipo=../../../../tmp/PWNED")
+
+    assert respuesta.status_code == 400
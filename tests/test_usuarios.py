@@ -0,0 +1,28 @@
+from sqlalchemy.orm import Session
+
+
+def test_cargar_usuario_se_invalida_cuando_otro_worker_cambia_el_usuario(app):
+    import utils
+    from extensions import db
+    from models import Usuario
+
+    with app.app_context():
+        usuario = Usuario(nombre="Profe", email="cache@x.mx", rol="profesor")
+        usuario.set_password("x")
+        db.session.add(usuario)
+        db.session.commit()
+        usuario_id = usuario.id
+
+    with app.test_request_context():
+        assert utils.cargar_usuario(usuario_id).rol == "profesor"
+        assert "password_hash" not in utils._usuarios_worker[usuario_id][1]
+
+    # 🔹 otro worker (otra sesión, otra conexión) cambia el rol
+    with app.app_context(), Session(db.engine) as otra:
+        otra.get(Usuario, usuario_id).rol = "admin"
+        otra.commit()
+
+    with app.test_request_context():
+        cargado = utils.cargar_usuario(usuario_id)
+        assert cargado.rol == "admin"
+        assert cargado.check_password("x")
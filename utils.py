@@ -4,6 +4,12 @@ from models import CicloEscolar, EventoAsamblea  # 👈 agregamos EventoAsamblea
 from functools import wraps
 from flask import redirect, url_for, flash
 from flask_login import current_user
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import and_, bindparam, case, delete, event, func, literal, select, update
+from sqlalchemy import insert as insert_generico
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, make_transient_to_detached
 
 if platform.system() == "Windows":
     import win32com.client
@@ -82,8 +88,344 @@ def generar_pdf(template_name: str, context: dict, output_dir: str, filename: st
         return output_pdf
 
 
+# ======================================================
+# 🗂️ Contexto del ciclo activo (caché por worker + versión en BD)
+# ======================================================
+VERSION_CICLO = "ciclo"
+VERSION_NOMINACIONES = "nominaciones"
+_contexto_worker = [None]
+_lock_contexto = threading.Lock()
+
+
+class ContextoCiclo:
+    """
+    Foto del ciclo activo: ciclo, bloques ordenados, eventos, valores, id de EXCELENCIA y el
+    índice bloque → grado → grupo con su número de alumnos.
+    Los objetos se guardan desconectados y se ligan a la sesión de cada petición con
+    merge(load=False), que no consulta la base de datos.
+    """
+
+    def __init__(self, version, ciclo, bloques, eventos, valores, jerarquia=()):
+        self.version = version
+        self._ciclo = ciclo
+        self._bloques = bloques
+        self._eventos = eventos
+        self._valores = valores
+        self.ciclo_id = ciclo.id if ciclo else None
+        self.excelencia_id = next(
+            (v.id for v in valores if (v.nombre or "").strip().upper() == "EXCELENCIA"), None
+        )
+
+        # 🔹 bloque_id -> grado -> [(nivel, grupo, alumnos)] ordenado por grupo
+        self._jerarquia = {}
+        for bloque_id, grado, nivel, grupo, alumnos in sorted(jerarquia, key=lambda f: (f[3], f[2])):
+            self._jerarquia.setdefault(bloque_id, {}).setdefault(grado, []).append((nivel, grupo, alumnos))
+
+    @staticmethod
+    def _ligar(objetos):
+        return [db.session.merge(o, load=False) for o in objetos]
+
+    @property
+    def ciclo(self):
+        return db.session.merge(self._ciclo, load=False) if self._ciclo else None
+
+    def bloques(self):
+        return self._ligar(self._bloques)
+
+    def eventos(self, bloque_id=None):
+        return self._ligar(e for e in self._eventos if bloque_id is None or e.bloque_id == bloque_id)
+
+    def eventos_activos(self, bloque_id=None):
+        """Eventos con activo=True, por fecha_evento ascendente."""
+        return sorted(
+            (e for e in self.eventos(bloque_id) if e.activo),
+            key=lambda e: e.fecha_evento,
+        )
+
+    def evento_abierto(self, bloque_id):
+        """Primer evento del bloque activo y antes de su cierre (como EventoAsamblea.esta_abierto)."""
+        return next((e for e in self.eventos_activos(bloque_id) if e.esta_abierto), None)
+
+    def valores(self, solo_activos=True):
+        return self._ligar(v for v in self._valores if v.activo or not solo_activos)
+
+    def grados(self, bloque_id):
+        """Grados con alumnos en el bloque, ordenados."""
+        return sorted(self._jerarquia.get(bloque_id, {}))
+
+    def grupos(self, bloque_id, grado):
+        """[(nivel, grupo, alumnos)] del grado dentro del bloque, ordenados por grupo."""
+        return list(self._jerarquia.get(bloque_id, {}).get(grado, []))
+
+
+def version_catalogo(nombre=VERSION_CICLO):
+    from models import VersionCatalogo
+    return db.session.query(VersionCatalogo.version).filter_by(nombre=nombre).scalar() or 0
+
+
+def _subir_version(conexion, nombre):
+    from models import VersionCatalogo
+
+    tabla = VersionCatalogo.__table__
+    subidas = conexion.execute(
+        update(tabla).where(tabla.c.nombre == nombre).values(version=tabla.c.version + 1)
+    ).rowcount
+    if not subidas:
+        conexion.execute(insert_generico(tabla).values(nombre=nombre, version=1))
+
+
+def _cargar_contexto(version):
+    from models import Alumno, Bloque, Valor
+
+    with Session(db.engine, expire_on_commit=False) as sesion:
+        ciclo = sesion.query(CicloEscolar).filter_by(activo=True).first()
+        if not ciclo:
+            return ContextoCiclo(version, None, [], [], [])
+        bloques = (
+            sesion.query(Bloque).filter_by(ciclo_id=ciclo.id)
+            .order_by(Bloque.orden.asc(), Bloque.nombre.asc()).all()
+        )
+        eventos = (
+            sesion.query(EventoAsamblea).filter_by(ciclo_id=ciclo.id)
+            .order_by(EventoAsamblea.mes_ordinal.asc(), EventoAsamblea.fecha_evento.asc()).all()
+        )
+        valores = sesion.query(Valor).filter_by(ciclo_id=ciclo.id).order_by(Valor.id.asc()).all()
+        jerarquia = (
+            sesion.query(Alumno.bloque_id, Alumno.grado, Alumno.nivel, Alumno.grupo, func.count(Alumno.id))
+            .filter(Alumno.ciclo_id == ciclo.id)
+            .group_by(Alumno.bloque_id, Alumno.grado, Alumno.nivel, Alumno.grupo)
+            .all()
+        )
+    return ContextoCiclo(version, ciclo, bloques, eventos, valores, jerarquia)
+
+
+def contexto_ciclo():
+    """
+    Contexto del ciclo activo para esta petición (se guarda en `g`). Solo cuesta una consulta
+    por petición (la versión); se recarga cuando otro worker o esta misma app cambió el catálogo.
+    """
+    from flask import g
+
+    contexto = g.get("contexto_ciclo")
+    if contexto is not None:
+        return contexto
+
+    version = version_catalogo(VERSION_CICLO)
+    with _lock_contexto:
+        contexto = _contexto_worker[0]
+        if contexto is None or contexto.version != version:
+            contexto = _cargar_contexto(version)
+            _contexto_worker[0] = contexto
+    g.contexto_ciclo = contexto
+    return contexto
+
+
 def ciclo_actual():
-    return db.session.query(CicloEscolar).filter_by(activo=True).first()
+    return contexto_ciclo().ciclo
+
+
+def marcar_cambio_ciclo(sesion=None):
+    """Sube la versión del catálogo del ciclo dentro de la transacción actual."""
+    sesion = sesion or db.session
+    if sesion.info.get("version_ciclo_marcada"):
+        return
+    sesion.info["version_ciclo_marcada"] = True
+    _subir_version(sesion.connection(), VERSION_CICLO)
+
+
+def marcar_cambio_nominaciones(sesion=None, eventos=()):
+    """
+    Las nominaciones cambiaron en esta transacción. Su versión sube justo antes del commit
+    (before_commit), para no bloquear la fila de versión durante toda la transacción.
+    eventos: pares (ciclo_id, evento_id) tocados; evento_id=None equivale a todo el ciclo.
+    Tras el commit se borran las fotos del muro de esos meses.
+    """
+    info = (sesion or db.session).info
+    info["version_nominaciones_marcada"] = True
+    info.setdefault("eventos_nominaciones", set()).update(eventos)
+
+
+def _borrar_fotos_muro(eventos):
+    """Resuelve el mes de cada evento con el contexto en memoria (sin consultas) y borra sus fotos."""
+    from muro import fotos_muro
+
+    contexto = _contexto_worker[0]
+    meses = {e.id: e.mes_ordinal for e in contexto._eventos} if contexto else {}
+    por_ciclo = {}
+    for ciclo_id, evento_id in eventos:
+        if contexto is None or ciclo_id != contexto.ciclo_id or meses.get(evento_id) is None:
+            por_ciclo[ciclo_id] = None  # 🔹 mes desconocido: todo el ciclo
+        elif por_ciclo.get(ciclo_id, set()) is not None:
+            por_ciclo.setdefault(ciclo_id, set()).add(meses[evento_id])
+    for ciclo_id, meses_ciclo in por_ciclo.items():
+        fotos_muro.borrar_meses(ciclo_id, meses_ciclo)
+
+
+def _registrar_eventos_catalogo():
+    """
+    Cualquier alta/cambio/baja de ciclo, bloque, evento, valor, maestro o alumno sube la versión
+    del ciclo al hacer flush; los cambios de nominaciones marcados suben la suya antes del commit.
+    Solo cuentan columnas: que una nominación nueva toque la colección de un alumno o maestro
+    no invalida nada.
+    """
+    from flask import g, has_app_context
+    from models import Alumno, Bloque, Maestro, Valor
+
+    catalogo = (CicloEscolar, Bloque, EventoAsamblea, Valor, Maestro, Alumno)
+
+    @event.listens_for(Session, "before_flush")
+    def _antes_de_flush(sesion, contexto_flush, instancias):
+        if sesion.info.get("version_ciclo_marcada"):
+            return
+        for obj in list(sesion.new) + list(sesion.deleted) + list(sesion.dirty):
+            if isinstance(obj, catalogo) and (
+                obj not in sesion.dirty or sesion.is_modified(obj, include_collections=False)
+            ):
+                marcar_cambio_ciclo(sesion)
+                return
+
+    @event.listens_for(Session, "after_commit")
+    def _despues_de_commit(sesion):
+        if sesion.info.pop("version_ciclo_marcada", None) and has_app_context():
+            g.pop("contexto_ciclo", None)
+        eventos = sesion.info.pop("eventos_nominaciones", None)
+        if eventos:
+            try:
+                _borrar_fotos_muro(eventos)
+            except OSError as e:
+                print(f"⚠️ No se pudieron borrar las fotos del muro: {e}")
+
+    @event.listens_for(Session, "before_commit")
+    def _antes_de_commit(sesion):
+        if sesion.info.pop("version_nominaciones_marcada", None):
+            _subir_version(sesion.connection(), VERSION_NOMINACIONES)
+
+    @event.listens_for(Session, "after_soft_rollback")
+    def _despues_de_rollback(sesion, transaccion_previa):
+        sesion.info.pop("version_ciclo_marcada", None)
+        sesion.info.pop("version_nominaciones_marcada", None)
+        sesion.info.pop("eventos_nominaciones", None)
+
+
+_registrar_eventos_catalogo()
+
+
+# ======================================================
+# 🪪 Identidad del usuario (caché de load_user + sesión)
+# ======================================================
+VERSION_USUARIOS = "usuarios"
+_usuarios_worker = {}
+# Solo lo que necesitan la sesión y las plantillas; password_hash se lee de la BD si hace falta
+CAMPOS_USUARIO = ("id", "nombre", "email", "rol")
+CAMPOS_MAESTRO = ("id", "nombre", "correo", "ciclo_id", "activo")
+
+
+def _instancia_desde_datos(modelo, datos):
+    """Reconstruye una fila ya conocida y la liga a la sesión sin consultar la base de datos."""
+
+    obj = modelo(**datos)
+    make_transient_to_detached(obj)
+    return db.session.merge(obj, load=False)
+
+
+def cargar_usuario(user_id):
+    """
+    user_loader con caché por worker. Cada entrada guarda la versión 'usuarios' con la que se
+    leyó; cualquier alta, cambio o baja de un usuario (en cualquier worker) sube esa versión y
+    la entrada deja de servirse en la siguiente petición.
+    """
+    from models import Usuario
+
+    version = version_catalogo(VERSION_USUARIOS)
+    guardado = _usuarios_worker.get(user_id)
+    if guardado and guardado[0] == version:
+        return _instancia_desde_datos(Usuario, guardado[1])
+
+    usuario = db.session.get(Usuario, user_id)
+    if usuario is None:
+        _usuarios_worker.pop(user_id, None)
+        return None
+    _usuarios_worker[user_id] = (version, {c: getattr(usuario, c) for c in CAMPOS_USUARIO})
+    return usuario
+
+
+def guardar_identidad(usuario):
+    """
+    Resuelve una sola vez (al iniciar sesión o cuando cambia el catálogo del ciclo) el rol y el
+    registro de Maestro del usuario en el ciclo activo, y lo guarda en la sesión.
+    """
+    from flask import session
+    from models import Maestro
+
+    contexto = contexto_ciclo()
+    maestro = None
+    if contexto.ciclo_id:
+        maestro = Maestro.query.filter_by(correo=usuario.email, ciclo_id=contexto.ciclo_id).first()
+
+    identidad = {
+        "usuario_id": usuario.id,
+        "email": usuario.email,
+        "rol": usuario.rol,
+        "version": contexto.version,
+        "maestro": {c: getattr(maestro, c) for c in CAMPOS_MAESTRO} if maestro else None,
+    }
+    session["identidad"] = identidad
+    return identidad
+
+
+def identidad_actual():
+    """Identidad guardada en la sesión; se vuelve a resolver si cambió el usuario o la versión del ciclo."""
+    from flask import session
+
+    identidad = session.get("identidad")
+    if (
+        not identidad
+        or identidad.get("usuario_id") != current_user.id
+        or identidad.get("email") != current_user.email
+        or identidad.get("rol") != current_user.rol
+        or identidad.get("version") != contexto_ciclo().version
+    ):
+        identidad = guardar_identidad(current_user)
+    return identidad
+
+
+def maestro_actual(solo_activo=False):
+    """Registro de Maestro del usuario actual en el ciclo activo (o None), sin consultar la base de datos."""
+    from models import Maestro
+
+    datos = identidad_actual()["maestro"]
+    if not datos or (solo_activo and not datos.get("activo")):
+        return None
+    return _instancia_desde_datos(Maestro, datos)
+
+
+def _registrar_eventos_usuarios():
+    """
+    Si se crea, modifica o borra un usuario, la versión 'usuarios' sube dentro de la misma
+    transacción (una vez por transacción) y todos los workers descartan su caché de load_user.
+    """
+    from models import Usuario
+
+    @event.listens_for(Session, "before_flush")
+    def _antes_de_flush(sesion, contexto_flush, instancias):
+        if sesion.info.get("version_usuarios_marcada"):
+            return
+        for obj in list(sesion.new) + list(sesion.deleted) + list(sesion.dirty):
+            if isinstance(obj, Usuario) and (obj not in sesion.dirty or sesion.is_modified(obj)):
+                sesion.info["version_usuarios_marcada"] = True
+                _subir_version(sesion.connection(), VERSION_USUARIOS)
+                return
+
+    @event.listens_for(Session, "after_commit")
+    def _despues_de_commit(sesion):
+        sesion.info.pop("version_usuarios_marcada", None)
+
+    @event.listens_for(Session, "after_soft_rollback")
+    def _despues_de_rollback(sesion, transaccion_previa):
+        sesion.info.pop("version_usuarios_marcada", None)
+
+
+_registrar_eventos_usuarios()
 
 # 🔹 Decorador para restringir acceso solo a administradores
 def admin_required(f):
@@ -101,26 +443,575 @@ def admin_required(f):
     return decorated_function
 
 
-from datetime import datetime
+# ======================================================
+# 🔁 Envíos idempotentes de formularios (token con TTL)
+# ======================================================
+TTL_ENVIOS = timedelta(minutes=30)
+_ultima_purga_envios = [None]
+
+
+def nuevo_token_envio():
+    """Token de un solo uso para el campo oculto `token_envio` del formulario."""
+    import uuid
+    return uuid.uuid4().hex
+
+
+def _purgar_envios_vencidos(ahora):
+    """Borra tokens vencidos (como mucho una vez por minuto por proceso)."""
+    from models import EnvioFormulario
 
-from datetime import datetime
+    ultima = _ultima_purga_envios[0]
+    if ultima is not None and ahora - ultima < timedelta(minutes=1):
+        return
+    _ultima_purga_envios[0] = ahora
+    EnvioFormulario.query.filter(EnvioFormulario.creado_en < ahora - TTL_ENVIOS).delete(
+        synchronize_session=False
+    )
+
+
+def reclamar_envio(token, endpoint, usuario_id):
+    """
+    Intenta quedarse con el token (INSERT ... ON CONFLICT DO NOTHING) y hace commit de inmediato
+    para que un envío repetido en paralelo lo vea. Devuelve None si el token es nuevo, o el
+    EnvioFormulario existente si este envío es una repetición.
+    """
+    from models import EnvioFormulario
+
+    ahora = datetime.utcnow()
+    _purgar_envios_vencidos(ahora)
+
+    fila = {"token": token, "usuario_id": usuario_id, "endpoint": endpoint,
+            "estado": "procesando", "creado_en": ahora}
+    insert = _insert_con_upsert()
+    try:
+        if insert is not None:
+            nuevo = db.session.execute(
+                insert(EnvioFormulario).values(fila).on_conflict_do_nothing()
+                .returning(EnvioFormulario.token)
+            ).first()
+        else:
+            nuevo = db.session.execute(insert_generico(EnvioFormulario).values(fila)).rowcount
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        nuevo = None
 
-def cerrar_eventos_vencidos():
-    """Desactiva automáticamente eventos cuya fecha ya pasó,
-    excepto si el admin los reactivó manualmente."""
-    
+    if nuevo:
+        return None
+    return db.session.get(EnvioFormulario, token)
+
+
+def completar_envio(token, mensajes, destino):
+    """Guarda el resultado (mensajes flash y redirección) para repetirlo si llega otra vez."""
+    import json
+    from models import EnvioFormulario
+
+    db.session.query(EnvioFormulario).filter_by(token=token).update(
+        {"estado": "listo", "mensajes": json.dumps(mensajes), "destino": destino},
+        synchronize_session=False,
+    )
+    db.session.commit()
+
+
+def envio_idempotente(f):
+    """
+    Decorador para formularios POST con campo oculto `token_envio`: el primer envío se procesa
+    normal; uno repetido con el mismo token solo repite los mensajes y la redirección del primero,
+    sin tocar la tabla de nominaciones.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        import json
+        from flask import request, session
+
+        token = request.form.get("token_envio") if request.method == "POST" else None
+        if not token:
+            return f(*args, **kwargs)  # 🔹 GET o formulario sin token: flujo normal
+
+        usuario_id = current_user.id if current_user.is_authenticated else None
+        previo = reclamar_envio(token, request.endpoint, usuario_id)
+        if previo is not None:
+            if previo.estado == "listo" and previo.usuario_id == usuario_id:
+                for categoria, mensaje in json.loads(previo.mensajes or "[]"):
+                    flash(mensaje, categoria)
+                return redirect(previo.destino or request.url)
+            flash("⏳ Tu envío anterior todavía se está procesando. Revisa la lista en unos segundos.", "info")
+            return redirect(request.url)
+
+        ya_mostrados = len(session.get("_flashes", []))
+        try:
+            respuesta = f(*args, **kwargs)
+        except Exception:
+            db.session.rollback()
+            from models import EnvioFormulario
+            EnvioFormulario.query.filter_by(token=token).delete(synchronize_session=False)
+            db.session.commit()  # 🔹 libera el token para que se pueda reintentar
+            raise
+
+        mensajes = [list(m) for m in session.get("_flashes", [])[ya_mostrados:]]
+        destino = getattr(respuesta, "location", None) if getattr(respuesta, "status_code", 200) in (301, 302, 303) else None
+        completar_envio(token, mensajes, destino)
+        return respuesta
+    return decorated_function
+
+
+INTERVALO_CIERRE_EVENTOS = timedelta(minutes=1)
+_ultimo_cierre_eventos = [None]
+
+
+def cerrar_eventos_vencidos(forzar=False):
+    """Desactiva automáticamente eventos cuya fecha de cierre ya pasó.
+
+    Corre como mucho una vez por INTERVALO_CIERRE_EVENTOS en cada worker y son dos UPDATE
+    condicionales: si no hay nada que cambiar no se lee ni se escribe ninguna fila.
+    Para saber si un evento está abierto en una consulta usa EventoAsamblea.esta_abierto.
+    Si cerró alguno, publica las fotos estáticas del muro de los meses que quedaron cerrados.
+    """
     ahora = datetime.utcnow()  # usamos UTC porque tú guardas UTC en DB
 
-    eventos = EventoAsamblea.query.all()
+    ultimo = _ultimo_cierre_eventos[0]
+    if not forzar and ultimo is not None and ahora - ultimo < INTERVALO_CIERRE_EVENTOS:
+        return 0
+    _ultimo_cierre_eventos[0] = ahora
+
+    # Si ya pasó el cierre → debe estar desactivado
+    cerrados = (
+        EventoAsamblea.query
+        .filter(
+            EventoAsamblea.fecha_cierre_nominaciones <= ahora,
+            db.or_(EventoAsamblea.activo.is_(True), EventoAsamblea.activo.is_(None)),
+        )
+        .update({"activo": False}, synchronize_session=False)
+    )
+
+    # Si NO ha pasado → debe estar activo (salvo que el admin lo desactivó)
+    abiertos = (
+        EventoAsamblea.query
+        .filter(
+            EventoAsamblea.fecha_cierre_nominaciones > ahora,
+            EventoAsamblea.activo.is_(None),
+        )
+        .update({"activo": True}, synchronize_session=False)
+    )
+
+    if cerrados or abiertos:
+        marcar_cambio_ciclo()
+        db.session.commit()
+
+    # 🖼️ Meses recién cerrados: su muro pasa a HTML estático
+    if cerrados:
+        from muro import publicar_fotos_muro
+        try:
+            publicar_fotos_muro()
+        except OSError as e:
+            print(f"⚠️ No se pudieron publicar las fotos del muro: {e}")
+    return cerrados
+
+# ======================================================
+# 🧩 Inserción masiva de nominaciones (una sola sentencia)
+# ======================================================
+def _insert_con_upsert():
+    """insert() del dialecto con ON CONFLICT + RETURNING (Postgres, SQLite ≥ 3.35) o None."""
+    import sqlite3
+
+    dialecto = db.session.get_bind().dialect.name
+    if dialecto == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialecto == "sqlite" and sqlite3.sqlite_version_info >= (3, 35, 0):
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+
+def _clave_nominacion(fila):
+    return (
+        fila.get("evento_id"), fila.get("tipo"), fila.get("alumno_id"),
+        fila.get("maestro_nominado_id"), fila.get("maestro_id"), fila.get("valor_id"),
+    )
+
+
+def insertar_nominaciones(filas):
+    """
+    Inserta todas las nominaciones en UN solo INSERT ... ON CONFLICT DO NOTHING ... RETURNING.
+    Las que chocan con los índices únicos (mismo evento, tipo, nominado, maestro y valor) se omiten.
+
+    filas: lista de dicts con las columnas de Nominacion.
+    Devuelve (creadas, duplicadas): creadas = [(id, fila)], duplicadas = [fila].
+    Las creadas se suman al resumen de nominaciones.
+    No hace commit: queda dentro de la transacción del llamador.
+    """
+    from models import Nominacion
 
-    for evento in eventos:
+    # 🔹 Quitar repetidas dentro del mismo envío (ej. doble clic en el mismo alumno)
+    unicas, vistas, duplicadas = [], set(), []
+    for fila in filas:
+        clave = _clave_nominacion(fila)
+        if clave in vistas:
+            duplicadas.append(fila)
+            continue
+        vistas.add(clave)
+        unicas.append(fila)
 
-        if evento.fecha_cierre_nominaciones <= ahora:
-            # Si ya pasó el cierre → debe estar desactivado
-            evento.activo = False
+    if not unicas:
+        return [], duplicadas
+
+    insert = _insert_con_upsert()
+    if insert is not None:
+        stmt = (
+            insert(Nominacion)
+            .values(unicas)
+            .on_conflict_do_nothing()
+            .returning(
+                Nominacion.id, Nominacion.evento_id, Nominacion.tipo, Nominacion.alumno_id,
+                Nominacion.maestro_nominado_id, Nominacion.maestro_id, Nominacion.valor_id,
+            )
+        )
+        insertadas = {tuple(r[1:]): r[0] for r in db.session.execute(stmt).all()}
+    else:
+        # Otros motores: una fila por savepoint (misma semántica, más viajes)
+        insertadas = {}
+        for fila in unicas:
+            try:
+                with db.session.begin_nested():
+                    nuevo_id = db.session.execute(
+                        insert_generico(Nominacion).values(fila).returning(Nominacion.id)
+                    ).scalar_one()
+                insertadas[_clave_nominacion(fila)] = nuevo_id
+            except IntegrityError:
+                pass
+
+    creadas = []
+    for fila in unicas:
+        nuevo_id = insertadas.get(_clave_nominacion(fila))
+        if nuevo_id is None:
+            duplicadas.append(fila)
         else:
-            # Si NO ha pasado → debe estar activo (salvo que el admin lo desactivó)
-            if evento.activo is None:
-                evento.activo = True
+            creadas.append((nuevo_id, fila))
+
+    ajustar_resumen_nominaciones(altas=[fila for _, fila in creadas])
+    return creadas, duplicadas
+
+
+# ======================================================
+# 🏅 Contadores de EXCELENCIA (alumno, evento)
+# ======================================================
+MARCA_EXCELENCIA_AUTOMATICA = "Valores obtenidos:"  # inicio del comentario de la EXCELENCIA automática
+
+
+def ajustar_contadores_excelencia(ciclo_id, deltas):
+    """
+    Suma a cada contador (alumno_id, evento_id) su delta de nominaciones normales en UN solo
+    INSERT ... ON CONFLICT DO UPDATE ... RETURNING. En Postgres las filas quedan bloqueadas
+    hasta el commit, así que dos altas simultáneas del mismo alumno no pueden promoverlo dos veces.
+
+    deltas: {(alumno_id, evento_id): delta}  (delta 0 solo bloquea / crea la fila)
+    Devuelve {(alumno_id, evento_id): (normales, excelencia_id)}. No hace commit.
+    """
+    from models import ContadorExcelencia
+
+    if not deltas:
+        return {}
+
+    ahora = datetime.utcnow()
+    insert = _insert_con_upsert()
+    if insert is not None:
+        stmt = insert(ContadorExcelencia).values([
+            {"alumno_id": a, "evento_id": e, "ciclo_id": ciclo_id, "normales": d, "actualizado_en": ahora}
+            for (a, e), d in deltas.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ContadorExcelencia.alumno_id, ContadorExcelencia.evento_id],
+            set_={
+                "normales": ContadorExcelencia.normales + stmt.excluded.normales,
+                "actualizado_en": ahora,
+            },
+        ).returning(
+            ContadorExcelencia.alumno_id, ContadorExcelencia.evento_id,
+            ContadorExcelencia.normales, ContadorExcelencia.excelencia_id,
+        )
+        return {(r[0], r[1]): (r[2], r[3]) for r in db.session.execute(stmt).all()}
+
+    # Otros motores: SELECT ... FOR UPDATE por contador
+    estado = {}
+    for (alumno_id, evento_id), delta in deltas.items():
+        contador = (
+            db.session.query(ContadorExcelencia)
+            .filter_by(alumno_id=alumno_id, evento_id=evento_id)
+            .with_for_update()
+            .first()
+        )
+        if contador is None:
+            contador = ContadorExcelencia(
+                alumno_id=alumno_id, evento_id=evento_id, ciclo_id=ciclo_id, normales=0
+            )
+            db.session.add(contador)
+        contador.normales = (contador.normales or 0) + delta
+        contador.actualizado_en = ahora
+        estado[(alumno_id, evento_id)] = (contador.normales, contador.excelencia_id)
+    db.session.flush()
+    return estado
+
+
+def reconstruir_contadores_excelencia(ciclo_id, evento_id=None):
+    """
+    Recalcula desde cero los contadores de un ciclo (o de un solo evento) a partir de la tabla
+    de nominaciones (DELETE + INSERT ... SELECT ... GROUP BY). Devuelve cuántos contadores
+    quedaron. Si hay EXCELENCIA automática y directa, el contador apunta a la automática
+    (la única que se revierte). No hace commit.
+    """
+    from models import ContadorExcelencia, Nominacion, Valor
+
+    es_excelencia = func.upper(func.trim(Valor.nombre)) == "EXCELENCIA"
+    es_automatica = and_(es_excelencia, Nominacion.comentario.contains(MARCA_EXCELENCIA_AUTOMATICA))
+    consulta = (
+        db.session.query(
+            Nominacion.alumno_id,
+            Nominacion.evento_id,
+            literal(ciclo_id),
+            func.sum(case((es_excelencia, 0), else_=1)),
+            func.coalesce(
+                func.min(case((es_automatica, Nominacion.id), else_=None)),
+                func.min(case((es_excelencia, Nominacion.id), else_=None)),
+            ),
+            literal(datetime.utcnow()),
+        )
+        .join(Valor, Valor.id == Nominacion.valor_id)
+        .filter(
+            Nominacion.ciclo_id == ciclo_id,
+            Nominacion.alumno_id.isnot(None),
+            Nominacion.evento_id.isnot(None),
+        )
+        .group_by(Nominacion.alumno_id, Nominacion.evento_id)
+    )
+    contadores = db.session.query(ContadorExcelencia).filter_by(ciclo_id=ciclo_id)
+    if evento_id:
+        consulta = consulta.filter(Nominacion.evento_id == evento_id)
+        contadores = contadores.filter_by(evento_id=evento_id)
+
+    contadores.delete(synchronize_session=False)
+    db.session.execute(
+        insert_generico(ContadorExcelencia).from_select(
+            ["alumno_id", "evento_id", "ciclo_id", "normales", "excelencia_id", "actualizado_en"],
+            consulta,
+        )
+    )
+    return contadores.count()
+
+
+# ======================================================
+# 📈 Resumen materializado de nominaciones (evento, tipo, nominado, valor)
+# ======================================================
+COLUMNAS_RESUMEN = ("ciclo_id", "evento_id", "tipo", "alumno_id", "maestro_nominado_id", "valor_id")
+
+
+def _fila_resumen(n):
+    """Clave de resumen y fecha de una Nominacion o de un dict con sus columnas (o None si no aplica)."""
+    from models import fecha_hoy_merida
+
+    leer = n.get if isinstance(n, dict) else (lambda columna: getattr(n, columna, None))
+    clave = {columna: leer(columna) for columna in COLUMNAS_RESUMEN}
+    if not clave["evento_id"] or not clave["valor_id"] or not (clave["alumno_id"] or clave["maestro_nominado_id"]):
+        return None, None
+    clave["tipo"] = clave["tipo"] or "alumno"
+
+    fecha = leer("fecha") or fecha_hoy_merida()
+    if isinstance(fecha, datetime):
+        fecha = fecha.date()
+    return tuple(clave[c] for c in COLUMNAS_RESUMEN), fecha
+
+
+def ajustar_resumen_nominaciones(altas=(), bajas=()):
+    """
+    Mantiene resumen_nominaciones al día en la MISMA transacción que las altas/bajas de nominaciones:
+      - altas: INSERT ... ON CONFLICT DO UPDATE sumando el conteo y ampliando primera/última fecha
+      - bajas: UPDATE restando el conteo y recalculando primera/última fecha de esa clave; las filas
+        que quedan en 0 se borran
+    altas / bajas: Nominacion o dicts con sus columnas. Las bajas deben estar ya borradas (o
+    modificadas) en la sesión; aquí se hace flush antes de recalcular. No hace commit.
+    """
+    from models import Nominacion, ResumenNominacion
+
+    sumas = {}
+    for signo, lista in ((1, altas), (-1, bajas)):
+        for n in lista:
+            clave, fecha = _fila_resumen(n)
+            if clave is None:
+                continue
+            total, primera, ultima = sumas.get(clave, (0, None, None))
+            if signo > 0:
+                primera = min(primera or fecha, fecha)
+                ultima = max(ultima or fecha, fecha)
+            sumas[clave] = (total + signo, primera, ultima)
+
+    if not sumas:
+        return
+    db.session.flush()
+    marcar_cambio_nominaciones(eventos={clave[:2] for clave in sumas})
+
+    resumen = ResumenNominacion.__table__
+    conexion = db.session.connection()
+
+    # 🔹 Altas (o cambios que dejan el conteo igual pero mueven las fechas)
+    altas_resumen = [
+        dict(zip(COLUMNAS_RESUMEN, clave), nominaciones=total, primera_fecha=primera, ultima_fecha=ultima)
+        for clave, (total, primera, ultima) in sumas.items()
+        if total > 0 or (total == 0 and primera is not None)
+    ]
+    insert = _insert_con_upsert()
+    for sujeto in (resumen.c.alumno_id, resumen.c.maestro_nominado_id):
+        otro = resumen.c.maestro_nominado_id if sujeto is resumen.c.alumno_id else resumen.c.alumno_id
+        filas = [f for f in altas_resumen if f[sujeto.key] is not None and f[otro.key] is None]
+        if not filas:
+            continue
+
+        if insert is not None:
+            stmt = insert(resumen).values(filas)
+            nueva = stmt.excluded
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[resumen.c.evento_id, resumen.c.tipo, sujeto, resumen.c.valor_id],
+                index_where=sujeto.isnot(None),
+                set_={
+                    "nominaciones": resumen.c.nominaciones + nueva.nominaciones,
+                    "primera_fecha": case(
+                        (resumen.c.primera_fecha.is_(None) | (nueva.primera_fecha < resumen.c.primera_fecha),
+                         nueva.primera_fecha),
+                        else_=resumen.c.primera_fecha,
+                    ),
+                    "ultima_fecha": case(
+                        (resumen.c.ultima_fecha.is_(None) | (nueva.ultima_fecha > resumen.c.ultima_fecha),
+                         nueva.ultima_fecha),
+                        else_=resumen.c.ultima_fecha,
+                    ),
+                },
+            )
+            conexion.execute(stmt)
+            continue
+
+        # Otros motores: SELECT ... FOR UPDATE por clave
+        for fila in filas:
+            existente = (
+                db.session.query(ResumenNominacion)
+                .filter_by(**{c: fila[c] for c in COLUMNAS_RESUMEN if c != "ciclo_id"})
+                .with_for_update()
+                .first()
+            )
+            if existente is None:
+                db.session.add(ResumenNominacion(**fila))
+                continue
+            existente.nominaciones = (existente.nominaciones or 0) + fila["nominaciones"]
+            existente.primera_fecha = min(existente.primera_fecha or fila["primera_fecha"], fila["primera_fecha"])
+            existente.ultima_fecha = max(existente.ultima_fecha or fila["ultima_fecha"], fila["ultima_fecha"])
+        db.session.flush()
+
+    # 🔹 Bajas: restar y recalcular las fechas límite con las nominaciones que quedan
+    bajas_resumen = []
+    for clave, (total, _, _) in sumas.items():
+        if total < 0:
+            parametros = {f"b_{c}": v for c, v in zip(COLUMNAS_RESUMEN, clave) if c != "ciclo_id"}
+            parametros["b_menos"] = -total
+            bajas_resumen.append(parametros)
+    if not bajas_resumen:
+        return
+
+    misma_clave = [
+        resumen.c.evento_id == bindparam("b_evento_id"),
+        resumen.c.tipo == bindparam("b_tipo"),
+        resumen.c.alumno_id.is_not_distinct_from(bindparam("b_alumno_id")),
+        resumen.c.maestro_nominado_id.is_not_distinct_from(bindparam("b_maestro_nominado_id")),
+        resumen.c.valor_id == bindparam("b_valor_id"),
+    ]
+    hechos = Nominacion.__table__
+    restantes = and_(
+        hechos.c.evento_id == resumen.c.evento_id,
+        func.coalesce(hechos.c.tipo, "alumno") == resumen.c.tipo,
+        hechos.c.alumno_id.is_not_distinct_from(resumen.c.alumno_id),
+        hechos.c.maestro_nominado_id.is_not_distinct_from(resumen.c.maestro_nominado_id),
+        hechos.c.valor_id == resumen.c.valor_id,
+    )
+    conexion.execute(
+        update(resumen)
+        .where(*misma_clave)
+        .values(
+            nominaciones=resumen.c.nominaciones - bindparam("b_menos"),
+            primera_fecha=select(func.min(hechos.c.fecha)).where(restantes).scalar_subquery(),
+            ultima_fecha=select(func.max(hechos.c.fecha)).where(restantes).scalar_subquery(),
+        ),
+        bajas_resumen,
+    )
+    conexion.execute(delete(resumen).where(*misma_clave, resumen.c.nominaciones <= 0), bajas_resumen)
+
+
+def reconstruir_resumen_nominaciones(ciclo_id, evento_id=None):
+    """
+    Recalcula desde cero el resumen de un ciclo (o de un solo evento) a partir de la tabla de
+    nominaciones (DELETE + INSERT ... SELECT ... GROUP BY). Devuelve cuántas filas quedaron.
+    No hace commit.
+    """
+    from models import Nominacion, ResumenNominacion
+
+    tipo = func.coalesce(Nominacion.tipo, "alumno")
+    consulta = (
+        db.session.query(
+            literal(ciclo_id),
+            Nominacion.evento_id,
+            tipo,
+            Nominacion.alumno_id,
+            Nominacion.maestro_nominado_id,
+            Nominacion.valor_id,
+            func.count(),
+            func.min(Nominacion.fecha),
+            func.max(Nominacion.fecha),
+        )
+        .filter(
+            Nominacion.ciclo_id == ciclo_id,
+            Nominacion.evento_id.isnot(None),
+            (Nominacion.alumno_id.isnot(None)) | (Nominacion.maestro_nominado_id.isnot(None)),
+        )
+        .group_by(
+            Nominacion.evento_id, tipo, Nominacion.alumno_id,
+            Nominacion.maestro_nominado_id, Nominacion.valor_id,
+        )
+    )
+    resumen = db.session.query(ResumenNominacion).filter_by(ciclo_id=ciclo_id)
+    if evento_id:
+        consulta = consulta.filter(Nominacion.evento_id == evento_id)
+        resumen = resumen.filter_by(evento_id=evento_id)
+
+    marcar_cambio_nominaciones(eventos=[(ciclo_id, evento_id or None)])
+    resumen.delete(synchronize_session=False)
+    db.session.execute(
+        insert_generico(ResumenNominacion).from_select(
+            list(COLUMNAS_RESUMEN) + ["nominaciones", "primera_fecha", "ultima_fecha"],
+            consulta,
+        )
+    )
+    return resumen.count()
+
+
+def limpiar_derivados_nominaciones(alumno_id=None, maestro_nominado_id=None, evento_id=None):
+    """
+    Llamar antes de borrar un alumno, maestro o evento. Sus nominaciones se quedan sin ese
+    vínculo (el ORM pone la columna en NULL) y dejan de contar, así que se quitan sus filas del
+    resumen y de los contadores de EXCELENCIA. Las claves foráneas ya tienen ON DELETE CASCADE;
+    esto cubre además SQLite sin foreign_keys y avisa a las cachés de nominaciones. No hace commit.
+    """
+    from models import ContadorExcelencia, ResumenNominacion
+
+    if alumno_id or evento_id:
+        contadores = db.session.query(ContadorExcelencia)
+        contadores = (
+            contadores.filter_by(alumno_id=alumno_id) if alumno_id else contadores.filter_by(evento_id=evento_id)
+        )
+        contadores.delete(synchronize_session=False)
 
-    db.session.commit()
\ No newline at end of file
+    condicion = (
+        ResumenNominacion.alumno_id == alumno_id if alumno_id else
+        ResumenNominacion.maestro_nominado_id == maestro_nominado_id if maestro_nominado_id else
+        ResumenNominacion.evento_id == evento_id
+    )
+    resumen = db.session.query(ResumenNominacion).filter(condicion)
+    eventos = resumen.with_entities(ResumenNominacion.ciclo_id, ResumenNominacion.evento_id).distinct().all()
+    if eventos:
+        marcar_cambio_nominaciones(eventos=[tuple(e) for e in eventos])
+        resumen.delete(synchronize_session=False)